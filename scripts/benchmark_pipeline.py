@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Benchmark the asset pipeline over synthetic inputs of increasing size
+
+Cases:
+    create_lod_levels, create_iiif_manifest, generate_thumbnail and
+    generate_thumbnail_simple run on procedurally generated height-field
+    meshes (default 10k to 10M faces); create_iiif_collection and
+    fix_urls_in_dict run on directories of generated manifests (default 10 to
+    100k manifests).
+
+Every case runs in a freshly spawned process, so its peak RSS is its own
+(the larger of the process and its worker processes). Inputs are generated
+once into the work directory and are not part of the measurement; wall time
+covers only the call under test. With --repeat, the fastest run is kept.
+
+Results are written to a JSON file. With --baseline, each case is compared
+with the matching case (same name and size) of a previous results file and
+the run fails if wall time or peak RSS grew by more than --tolerance (and
+by more than a small absolute amount, so millisecond cases do not flap).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_FACE_COUNTS = [10000, 100000, 1000000, 10000000]
+DEFAULT_MANIFEST_COUNTS = [10, 100, 1000, 10000, 100000]
+
+# Case name -> what its size counts
+CASES = {
+    'create_lod_levels': 'faces',
+    'create_iiif_manifest': 'faces',
+    'generate_thumbnail': 'faces',
+    'generate_thumbnail_simple': 'faces',
+    'create_iiif_collection': 'manifests',
+    'fix_urls_in_dict': 'manifests',
+}
+
+# Growth of wall time or peak RSS over the baseline reported as a regression
+DEFAULT_TOLERANCE = 0.15
+
+# Smaller absolute changes are timer and allocator noise, never regressions
+MIN_CHANGE = {'wall_s': 0.05, 'peak_rss_mb': 5.0}
+
+LOCAL_URL = 'http://localhost:3000'
+
+# lod0 is the original geometry, so its measured surface error (relative to
+# the diagonal) must be zero up to rounding
+IDENTICAL_ERROR_TOLERANCE = 1e-9
+
+def synthetic_mesh(face_count, seed=0):
+    """
+    Height-field mesh with about face_count faces, shaped like a terrain scan
+
+    Returns:
+        (vertices float32 (n, 3), faces int64 (m, 3))
+    """
+    rows = max(int(np.sqrt(face_count / 2)), 1)
+    cols = max(face_count // (2 * rows), 1)
+    x, z = np.meshgrid(np.linspace(0, 1, cols + 1), np.linspace(0, rows / cols, rows + 1))
+    rng = np.random.default_rng(seed)
+    height = (0.05 * np.sin(x * 12) * np.cos(z * 9) + 0.02 * np.sin(x * 47 + z * 31)
+              + 0.002 * rng.standard_normal(x.shape))
+    vertices = np.column_stack([x.ravel(), height.ravel(), z.ravel()]).astype(np.float32)
+
+    corner = (np.arange(rows)[:, None] * (cols + 1) + np.arange(cols)[None, :]).ravel()
+    faces = np.empty((len(corner) * 2, 3), dtype=np.int64)
+    faces[0::2] = np.column_stack([corner, corner + cols + 1, corner + 1])
+    faces[1::2] = np.column_stack([corner + 1, corner + cols + 1, corner + cols + 2])
+    return vertices, faces
+
+def mesh_input(work_dir, face_count):
+    """Path of the synthetic GLB with face_count faces, generating it if needed"""
+    import trimesh
+
+    path = os.path.join(work_dir, 'meshes', f"synthetic_{face_count}.glb")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        vertices, faces = synthetic_mesh(face_count)
+        trimesh.Trimesh(vertices=vertices, faces=faces, process=False).export(path + '.tmp', file_type='glb')
+        os.replace(path + '.tmp', path)
+    return path
+
+def lod_output(work_dir, face_count):
+    """LOD directory of a synthetic mesh, building the levels if needed"""
+    from create_lod_advanced import create_lod_levels
+
+    output_dir = os.path.join(work_dir, 'lod', f"synthetic_{face_count}")
+    if not os.path.exists(os.path.join(output_dir, f"synthetic_{face_count}_lod0.glb")):
+        create_lod_levels(mesh_input(work_dir, face_count), output_dir, use_cache=False)
+    return output_dir
+
+def manifest_input(work_dir, manifest_count):
+    """
+    Directory of manifest_count generated *_iiif.json manifests
+
+    All are copies of one manifest made by create_iiif_manifest for a small
+    synthetic model, with their own ids, labels and coordinates.
+    """
+    from create_model_manifest import create_iiif_manifest
+
+    manifest_dir = os.path.join(work_dir, 'manifests', str(manifest_count))
+    done_marker = os.path.join(manifest_dir, '.complete')
+    if os.path.exists(done_marker):
+        return manifest_dir
+    os.makedirs(manifest_dir, exist_ok=True)
+
+    template = create_iiif_manifest('synthetic_10000', lod_output(work_dir, 10000), LOCAL_URL,
+                                    {'label': 'synthetic', 'description': 'Synthetic benchmark model'},
+                                    {'coordinates': [0.0, 0.0]})
+    text = json.dumps(template, ensure_ascii=False)
+    rng = np.random.default_rng(0)
+    for index in range(manifest_count):
+        name = f"model{index:06d}"
+        manifest = json.loads(text.replace('synthetic_10000', name))
+        manifest['label'] = {'en': [name]}
+        feature = manifest['items'][0]['navPlace']['features'][0]
+        feature['geometry']['coordinates'] = [round(rng.uniform(-180, 180), 6), round(rng.uniform(-80, 80), 6)]
+        with open(os.path.join(manifest_dir, f"{name}_iiif.json"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+    open(done_marker, 'w').close()
+    return manifest_dir
+
+def directory_bytes(path):
+    """Total size of the files under a directory"""
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its waited-for children in MB"""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def prepare_case(name, size, work_dir):
+    """Process worker: generate the inputs of a case, outside of any measurement"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        if CASES[name] == 'manifests':
+            manifest_dir = manifest_input(work_dir, size)
+            if name == 'fix_urls_in_dict':
+                collection_input(work_dir, size, manifest_dir)
+        elif name == 'create_iiif_manifest':
+            lod_output(work_dir, size)
+        else:
+            mesh_input(work_dir, size)
+
+def collection_input(work_dir, manifest_count, manifest_dir):
+    """Collection JSON with localhost URLs for fix_urls_in_dict"""
+    from create_collection import create_iiif_collection
+
+    path = os.path.join(work_dir, 'collections', f"collection_{manifest_count}.json")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        collection = create_iiif_collection(manifest_dir, f"{LOCAL_URL}/data/manifests", {})
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(collection, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+    return path
+
+def check_identical_error(levels):
+    """Fail the case if the full-resolution level does not measure as error-free"""
+    for level in levels:
+        error = level.get('surface_error')
+        if level['lod'] == 'lod0' and error and error['relativeHausdorff'] > IDENTICAL_ERROR_TOLERANCE:
+            raise AssertionError(f"lod0 measures {error['relativeHausdorff'] * 100:.6f}% of the diagonal "
+                                 f"against its identical original")
+
+def run_case(name, size, work_dir):
+    """
+    Process worker: run one case on prepared inputs
+
+    Returns:
+        Dict with 'wall_s', 'peak_rss_mb' and 'output_bytes'
+    """
+    output_dir = os.path.join(work_dir, 'output', f"{name}_{size}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if name == 'create_lod_levels':
+            from create_lod_advanced import create_lod_levels
+            input_file = mesh_input(work_dir, size)
+            start = time.perf_counter()
+            levels = create_lod_levels(input_file, output_dir, use_cache=False)
+            wall = time.perf_counter() - start
+            output_bytes = directory_bytes(output_dir)
+            check_identical_error(levels)
+
+        elif name == 'create_iiif_manifest':
+            from create_model_manifest import create_iiif_manifest
+            model_dir = lod_output(work_dir, size)
+            start = time.perf_counter()
+            manifest = create_iiif_manifest(f"synthetic_{size}", model_dir, LOCAL_URL, {}, None)
+            data = json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8')
+            wall = time.perf_counter() - start
+            output_bytes = len(data)
+
+        elif name in ('generate_thumbnail', 'generate_thumbnail_simple'):
+            import importlib
+            module = importlib.import_module(name)
+            input_file = mesh_input(work_dir, size)
+            output_file = os.path.join(output_dir, 'thumbnail.png')
+            start = time.perf_counter()
+            module.generate_thumbnail(input_file, output_file)
+            wall = time.perf_counter() - start
+            output_bytes = os.path.getsize(output_file)
+
+        elif name == 'create_iiif_collection':
+            from create_collection import create_iiif_collection
+            manifest_dir = manifest_input(work_dir, size)
+            start = time.perf_counter()
+            collection = create_iiif_collection(manifest_dir, f"{LOCAL_URL}/data/manifests", {})
+            data = json.dumps(collection, indent=2, ensure_ascii=False).encode('utf-8')
+            wall = time.perf_counter() - start
+            output_bytes = len(data)
+
+        elif name == 'fix_urls_in_dict':
+            from fix_manifest_urls import fix_urls_in_dict
+            with open(collection_input(work_dir, size, manifest_input(work_dir, size)), 'r',
+                      encoding='utf-8') as f:
+                collection = json.load(f)
+            start = time.perf_counter()
+            fixed = fix_urls_in_dict(collection)
+            wall = time.perf_counter() - start
+            output_bytes = len(json.dumps(fixed, ensure_ascii=False).encode('utf-8'))
+
+        else:
+            raise ValueError(f"Unknown case: {name}")
+
+    return {'wall_s': wall, 'peak_rss_mb': peak_rss_mb(), 'output_bytes': output_bytes}
+
+def in_fresh_process(function, *args):
+    """Run a function in a newly spawned process and return its result"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(function, *args).result()
+
+def run_benchmarks(cases, face_counts, manifest_counts, work_dir, repeat=1):
+    """
+    Run every selected case at every size
+
+    Returns:
+        List of result dicts (case, size, unit, wall_s, peak_rss_mb, output_bytes, runs or error)
+    """
+    results = []
+    for name in cases:
+        unit = CASES[name]
+        for size in face_counts if unit == 'faces' else manifest_counts:
+            result = {'case': name, 'size': size, 'unit': unit}
+            try:
+                in_fresh_process(prepare_case, name, size, work_dir)
+                runs = [in_fresh_process(run_case, name, size, work_dir) for _ in range(max(repeat, 1))]
+                best = min(runs, key=lambda run: run['wall_s'])
+                result.update({
+                    'wall_s': round(best['wall_s'], 4),
+                    'peak_rss_mb': round(max(run['peak_rss_mb'] for run in runs), 1),
+                    'output_bytes': best['output_bytes'],
+                    'runs': [round(run['wall_s'], 4) for run in runs],
+                })
+                print(f"  ✓ {name} ({size:,} {unit}): {result['wall_s']:.3f}s, "
+                      f"{result['peak_rss_mb']:,.0f} MB peak, {result['output_bytes'] / 1024:,.0f} KB out")
+            except Exception as e:
+                result['error'] = str(e) or type(e).__name__
+                print(f"  ✗ {name} ({size:,} {unit}): {result['error']}")
+            results.append(result)
+    return results
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Print each case against the baseline and list the regressions
+
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    previous = {(case['case'], case['size']): case for case in baseline.get('results', [])}
+    regressions = []
+
+    print(f"\nComparison with baseline ({baseline.get('created', 'unknown date')}):")
+    for result in results:
+        key = (result['case'], result['size'])
+        label = f"{result['case']} ({result['size']:,} {result['unit']})"
+        before = previous.get(key)
+        if 'error' in result or not before or 'error' in before:
+            print(f"  - {label}: no comparable baseline")
+            continue
+
+        changes = []
+        for metric, unit in (('wall_s', 's'), ('peak_rss_mb', ' MB')):
+            ratio = result[metric] / before[metric] - 1 if before[metric] else 0.0
+            changes.append(f"{metric} {before[metric]:g}{unit} -> {result[metric]:g}{unit} ({ratio * 100:+.1f}%)")
+            if ratio > tolerance and result[metric] - before[metric] > MIN_CHANGE[metric]:
+                regressions.append(f"{label}: {metric} {ratio * 100:+.1f}%")
+        if result['output_bytes'] != before['output_bytes']:
+            changes.append(f"output {before['output_bytes']:,} -> {result['output_bytes']:,} bytes")
+        print(f"  {'✗' if any(r.startswith(label) for r in regressions) else '✓'} {label}: " + ', '.join(changes))
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the asset pipeline over synthetic inputs')
+    parser.add_argument('--cases', type=lambda text: text.split(','), default=list(CASES),
+                        help=f"Comma separated cases (default: all of {', '.join(CASES)})")
+    parser.add_argument('--faces', type=lambda text: [int(float(x)) for x in text.split(',')],
+                        default=DEFAULT_FACE_COUNTS,
+                        help='Face counts of the synthetic meshes (default: 10000,100000,1000000,10000000)')
+    parser.add_argument('--manifests', type=lambda text: [int(float(x)) for x in text.split(',')],
+                        default=DEFAULT_MANIFEST_COUNTS,
+                        help='Manifest counts of the synthetic collections (default: 10,100,1000,10000,100000)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case; the fastest is kept (default: 1)')
+    parser.add_argument('--work-dir', default='.benchmark_work',
+                        help='Directory for generated inputs and outputs (default: .benchmark_work)')
+    parser.add_argument('-o', '--output', default='benchmark_results.json',
+                        help='Results file (default: benchmark_results.json)')
+    parser.add_argument('--baseline', help='Previous results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed growth of wall time and peak RSS (default: {DEFAULT_TOLERANCE})')
+
+    args = parser.parse_args()
+
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    print(f"Benchmarking {len(args.cases)} cases (work directory: {args.work_dir})")
+    start_time = time.time()
+    results = run_benchmarks(args.cases, args.faces, args.manifests, os.path.abspath(args.work_dir), args.repeat)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'duration_s': round(time.time() - start_time, 1),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults: {args.output}")
+
+    failed = [result for result in results if 'error' in result]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+
+    if failed or regressions:
+        for regression in regressions:
+            print(f"  ⚠️ Regression: {regression}")
+        print(f"\n❌ {len(failed)} cases failed, {len(regressions)} regressions")
+        sys.exit(1)
+    print("\n✅ Benchmark finished")
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ import glob
 from datetime import datetime
 from pathlib import Path
 
+from pipeline_profile import span, add_profile_argument, profile_session
+
 def create_iiif_collection(manifest_dir, base_url, collection_metadata=None):
     """Create IIIF Collection from all manifests in a directory"""
     
@@ -57,46 +59,9 @@ def create_iiif_collection(manifest_dir, base_url, collection_metadata=None):
             # Extract key information from manifest
             manifest_id = f"{base_url}/{os.path.basename(manifest_path)}"
             
-            # Create collection item (reference to manifest)
-            item = {
-                "id": manifest_id,
-                "type": "Manifest",
-                "label": manifest.get('label', {"en": ["Untitled"]})
-            }
-            
-            # Add thumbnail if available
-            if 'thumbnail' in manifest and manifest['thumbnail']:
-                item['thumbnail'] = manifest['thumbnail']
-            
-            # Add summary if available
-            if 'summary' in manifest:
-                item['summary'] = manifest['summary']
-            
-            # Add metadata preview
-            if 'metadata' in manifest:
-                # Extract key metadata for preview
-                preview_metadata = []
-                for meta in manifest['metadata']:
-                    label = meta.get('label', {}).get('en', [''])[0]
-                    if label in ['Created', 'Scanner', 'Total Size', 'LOD Levels']:
-                        preview_metadata.append(meta)
-                if preview_metadata:
-                    item['metadata'] = preview_metadata
-            
+            item, features = collection_item(manifest, manifest_id)
             collection['items'].append(item)
-            
-            # Extract navPlace if present in manifest
-            if 'items' in manifest and manifest['items']:
-                canvas = manifest['items'][0]  # First canvas
-                if 'navPlace' in canvas and canvas['navPlace'].get('type') == 'FeatureCollection':
-                    # Add features to collection's navPlace
-                    features = canvas['navPlace'].get('features', [])
-                    for feature in features:
-                        # Add manifest reference to feature properties
-                        if 'properties' not in feature:
-                            feature['properties'] = {}
-                        feature['properties']['manifest'] = manifest_id
-                        collection['navPlace']['features'].append(feature)
+            collection['navPlace']['features'].extend(features)
         
         except Exception as e:
             print(f"Error processing {manifest_path}: {e}")
@@ -108,6 +73,102 @@ def create_iiif_collection(manifest_dir, base_url, collection_metadata=None):
     
     return collection
 
+def collection_item(manifest, manifest_id):
+    """
+    Collection entry for one manifest
+    
+    Returns:
+        (item, features): the collection item and the manifest's navPlace
+        features, tagged with the manifest id
+    """
+    # Create collection item (reference to manifest)
+    item = {
+        "id": manifest_id,
+        "type": "Manifest",
+        "label": manifest.get('label', {"en": ["Untitled"]})
+    }
+    
+    # Add thumbnail if available
+    if 'thumbnail' in manifest and manifest['thumbnail']:
+        item['thumbnail'] = manifest['thumbnail']
+    
+    # Add summary if available
+    if 'summary' in manifest:
+        item['summary'] = manifest['summary']
+    
+    # Add metadata preview
+    if 'metadata' in manifest:
+        # Extract key metadata for preview
+        preview_metadata = []
+        for meta in manifest['metadata']:
+            label = meta.get('label', {}).get('en', [''])[0]
+            if label in ['Created', 'Scanner', 'Total Size', 'LOD Levels']:
+                preview_metadata.append(meta)
+        if preview_metadata:
+            item['metadata'] = preview_metadata
+    
+    # Extract navPlace if present in manifest
+    features = []
+    if 'items' in manifest and manifest['items']:
+        canvas = manifest['items'][0]  # First canvas
+        if 'navPlace' in canvas and canvas['navPlace'].get('type') == 'FeatureCollection':
+            for feature in canvas['navPlace'].get('features', []):
+                # Add manifest reference to feature properties
+                if 'properties' not in feature:
+                    feature['properties'] = {}
+                feature['properties']['manifest'] = manifest_id
+                features.append(feature)
+    
+    return item, features
+
+def update_collection(collection, manifest_paths, base_url):
+    """
+    Refresh the entries of some manifests in an existing collection
+    
+    Only the given manifests are read: their items and navPlace features are
+    replaced (or added, keeping items in file name order); every other entry
+    is kept as it is. Manifests that cannot be read are skipped.
+    
+    Returns:
+        The updated collection
+    """
+    features = collection.get('navPlace', {}).get('features', [])
+    for manifest_path in manifest_paths:
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            print(f"Error processing {manifest_path}: {e}")
+            continue
+        
+        manifest_id = f"{base_url}/{os.path.basename(manifest_path)}"
+        item, manifest_features = collection_item(manifest, manifest_id)
+        collection['items'] = [existing for existing in collection['items'] if existing['id'] != manifest_id]
+        collection['items'].append(item)
+        features = [feature for feature in features
+                    if feature.get('properties', {}).get('manifest') != manifest_id] + manifest_features
+    
+    collection['items'].sort(key=lambda item: item['id'])
+    
+    if features:
+        collection['navPlace'] = collection.get('navPlace') or {
+            "id": f"{base_url}/collection/feature-collection",
+            "type": "FeatureCollection"
+        }
+        collection['navPlace']['features'] = features
+    else:
+        collection.pop('navPlace', None)
+    
+    # Refresh the generated metadata
+    for meta in collection.get('metadata', []):
+        label = meta.get('label', {}).get('en', [''])[0]
+        if label == 'Generated':
+            meta['value'] = {"en": [datetime.now().isoformat()]}
+        elif label == 'Total Items':
+            meta['value'] = {"en": [str(len(collection['items']))]}
+    
+    return collection
+
 def main():
     import argparse
     
@@ -120,9 +181,15 @@ def main():
     parser.add_argument('--description', help='Collection description')
     parser.add_argument('-m', '--metadata', action='append', nargs=2, metavar=('KEY', 'VALUE'),
                         help='Add metadata key-value pairs')
+    add_profile_argument(parser)
     
     args = parser.parse_args()
     
+    with profile_session(args.profile, 'create_collection'):
+        run(args)
+
+def run(args):
+    """Create the collection described by the parsed command line"""
     # Prepare metadata
     collection_metadata = {
         'label': args.label,
@@ -145,7 +212,7 @@ def main():
         output_path = args.output or os.path.join(args.manifest_dir, 'collection.json')
         
         # Write collection
-        with open(output_path, 'w', encoding='utf-8') as f:
+        with span('serialize'), open(output_path, 'w', encoding='utf-8') as f:
             json.dump(collection, f, indent=2, ensure_ascii=False)
         
         print(f"✅ IIIF Collection created: {output_path}")
@@ -5,56 +5,587 @@ import numpy as np
 import os
 import sys
 import argparse
-import requests
 from pathlib import Path
 from urllib.parse import urlparse
 import tempfile
 import time
+import csv
+import json
+import struct
+import contextlib
+import io
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
 
-def download_model(url, cache_dir=".model_cache"):
-    """Download model from URL with caching"""
-    os.makedirs(cache_dir, exist_ok=True)
+from glb_stats import read_glb_layout, glb_statistics
+from pipeline_profile import span, add_profile_argument, profile_session
+
+# Rough per-element working set while loading, decimating and exporting a
+# mesh: float64 positions and normals, int64 faces, face normals, plus the
+# quadric decimator's own vertex/triangle/reference records
+BYTES_PER_VERTEX = 200
+BYTES_PER_FACE = 170
+
+def download_model(url, cache_dir=".model_cache", connections=4, max_cache_mb=20480):
+    """
+    Download model from URL with caching
+    
+    Large files are fetched over parallel Range requests and resume after an
+    interruption; cached copies are revalidated with ETag/Last-Modified and the
+    cache is kept under max_cache_mb (see lod_download).
+    """
+    from lod_download import fetch_model
+    with span('download', url=url):
+        return fetch_model(url, cache_dir, connections=connections, max_cache_mb=max_cache_mb)
+
+def simplify_mesh(mesh, target_faces):
+    """Quadric-decimate a mesh, retrying more aggressively on memory errors"""
+    with span('decimate', faces=len(mesh.faces), target_faces=target_faces):
+        try:
+            return mesh.simplify_quadric_decimation(face_count=target_faces)
+        except MemoryError:
+            print(f"  Memory error! Trying with more aggressive simplification...")
+            target_faces = max(int(target_faces * 0.5), 12)
+            return mesh.simplify_quadric_decimation(face_count=target_faces)
+
+def build_error_reference(mesh, samples=100000):
+    """
+    Build a KD-tree over the original surface for LOD error checks
+    
+    Returns:
+        (tree, diagonal): KD-tree of original vertices plus surface samples,
+        and the bounding box diagonal used to normalize errors
+    """
+    from scipy.spatial import cKDTree
+    
+    points, _ = trimesh.sample.sample_surface(mesh, samples, seed=0)
+    tree = cKDTree(np.vstack([mesh.vertices, points]))
+    diagonal = float(np.linalg.norm(mesh.extents))
+    return tree, diagonal
+
+def measure_lod_error(reference_tree, simplified, diagonal, samples=20000):
+    """
+    Measure how far a simplified surface strays from the original
     
-    filename = os.path.basename(urlparse(url).path)
-    if not filename:
-        filename = "model.glb"
+    Returns:
+        (max_error, rms_error) as fractions of the original bounding box diagonal
+    """
+    points, _ = trimesh.sample.sample_surface(simplified, samples, seed=0)
+    distances, _ = reference_tree.query(points)
+    if diagonal <= 0:
+        return 0.0, 0.0
+    return float(distances.max() / diagonal), float(np.sqrt(np.mean(distances ** 2)) / diagonal)
+
+def report_level(lod_name, face_count, original_faces, output_file, process_time):
+    """Print the summary lines for one exported LOD level and return them as a dict"""
+    output_size = os.path.getsize(output_file)
+    output_size_mb = output_size / (1024 * 1024)
+    actual_ratio = face_count / original_faces * 100
     
-    cache_path = os.path.join(cache_dir, filename)
+    print(f"  ✓ {lod_name}: {face_count:,} faces ({actual_ratio:.1f}%)")
+    print(f"    File: {output_file}")
+    print(f"    Size: {output_size_mb:.2f} MB")
+    print(f"    Time: {process_time:.2f}s")
     
-    if os.path.exists(cache_path):
-        print(f"Using cached model: {cache_path}")
-        return cache_path
+    return {
+        'lod': lod_name,
+        'faces': face_count,
+        'file': output_file,
+        'size': output_size,
+        'time': process_time
+    }
+
+def write_glb(glb_path, gltf, binary):
+    """Write a GLB file from a glTF JSON dict and its BIN chunk bytes"""
+    json_bytes = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_bytes += b' ' * (-len(json_bytes) % 4)
+    binary = bytes(binary) + b'\x00' * (-len(binary) % 4)
+    length = 12 + 8 + len(json_bytes) + (8 + len(binary) if binary else 0)
     
-    print(f"Downloading model from {url}...")
-    print("This may take a while for large files...")
+    with open(glb_path, 'wb') as f:
+        f.write(struct.pack('<4sII', b'glTF', 2, length))
+        f.write(struct.pack('<I4s', len(json_bytes), b'JSON'))
+        f.write(json_bytes)
+        if binary:
+            f.write(struct.pack('<I4s', len(binary), b'BIN\x00'))
+            f.write(binary)
+
+def rebuild_buffer(gltf, binary, replacements):
+    """
+    Repack the BIN chunk, swapping the contents of some buffer views
     
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        total_size = int(response.headers.get('content-length', 0))
-        block_size = 8192
-        downloaded = 0
-        
-        with open(cache_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=block_size):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total_size > 0:
-                        percent = (downloaded / total_size) * 100
-                        print(f"Progress: {percent:.1f}% ({downloaded:,} / {total_size:,} bytes)", end='\r')
+    Args:
+        replacements: {buffer_view_index: new bytes}
+    
+    Returns:
+        The new BIN chunk bytes; bufferView offsets and lengths are updated in gltf
+    """
+    parts = []
+    offset = 0
+    for index, view in enumerate(gltf.get('bufferViews', [])):
+        start = view.get('byteOffset', 0)
+        data = replacements.get(index, binary[start:start + view['byteLength']])
+        padding = -offset % 4
+        parts.append(b'\x00' * padding)
+        offset += padding
+        view['byteOffset'] = offset
+        view['byteLength'] = len(data)
+        parts.append(data)
+        offset += len(data)
+    if gltf.get('buffers'):
+        gltf['buffers'][0]['byteLength'] = offset
+    return b''.join(parts)
+
+def parse_level_values(text, cast=float):
+    """Parse 'lod1=0.5,lod2=0.25' style per-level options into a dict"""
+    values = {}
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        key, _, value = item.partition('=')
+        if not value:
+            raise argparse.ArgumentTypeError(f"Expected LEVEL=VALUE, got '{item}'")
+        values[key.strip()] = cast(value.strip())
+    return values
+
+def parse_byte_size(text):
+    """Parse a size such as '300KB', '1.5MB' or '2048' (bytes; KB/MB/GB are powers of 1024)"""
+    units = {'GB': 1024 ** 3, 'MB': 1024 ** 2, 'KB': 1024, 'B': 1}
+    text = text.strip().upper()
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(float(text))
+
+def estimate_mesh_memory_mb(face_count, vertex_count):
+    """Estimate peak memory in MB for building LODs of a mesh"""
+    return (face_count * BYTES_PER_FACE + vertex_count * BYTES_PER_VERTEX) / (1024 * 1024)
+
+def export_level(model, output_file, optimize=False, normals=False):
+    """
+    Export a mesh or scene level, optionally optimizing its vertex order first
+    
+    Args:
+        normals: Vertex normals the optimization keeps: True for a mesh loaded with
+            them, or the names of such geometries of a scene (see lod_optimize)
+    
+    Returns:
+        The exported (possibly reordered) mesh or scene
+    """
+    with span('export', file=os.path.basename(output_file)):
+        if not optimize:
+            model.export(output_file)
+            return model
         
-        print(f"\nDownloaded to: {cache_path}")
-        return cache_path
+        from lod_optimize import optimize_mesh, optimize_scene, report_optimization
+        with span('optimize'):
+            if isinstance(model, trimesh.Scene):
+                model = trimesh.Scene(geometry=dict(model.geometry), graph=model.graph.copy())
+                stats = optimize_scene(model, normals or ())
+            else:
+                model, stats = optimize_mesh(model, normals)
+        data = model.export(file_type='glb')
+        with open(output_file, 'wb') as f:
+            f.write(data)
+        report_optimization(stats, data)
+        return model
+
+def share_array(array):
+    """
+    Copy an array into a new shared memory block
+    
+    Returns:
+        (shm, spec): the SharedMemory owner and a picklable (name, shape, dtype) spec
+    """
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+def attach_shared_array(spec):
+    """Attach to an array published with share_array (no copy)"""
+    name, shape, dtype = spec
+    if sys.version_info >= (3, 13):
+        # Only the publishing process owns (and unlinks) the block
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+def decimate_shared_level(vertices_spec, faces_spec, target_faces, output_file, optimize=False,
+                          byte_target=None):
+    """
+    Process pool worker: decimate the shared mesh buffers and export one level
+    
+    byte_target is (size_model, target_bytes, lod_name, finish_options) for
+    levels refined towards an output size (see lod_budget.decimate_to_size).
+    
+    Returns:
+        (face_count, process_time, log) for the exported level, where log is the
+        worker's console output for the parent to print in level order
+    """
+    start_time = time.time()
+    vertices_shm, vertices = attach_shared_array(vertices_spec)
+    faces_shm, faces = attach_shared_array(faces_spec)
+    
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+        if byte_target is None:
+            simplified = simplify_mesh(mesh, target_faces)
+        else:
+            from lod_budget import decimate_to_size
+            size_model, target_bytes, lod_name, finish_options = byte_target
+            simplified = decimate_to_size(lambda faces: simplify_mesh(mesh, faces), size_model, target_bytes,
+                                          target_faces, len(mesh.faces), lod_name, finish_options)
+        export_level(simplified, output_file, optimize)
+        face_count = len(simplified.faces)
+    
+    del mesh, simplified, vertices, faces
+    for shm in (vertices_shm, faces_shm):
+        try:
+            shm.close()
+        except BufferError:
+            # A cached view is still alive; the mapping goes away with the worker
+            pass
+    
+    return face_count, time.time() - start_time, log.getvalue()
+
+def create_levels_parallel(mesh, lod_config, output_dir, clean_name, workers, finish_options=None,
+                           optimize=False, lod_bytes=None, size_model=None, normals=False):
+    """
+    Decimate and export all LOD levels concurrently in a process pool
+    
+    The vertex and face arrays are published once through shared memory so
+    workers attach to them instead of receiving a pickled copy per level.
+    Byte-targeted levels (lod_bytes) are refined in their worker.
+    """
+    original_faces = len(mesh.faces)
+    levels = sorted(lod_config.items(), key=lambda x: -x[1])
+    workers = max(1, min(workers, sum(1 for _, ratio in levels if ratio != 1.0)))
+    print(f"Decimating {len(levels)} levels with {workers} worker processes...")
+    
+    results = []
+    vertices_shm, vertices_spec = share_array(mesh.vertices.view(np.ndarray))
+    faces_shm, faces_spec = share_array(mesh.faces.view(np.ndarray))
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for lod_name, ratio in levels:
+                if ratio == 1.0:
+                    continue
+                target_faces = max(int(original_faces * ratio), 12)
+                output_file = os.path.join(output_dir, f"{clean_name}_{lod_name}.glb")
+                byte_target = None
+                if lod_bytes and lod_name in lod_bytes:
+                    byte_target = (size_model, lod_bytes[lod_name], lod_name, finish_options)
+                futures[lod_name] = executor.submit(decimate_shared_level, vertices_spec, faces_spec,
+                                                    target_faces, output_file, optimize, byte_target)
+            
+            # Report in level order, same as the sequential run
+            for lod_name, ratio in levels:
+                if lod_bytes and lod_name in lod_bytes:
+                    print(f"\nProcessing {lod_name} (target: {lod_bytes[lod_name] / 1024:,.0f} KB, "
+                          f"~{ratio*100:.1f}%)...")
+                else:
+                    print(f"\nProcessing {lod_name} (target: {ratio*100:.0f}%)...")
+                output_file = os.path.join(output_dir, f"{clean_name}_{lod_name}.glb")
+                try:
+                    if ratio == 1.0:
+                        # Full resolution keeps the loaded mesh (and its visuals) as is,
+                        # exported here while the workers decimate
+                        start_time = time.time()
+                        export_level(mesh, output_file, optimize, normals)
+                        face_count, process_time = original_faces, time.time() - start_time
+                    else:
+                        with span('decimate_worker', lod=lod_name):
+                            face_count, process_time, log = futures[lod_name].result()
+                        print(log, end='')
+                    if finish_options:
+                        start_time = time.time()
+                        finish_level(output_file, lod_name, **finish_options)
+                        process_time += time.time() - start_time
+                except Exception as e:
+                    print(f"  Error during simplification: {e}")
+                    print(f"  Skipping {lod_name}")
+                    continue
+                results.append(report_level(lod_name, face_count, original_faces,
+                                            output_file, process_time))
+    finally:
+        for shm in (vertices_shm, faces_shm):
+            shm.close()
+            shm.unlink()
+    
+    return results
+
+def geometry_weight(geometry, budget_by):
+    """
+    How much of the face budget a geometry deserves
+    
+    'area' weights by surface area; 'error' by the discrete mean curvature
+    integral (dihedral angle times edge length), so flat parts that decimate
+    without visible error get few faces and detailed parts get more.
+    """
+    if budget_by == 'error':
+        if len(geometry.face_adjacency) == 0:
+            return 0.0
+        edges = geometry.vertices[geometry.face_adjacency_edges]
+        lengths = np.linalg.norm(edges[:, 0] - edges[:, 1], axis=1)
+        return float((geometry.face_adjacency_angles * lengths).sum())
+    return float(geometry.area)
+
+def allocate_face_budget(face_counts, weights, budget, min_faces=12, instances=None):
+    """
+    Split a total face budget proportionally to weights
+    
+    No geometry gets more faces than it has or fewer than min_faces (unless it
+    has fewer); budget freed by capped geometries is redistributed to the rest.
+    With instances, the budget and weights count every placed copy of a
+    geometry, and the targets returned are per copy.
+    """
+    copies = np.ones(len(face_counts)) if instances is None else np.asarray(instances, dtype=np.float64)
+    face_counts = np.asarray(face_counts, dtype=np.float64) * copies
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.sum() <= 0:
+        weights = face_counts.copy()
+    
+    floor = np.minimum(face_counts, min_faces * copies)
+    targets = floor.copy()
+    open_ = face_counts > floor
+    remaining = budget - floor.sum()
+    
+    while remaining > 0 and open_.any():
+        share = np.zeros_like(weights)
+        share[open_] = remaining * weights[open_] / max(weights[open_].sum(), 1e-30)
+        if weights[open_].sum() <= 0:
+            share[open_] = remaining / open_.sum()
+        proposed = targets + share
+        capped = open_ & (proposed >= face_counts)
+        if not capped.any():
+            targets = proposed
+            break
+        remaining -= (face_counts[capped] - targets[capped]).sum()
+        targets[capped] = face_counts[capped]
+        open_ &= ~capped
+    
+    return np.floor(targets / copies).astype(np.int64)
+
+def decimate_geometry(vertices, faces, target_faces):
+    """Process pool worker: quadric-decimate one scene geometry"""
+    mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+    simplified = simplify_mesh(mesh, target_faces)
+    return simplified.vertices.view(np.ndarray), simplified.faces.view(np.ndarray)
+
+def transfer_visuals(original, vertices, faces):
+    """
+    Rebuild a decimated geometry keeping the material of the original
+    
+    Decimation does not carry vertex attributes, so UVs and vertex colors
+    are taken from the nearest original vertex.
+    """
+    simplified = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+    visual = original.visual
+    if visual.kind is None:
+        return simplified
+    
+    from scipy.spatial import cKDTree
+    _, nearest = cKDTree(original.vertices).query(vertices)
+    
+    if isinstance(visual, trimesh.visual.TextureVisuals):
+        uv = visual.uv[nearest] if visual.uv is not None else None
+        simplified.visual = trimesh.visual.TextureVisuals(uv=uv, material=visual.material)
+    elif visual.kind == 'vertex':
+        simplified.visual = trimesh.visual.ColorVisuals(vertex_colors=visual.vertex_colors[nearest])
+    elif visual.kind == 'face':
+        # Faces are new after decimation; keep the dominant color
+        colors, counts = np.unique(visual.face_colors, axis=0, return_counts=True)
+        simplified.visual = trimesh.visual.ColorVisuals(face_colors=np.tile(colors[counts.argmax()], (len(faces), 1)))
+    return simplified
+
+def create_scene_lod_levels(input_file, output_dir, clean_name, lod_config, workers=1, budget_by='area',
+                            finish_options=None, optimize=False, clean=False, weld_tolerance=None):
+    """
+    Create LOD levels that keep the scene graph and materials
+    
+    Instead of flattening the scene into one mesh, the global face budget of
+    each level is split across geometries (see allocate_face_budget) and every
+    geometry is decimated on its own, in parallel across worker processes.
+    The output GLBs keep the original node hierarchy, transforms and materials.
+    
+    Returns:
+        List of dicts (lod, faces, file, size, time) for the exported levels
+    """
+    print(f"\nLoading scene: {input_file}")
+    start_time = time.time()
+    with span('load', file=os.path.basename(input_file)):
+        scene = trimesh.load(input_file, force='scene', process=False)
+    
+    # Geometries left as loaded keep the file's normals (cleanup drops them)
+    loaded = dict(scene.geometry) if source_has_normals(input_file) else {}
+    if clean:
+        from lod_cleanup import clean_scene, report_cleanup
+        geometries = [geometry for geometry in scene.geometry.values()
+                      if isinstance(geometry, trimesh.Trimesh)]
+        original_vertices = sum(len(geometry.vertices) for geometry in geometries)
+        original_faces = sum(len(geometry.faces) for geometry in geometries)
+        with span('clean'):
+            stats = clean_scene(scene, weld_tolerance)
+        report_cleanup(stats, original_vertices, original_faces)
+    
+    meshes = {name: geometry for name, geometry in scene.geometry.items()
+              if isinstance(geometry, trimesh.Trimesh) and len(geometry.faces)}
+    if not meshes:
+        print("No valid mesh geometry found in the scene")
+        return []
+    
+    names = list(meshes)
+    face_counts = np.array([len(meshes[name].faces) for name in names])
+    # Budgets and face counts are in placed (world) faces: every instance renders
+    instances = {name: 0 for name in names}
+    for node in scene.graph.nodes_geometry:
+        geometry_name = scene.graph[node][1]
+        if geometry_name in instances:
+            instances[geometry_name] += 1
+    copies = np.array([max(instances[name], 1) for name in names])
+    weights = np.array([geometry_weight(meshes[name], budget_by) for name in names]) * copies
+    original_faces = int((face_counts * copies).sum())
+    
+    print(f"\nScene loaded in {time.time() - start_time:.2f} seconds")
+    print(f"Geometries: {len(names)}, nodes: {len(scene.graph.nodes_geometry)}")
+    print(f"Original geometry: {original_faces:,} faces ({int(face_counts.sum()):,} unique)")
+    print(f"Face budget split by {budget_by}")
+    
+    levels = sorted(lod_config.items(), key=lambda x: -x[1])
+    results = []
+    
+    with ProcessPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for lod_name, ratio in levels:
+            print(f"\nProcessing {lod_name} (target: {ratio*100:.0f}%)...")
+            start_time = time.time()
+            output_file = os.path.join(output_dir, f"{clean_name}_{lod_name}.glb")
+            
+            try:
+                if ratio == 1.0:
+                    level_scene = scene
+                else:
+                    targets = allocate_face_budget(face_counts, weights, original_faces * ratio, instances=copies)
+                    futures = {}
+                    for name, target in zip(names, targets):
+                        geometry = meshes[name]
+                        if target < len(geometry.faces):
+                            futures[name] = executor.submit(decimate_geometry, geometry.vertices.view(np.ndarray),
+                                                            geometry.faces.view(np.ndarray), int(target))
+                    
+                    geometry = dict(scene.geometry)
+                    for name, future in futures.items():
+                        with span('decimate_worker', geometry=name):
+                            vertices, faces = future.result()
+                        geometry[name] = transfer_visuals(meshes[name], vertices, faces)
+                    level_scene = trimesh.Scene(geometry=geometry, graph=scene.graph.copy())
+                
+                normals = [name for name, geometry in loaded.items() if level_scene.geometry.get(name) is geometry]
+                level_scene = export_level(level_scene, output_file, optimize, normals)
+                if finish_options:
+                    finish_level(output_file, lod_name, **finish_options)
+            except Exception as e:
+                print(f"  Error creating {lod_name}: {e}")
+                continue
+            
+            face_count = int(sum(len(level_scene.geometry[name].faces) * count for name, count in zip(names, copies)))
+            results.append(report_level(lod_name, face_count, original_faces, output_file,
+                                        time.time() - start_time))
+    
+    return results
+
+def source_has_normals(input_file):
+    """Whether every primitive of a GLB file stores vertex normals (False for other formats)"""
+    if not input_file.lower().endswith('.glb'):
+        return False
+    try:
+        gltf, _ = read_glb_layout(input_file)
+    except (OSError, ValueError):
+        return False
+    primitives = [primitive for mesh in gltf.get('meshes', []) for primitive in mesh.get('primitives', [])]
+    return bool(primitives) and all('NORMAL' in primitive.get('attributes', {}) for primitive in primitives)
+
+def load_model_mesh(input_file, visuals=True):
+    """
+    Load a model file as one world-space mesh (scenes are merged, see scene_merge)
     
+    Args:
+        visuals: False to load only the geometry (no merged materials or normals)
+    
+    Returns:
+        trimesh.Trimesh, or None when the file has no mesh geometry
+    """
+    with span('load', file=os.path.basename(input_file)):
+        try:
+            mesh = trimesh.load(input_file, force='scene', process=False)
+        except Exception as e:
+            print(f"Error loading with trimesh, trying with process=True: {e}")
+            mesh = trimesh.load(input_file, force='scene', process=True)
+    
+    if isinstance(mesh, trimesh.Scene):
+        from scene_merge import merge_scene
+        if len(mesh.graph.nodes_geometry) > 1:
+            print(f"Model is a scene, merging {len(mesh.geometry)} geometries "
+                  f"placed by {len(mesh.graph.nodes_geometry)} nodes...")
+        with span('concatenate', geometries=len(mesh.geometry), nodes=len(mesh.graph.nodes_geometry)):
+            mesh, _ = merge_scene(mesh, visuals=visuals, normals=visuals and source_has_normals(input_file))
+        if mesh is None:
+            print("No valid mesh geometry found in the scene")
+    return mesh
+
+def clean_model_name(input_file):
+    """Output base name: the file stem without _original, _base or similar suffixes"""
+    clean_name = Path(input_file).stem
+    for suffix in ['_original', '_base', '_full', '_raw']:
+        if clean_name.endswith(suffix):
+            clean_name = clean_name[:-len(suffix)]
+            break
+    return clean_name
+
+def finish_level(output_file, lod_name, texture_options=None, quantize_bits=None):
+    """
+    Post-process an exported level file
+    
+    Textures are downscaled and re-encoded first (see lod_textures), then
+    vertex attributes are quantized (see lod_quantize).
+    """
+    if texture_options:
+        from lod_textures import apply_level_textures
+        with span('textures', lod=lod_name):
+            apply_level_textures(output_file, lod_name, texture_options)
+    if quantize_bits:
+        from lod_quantize import apply_level_quantization
+        with span('quantize', lod=lod_name):
+            apply_level_quantization(output_file, lod_name, quantize_bits)
+
+def render_level_thumbnail(thumbnail, size, level, mesh=None):
+    """
+    Render a thumbnail PNG from one built level; a failed thumbnail does not fail the build
+    
+    Args:
+        thumbnail: Output PNG path
+        size: (width, height) of the thumbnail
+        level: The level's result dict (see report_level); gets 'thumbnail' once rendered
+        mesh: The level mesh in memory, rendered instead of reading level['file']
+    """
+    from generate_thumbnail import generate_thumbnail
+    try:
+        with span('thumbnail', lod=level['lod']):
+            if generate_thumbnail(level['file'], thumbnail, size, model=mesh):
+                level['thumbnail'] = thumbnail
     except Exception as e:
-        print(f"Error downloading model: {e}")
-        if os.path.exists(cache_path):
-            os.remove(cache_path)
-        raise
+        print(f"  ⚠️ Thumbnail failed: {e}")
 
-def create_lod_levels(input_source, output_dir="lod_models", lod_config=None, max_memory_mb=2048):
+def create_lod_levels(input_source, output_dir="lod_models", lod_config=None, max_memory_mb=2048,
+                      cascade=False, max_error=0.01, workers=1, out_of_core=False,
+                      preserve_scene=False, budget_by='area', texture_options=None, optimize=False,
+                      quantize_bits=None, lod_bytes=None, use_cache=True, measure_error=True, clean=False,
+                      weld_tolerance=None, mesh=None, reference_mesh=None, thumbnail=None,
+                      thumbnail_size=(512, 512)):
     """
     Create LOD levels from a GLB model
     
@@ -63,6 +594,44 @@ def create_lod_levels(input_source, output_dir="lod_models", lod_config=None, ma
         output_dir: Directory to save LOD models
         lod_config: Dictionary with LOD ratios (default: {"lod0": 1.0, "lod1": 0.5, "lod2": 0.25, "lod3": 0.1})
         max_memory_mb: Maximum memory to use in MB (for large models)
+        cascade: Decimate each level from the previous (finer) level instead of the original
+        max_error: In cascade mode, maximum surface error vs the original as a fraction of the
+            bounding box diagonal; levels above it are rebuilt from the original
+        workers: Number of processes decimating levels concurrently (1 = sequential)
+        out_of_core: Stream the model through spatial cells instead of loading it (GLB only);
+            used automatically when the estimated in-memory build exceeds max_memory_mb
+        preserve_scene: Decimate each scene geometry separately and keep the node graph and materials
+        budget_by: How preserve_scene splits the face budget: 'area' or 'error'
+        texture_options: Per-level texture downscaling and re-encoding settings
+            (see lod_textures.apply_level_textures); None leaves textures untouched
+        optimize: Reorder triangles and vertices for GPU cache locality before export
+            (see lod_optimize; not applied out-of-core)
+        quantize_bits: {lod: position bits} to write KHR_mesh_quantization levels
+            (see lod_quantize); None keeps float attributes
+        lod_bytes: {lod: bytes} output size targets (GLB only, see lod_budget); they
+            replace the face ratios of those levels and add levels missing from lod_config
+        use_cache: Skip levels whose build record (see lod_cache) shows them up to date
+        measure_error: Measure the symmetric surface error of each built level against the
+            original and store it in the level's GLB (see lod_error; not out-of-core)
+        clean: Weld vertices and drop degenerate, duplicate and unused elements before
+            decimating (see lod_cleanup; not out-of-core)
+        weld_tolerance: Weld distance of the cleanup in model units (default: a millionth
+            of the bounding box diagonal)
+        mesh: The model already loaded with load_model_mesh (and cleaned, when clean is
+            set) to decimate instead of loading input_source; not out-of-core or
+            scene-preserving
+        reference_mesh: The model as loaded, for the surface error measurement; by
+            default input_source is loaded again
+        thumbnail: Path of a PNG thumbnail to render from the cheapest level dense
+            enough for thumbnail_size (see thumbnail_source); levels decimated in
+            memory are rendered without reading their files back
+        thumbnail_size: (width, height) of the thumbnail
+    
+    Returns:
+        List of dicts (lod, faces, file, size, time) for the exported levels;
+        levels skipped as up to date also have 'cached': True, measured levels
+        have 'surface_error', the level the thumbnail was rendered from has
+        'thumbnail'
     """
     
     if input_source.startswith(('http://', 'https://')):
@@ -83,96 +652,429 @@ def create_lod_levels(input_source, output_dir="lod_models", lod_config=None, ma
             "lod4": 0.05,
         }
     
-    print(f"\nLoading model: {input_file}")
-    start_time = time.time()
+    finish_options = {'texture_options': texture_options, 'quantize_bits': quantize_bits}
+    if not any(finish_options.values()):
+        finish_options = None
     
-    try:
-        mesh = trimesh.load(input_file, force='mesh', process=False)
-    except Exception as e:
-        print(f"Error loading with trimesh, trying with process=True: {e}")
-        mesh = trimesh.load(input_file, force='mesh', process=True)
+    if mesh is not None and (out_of_core or preserve_scene):
+        raise ValueError("A preloaded mesh cannot be built out-of-core or scene-preserving")
     
-    if isinstance(mesh, trimesh.Scene):
-        print("Model is a scene, combining meshes...")
-        meshes = []
-        for name, geometry in mesh.geometry.items():
-            if isinstance(geometry, trimesh.Trimesh):
-                print(f"  - Found mesh: {name} ({len(geometry.faces)} faces)")
-                meshes.append(geometry)
-        
-        if meshes:
-            mesh = trimesh.util.concatenate(meshes)
+    if mesh is None and not out_of_core and input_file.lower().endswith('.glb'):
+        try:
+            stats = glb_statistics(input_file)
+            estimate_mb = estimate_mesh_memory_mb(stats['faces'], stats['vertices'])
+        except Exception:
+            estimate_mb = 0
+        if estimate_mb > max_memory_mb:
+            print(f"\nEstimated in-memory build needs {estimate_mb:,.0f} MB "
+                  f"(limit {max_memory_mb:,} MB), switching to out-of-core mode")
+            out_of_core = True
+    
+    size_model = None
+    if lod_bytes:
+        if not input_file.lower().endswith('.glb'):
+            raise ValueError("Byte targets need a GLB input")
+        from lod_budget import glb_size_model, byte_targets_to_ratios
+        size_model = glb_size_model(input_file)
+        lod_config = {**lod_config, **byte_targets_to_ratios(size_model, lod_bytes, finish_options,
+                                                             preserve_scene and not out_of_core)}
+    
+    clean_name = clean_model_name(input_file)
+    cached_results = []
+    if use_cache:
+        from lod_cache import open_build_record, level_keys, split_cached_levels, save_build_record
+        record = open_build_record(input_file, output_dir, clean_name)
+        chained = cascade and not (out_of_core or preserve_scene)
+        keys = level_keys(record, lod_config, {
+            lod_name: level_build_settings(lod_name, ratio, lod_bytes, finish_options, out_of_core,
+                                           preserve_scene, cascade, max_error, budget_by, max_memory_mb,
+                                           optimize, measure_error, clean, weld_tolerance)
+            for lod_name, ratio in lod_config.items()
+        }, chained=chained)
+        cached_results, stale_levels = split_cached_levels(record, keys, output_dir, chained)
+        if cached_results:
+            print(f"\nBuild record: {len(cached_results)} of {len(keys)} levels up to date")
+        for level in cached_results:
+            print(f"  ✓ {level['lod']}: up to date ({level['file']})")
+        lod_config = {lod_name: lod_config[lod_name] for lod_name in stale_levels}
+    
+    results = []
+    if lod_config:
+        results = build_lod_levels(input_file, output_dir, clean_name, lod_config, max_memory_mb, cascade,
+                                   max_error, workers, out_of_core, preserve_scene, budget_by,
+                                   finish_options, optimize, lod_bytes, size_model, clean, weld_tolerance,
+                                   mesh, thumbnail, thumbnail_size)
+    else:
+        print(f"\nAll {len(cached_results)} levels are up to date, nothing to build")
+    
+    if measure_error and results:
+        if out_of_core:
+            print("\nSurface error is not measured in out-of-core mode")
         else:
-            print("No valid mesh geometry found in the scene")
-            return
+            from lod_error import measure_level_errors
+            with span('measure_error'):
+                measure_level_errors(input_file, results, original=reference_mesh)
+    
+    if use_cache:
+        record_path = save_build_record(record, output_dir, clean_name, keys, results)
+        print(f"\nBuild record: {record_path}")
+        order = list(keys)
+        results = sorted(cached_results + results, key=lambda level: order.index(level['lod']))
+    
+    if thumbnail and results and not any(level.get('thumbnail') for level in results):
+        # Levels that were not decimated in memory here (up to date, parallel,
+        # out-of-core or scene-preserving builds) are read from their files
+        from thumbnail_source import select_thumbnail_source
+        source = select_thumbnail_source([level['file'] for level in results], thumbnail_size)
+        if source is not None:
+            level = next(level for level in results if level['file'] == source['path'])
+            print(f"\nThumbnail from {level['lod']} ({source['faces']:,} faces, {source['required']:,} needed)")
+            render_level_thumbnail(thumbnail, thumbnail_size, level)
+    
+    if lod_bytes:
+        from lod_budget import report_byte_targets
+        report_byte_targets(results, lod_bytes)
+    
+    return results
+
+def level_build_settings(lod_name, ratio, lod_bytes, finish_options, out_of_core, preserve_scene,
+                         cascade, max_error, budget_by, max_memory_mb, optimize, measure_error=False,
+                         clean=False, weld_tolerance=None):
+    """Everything besides the input that determines the output of one level (for the build cache)"""
+    finish_options = finish_options or {}
+    texture_options = finish_options.get('texture_options')
+    quantize_bits = finish_options.get('quantize_bits')
+    texture = None
+    if texture_options:
+        from lod_textures import DEFAULT_TEXTURE_SCALES, DEFAULT_TEXTURE_QUALITY
+        texture = {
+            'scale': texture_options.get('scales', DEFAULT_TEXTURE_SCALES).get(lod_name, 1.0),
+            'quality': texture_options.get('quality', DEFAULT_TEXTURE_QUALITY).get(lod_name, 85),
+            'format': texture_options.get('format', 'keep'),
+        }
+    return {
+        'ratio': ratio,
+        'bytes': (lod_bytes or {}).get(lod_name),
+        'mode': 'out_of_core' if out_of_core else 'scene' if preserve_scene else 'mesh',
+        'max_memory_mb': max_memory_mb if out_of_core else None,
+        'cascade': {'max_error': max_error} if cascade and not (out_of_core or preserve_scene) else None,
+        'budget_by': budget_by if preserve_scene and not out_of_core else None,
+        'optimize': optimize and not out_of_core,
+        'texture': texture,
+        'quantize_bits': min(int(quantize_bits.get(lod_name, 16)), 16) if quantize_bits else None,
+        'measure_error': measure_error and not out_of_core,
+        'clean': {'weld_tolerance': weld_tolerance} if clean and not out_of_core else None,
+    }
+
+def build_lod_levels(input_file, output_dir, clean_name, lod_config, max_memory_mb=2048, cascade=False,
+                     max_error=0.01, workers=1, out_of_core=False, preserve_scene=False, budget_by='area',
+                     finish_options=None, optimize=False, lod_bytes=None, size_model=None, clean=False,
+                     weld_tolerance=None, mesh=None, thumbnail=None, thumbnail_size=(512, 512)):
+    """
+    Build the given LOD levels of a local model file (see create_lod_levels)
+    
+    Returns:
+        List of dicts (lod, faces, file, size, time) for the exported levels
+    """
+    preloaded = mesh is not None
+    if out_of_core:
+        if optimize:
+            print("Note: vertex order optimization is not applied in out-of-core mode")
+        if clean:
+            print("Note: mesh cleanup is not applied in out-of-core mode")
+        from lod_out_of_core import create_lod_levels_out_of_core
+        return create_lod_levels_out_of_core(input_file, output_dir, clean_name,
+                                             lod_config, max_memory_mb, finish_options)
+    
+    if preserve_scene:
+        return create_scene_lod_levels(input_file, output_dir, clean_name,
+                                       lod_config, workers, budget_by, finish_options, optimize,
+                                       clean, weld_tolerance)
+    
+    if mesh is None:
+        print(f"\nLoading model: {input_file}")
+        start_time = time.time()
+        mesh = load_model_mesh(input_file)
+        if mesh is None:
+            return []
+        print(f"\nModel loaded in {time.time() - start_time:.2f} seconds")
     
-    load_time = time.time() - start_time
     original_faces = len(mesh.faces)
     original_vertices = len(mesh.vertices)
+    # Only the mesh as loaded has normals: cleanup and decimation drop them
+    normals = not clean and source_has_normals(input_file)
     
     file_size_mb = os.path.getsize(input_file) / (1024 * 1024)
     
-    print(f"\nModel loaded in {load_time:.2f} seconds")
     print(f"Original file size: {file_size_mb:.2f} MB")
     print(f"Original geometry: {original_faces:,} faces, {original_vertices:,} vertices")
     print(f"Bounds: {mesh.bounds[0]} to {mesh.bounds[1]}")
     
-    # Extract base filename without extension
-    input_path = Path(input_file)
-    base_filename = input_path.stem
-    
-    # Remove _original, _base, or similar suffixes for cleaner naming
-    clean_name = base_filename
-    for suffix in ['_original', '_base', '_full', '_raw']:
-        if clean_name.endswith(suffix):
-            clean_name = clean_name[:-len(suffix)]
-            break
+    if clean and not preloaded:
+        from lod_cleanup import clean_mesh, report_cleanup
+        print("\nCleaning mesh...")
+        with span('clean', faces=original_faces):
+            mesh, stats = clean_mesh(mesh, weld_tolerance)
+        report_cleanup(stats, original_vertices, original_faces)
+        original_faces = len(mesh.faces)
     
     print(f"\nCreating {len(lod_config)} LOD levels...")
     print(f"Base name: {clean_name}")
     
+    if workers > 1:
+        return create_levels_parallel(mesh, lod_config, output_dir, clean_name, workers, finish_options,
+                                      optimize, lod_bytes, size_model, normals)
+    
+    if cascade:
+        print(f"Cascade mode: each level is decimated from the previous one "
+              f"(max error {max_error*100:.2f}% of bounding box diagonal)")
+        reference_tree, diagonal = build_error_reference(mesh)
+    
+    # Cascade bookkeeping: the mesh the next level is decimated from and
+    # the estimated cost of decimating every level from the original instead
+    source = mesh
+    cascade_time = 0.0
+    direct_time_estimate = 0.0
+    results = []
+    
+    # Levels come densest first: the last one with enough faces is the
+    # cheapest to render the thumbnail from (see thumbnail_source)
+    thumbnail_level = None
+    if thumbnail:
+        from thumbnail_source import required_faces
+        thumbnail_faces = required_faces(mesh.bounds, thumbnail_size)
+    
     for lod_name, ratio in sorted(lod_config.items(), key=lambda x: -x[1]):
-        print(f"\nProcessing {lod_name} (target: {ratio*100:.0f}%)...")
+        if lod_bytes and lod_name in lod_bytes:
+            print(f"\nProcessing {lod_name} (target: {lod_bytes[lod_name] / 1024:,.0f} KB, "
+                  f"~{ratio*100:.1f}%)...")
+        else:
+            print(f"\nProcessing {lod_name} (target: {ratio*100:.0f}%)...")
         start_time = time.time()
         
+        def decimate(from_mesh, target_faces):
+            from lod_budget import decimate_to_size
+            # Byte-targeted levels refine their face count on in-memory results
+            if not (lod_bytes and lod_name in lod_bytes):
+                return simplify_mesh(from_mesh, target_faces)
+            return decimate_to_size(lambda faces: simplify_mesh(from_mesh, faces), size_model,
+                                    lod_bytes[lod_name], target_faces, len(from_mesh.faces),
+                                    lod_name, finish_options)
+        
         if ratio == 1.0:
             simplified = mesh
         else:
             target_faces = max(int(original_faces * ratio), 12)
             
             try:
-                print(f"  Simplifying to {target_faces:,} faces...")
-                simplified = mesh.simplify_quadric_decimation(face_count=target_faces)
-            except MemoryError:
-                print(f"  Memory error! Trying with more aggressive simplification...")
-                target_faces = max(int(target_faces * 0.5), 12)
-                simplified = mesh.simplify_quadric_decimation(face_count=target_faces)
+                if cascade and source is not mesh and len(source.faces) > target_faces:
+                    print(f"  Simplifying to {target_faces:,} faces (from {len(source.faces):,})...")
+                    decimate_start = time.time()
+                    simplified = decimate(source, target_faces)
+                    decimate_time = time.time() - decimate_start
+                    
+                    max_err, rms_err = measure_lod_error(reference_tree, simplified, diagonal)
+                    print(f"    Error vs original: max {max_err*100:.3f}%, RMS {rms_err*100:.3f}%")
+                    if max_err > max_error:
+                        print(f"    Error above {max_error*100:.2f}%, rebuilding from original...")
+                        decimate_start = time.time()
+                        simplified = decimate(mesh, target_faces)
+                        decimate_time += time.time() - decimate_start
+                        direct_time_estimate += time.time() - decimate_start
+                    else:
+                        # Quadric decimation cost grows roughly linearly with input faces
+                        direct_time_estimate += decimate_time * original_faces / len(source.faces)
+                    cascade_time += decimate_time
+                else:
+                    print(f"  Simplifying to {target_faces:,} faces...")
+                    decimate_start = time.time()
+                    simplified = decimate(mesh, target_faces)
+                    cascade_time += time.time() - decimate_start
+                    direct_time_estimate += time.time() - decimate_start
             except Exception as e:
                 print(f"  Error during simplification: {e}")
                 print(f"  Skipping {lod_name}")
                 continue
         
+        if cascade:
+            source = simplified
+        
         # Use consistent naming: modelname_lod0.glb, modelname_lod1.glb, etc.
         output_file = os.path.join(output_dir, f"{clean_name}_{lod_name}.glb")
         
         try:
-            simplified.export(output_file)
+            simplified = export_level(simplified, output_file, optimize, normals and simplified is mesh)
+            if finish_options:
+                finish_level(output_file, lod_name, **finish_options)
             process_time = time.time() - start_time
-            output_size_mb = os.path.getsize(output_file) / (1024 * 1024)
-            
-            actual_ratio = len(simplified.faces) / original_faces * 100
-            
-            print(f"  ✓ {lod_name}: {len(simplified.faces):,} faces ({actual_ratio:.1f}%)")
-            print(f"    File: {output_file}")
-            print(f"    Size: {output_size_mb:.2f} MB")
-            print(f"    Time: {process_time:.2f}s")
+            results.append(report_level(lod_name, len(simplified.faces), original_faces,
+                                        output_file, process_time))
+            if thumbnail and (thumbnail_level is None or len(simplified.faces) >= thumbnail_faces):
+                thumbnail_level = (simplified, results[-1])
             
         except Exception as e:
             print(f"  Error exporting {lod_name}: {e}")
+    
+    if thumbnail_level is not None:
+        level_mesh, level = thumbnail_level
+        print(f"\nThumbnail from {level['lod']} in memory ({len(level_mesh.faces):,} faces, "
+              f"{thumbnail_faces:,} needed)")
+        render_level_thumbnail(thumbnail, thumbnail_size, level, level_mesh)
+    
+    if cascade:
+        saved = direct_time_estimate - cascade_time
+        print(f"\nCascade decimation: {cascade_time:.2f}s "
+              f"(estimated {direct_time_estimate:.2f}s from original, ~{saved:.2f}s saved)")
+    
+    return results
+
+def find_batch_inputs(batch_source):
+    """
+    Resolve a batch source to a list of model files
+    
+    Args:
+        batch_source: Directory (searched recursively for .glb files) or a text
+            file listing one path or URL per line (# starts a comment)
+    """
+    if os.path.isdir(batch_source):
+        return sorted(str(p) for p in Path(batch_source).rglob('*.glb'))
+    
+    inputs = []
+    with open(batch_source, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                inputs.append(line)
+    return inputs
+
+def run_batch_job(input_source, output_dir, lod_config, options):
+    """Batch worker: build the LODs of one model, logging to <output_dir>/lod_build.log"""
+    os.makedirs(output_dir, exist_ok=True)
+    start_time = time.time()
+    with open(os.path.join(output_dir, 'lod_build.log'), 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log):
+        try:
+            levels = create_lod_levels(input_source, output_dir, lod_config, **options)
+            error = None
+        except Exception as e:
+            print(f"\n❌ Error: {e}")
+            levels, error = [], str(e)
+    return {'levels': levels, 'error': error, 'time': time.time() - start_time}
+
+def create_lod_batch(batch_source, output_root="lod_models", lod_config=None, max_memory_mb=2048,
+                     jobs=2, **options):
+    """
+    Build LODs for many models, running several at once within a memory budget
+    
+    Each job's memory is estimated from the face and vertex counts in the GLB
+    header. Jobs start largest first, as long as the estimates of all running
+    jobs stay under max_memory_mb; a job that alone exceeds the budget runs by
+    itself.
+    
+    Args:
+        batch_source: Directory of GLB files or a list file (see find_batch_inputs)
+        output_root: Each model is written to <output_root>/<model name>/
+        lod_config: LOD ratios passed to create_lod_levels
+        max_memory_mb: Budget for the summed estimates of concurrently running jobs
+        jobs: Maximum number of models processed at the same time
+        **options: Extra keyword arguments for create_lod_levels
+    
+    Returns:
+        List of per-model summary dicts
+    """
+    inputs = find_batch_inputs(batch_source)
+    if not inputs:
+        raise FileNotFoundError(f"No models found in {batch_source}")
+    
+    print(f"Found {len(inputs)} models, running up to {jobs} at once within {max_memory_mb:,} MB")
+    
+    pending = []
+    for input_source in inputs:
+        name = Path(urlparse(input_source).path).stem
+        job = {'name': name, 'input': input_source, 'faces': None, 'vertices': None,
+               'memory_mb': 0.0, 'levels': [], 'error': None, 'time': 0.0}
+        try:
+            if not input_source.startswith(('http://', 'https://')):
+                stats = glb_statistics(input_source)
+                job['faces'], job['vertices'] = stats['faces'], stats['vertices']
+                job['memory_mb'] = estimate_mesh_memory_mb(job['faces'], job['vertices'])
+        except Exception as e:
+            print(f"  Could not read counts for {input_source}: {e}")
+        pending.append(job)
+    
+    # Largest first so big jobs are not left to run alone at the end
+    pending.sort(key=lambda job: -job['memory_mb'])
+    finished = []
+    running = {}
+    reserved_mb = 0.0
+    batch_start = time.time()
+    
+    with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as executor:
+        while pending or running:
+            for job in list(pending):
+                if len(running) >= jobs:
+                    break
+                if running and reserved_mb + job['memory_mb'] > max_memory_mb:
+                    continue
+                if job['memory_mb'] > max_memory_mb:
+                    print(f"  ⚠️ {job['name']}: estimated {job['memory_mb']:,.0f} MB exceeds the budget, running alone")
+                pending.remove(job)
+                reserved_mb += job['memory_mb']
+                output_dir = os.path.join(output_root, job['name'])
+                future = executor.submit(run_batch_job, job['input'], output_dir, lod_config, options)
+                running[future] = job
+                print(f"  → {job['name']} started (est. {job['memory_mb']:,.0f} MB, "
+                      f"{reserved_mb:,.0f} MB reserved)")
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                reserved_mb -= job['memory_mb']
+                try:
+                    job.update(future.result())
+                except Exception as e:
+                    job['error'] = str(e)
+                finished.append(job)
+                status = '✓' if not job['error'] else '✗'
+                print(f"  {status} [{len(finished)}/{len(inputs)}] {job['name']} ({job['time']:.1f}s)")
+    
+    finished.sort(key=lambda job: inputs.index(job['input']))
+    write_batch_summary(finished, os.path.join(output_root, 'batch_summary.csv'))
+    print(f"\nBatch finished in {time.time() - batch_start:.1f}s")
+    return finished
+
+def write_batch_summary(jobs, csv_path):
+    """Print the batch summary table and save it as CSV"""
+    rows = []
+    for job in jobs:
+        rows.append({
+            'model': job['name'],
+            'faces': job['faces'] if job['faces'] is not None else '',
+            'vertices': job['vertices'] if job['vertices'] is not None else '',
+            'est_memory_mb': f"{job['memory_mb']:.0f}",
+            'levels': len(job['levels']),
+            'output_mb': f"{sum(level['size'] for level in job['levels']) / (1024 * 1024):.2f}",
+            'time_s': f"{job['time']:.1f}",
+            'status': 'ok' if not job['error'] else f"error: {job['error']}"
+        })
+    
+    os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    
+    headers = list(rows[0].keys())
+    widths = [max(len(h), *(len(str(row[h])) for row in rows)) for h in headers]
+    print("\n" + "  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(row[h]).ljust(w) for h, w in zip(headers, widths)))
+    print(f"\nSummary saved to {csv_path}")
 
 def main():
     parser = argparse.ArgumentParser(description='Create LOD levels from GLB models')
-    parser.add_argument('input', help='Path or URL to GLB model')
+    parser.add_argument('input', help='Path or URL to GLB model (with --batch: directory or list file)')
     parser.add_argument('-o', '--output', default='lod_models', help='Output directory (default: lod_models)')
     parser.add_argument('--lod0', type=float, default=1.0, help='LOD0 ratio (default: 1.0)')
     parser.add_argument('--lod1', type=float, default=0.5, help='LOD1 ratio (default: 0.5)')
@@ -180,10 +1082,78 @@ def main():
     parser.add_argument('--lod3', type=float, default=0.1, help='LOD3 ratio (default: 0.1)')
     parser.add_argument('--lod4', type=float, default=0.05, help='LOD4 ratio (default: 0.05)')
     parser.add_argument('--no-lod4', action='store_true', help='Skip LOD4 generation')
+    parser.add_argument('--lod-bytes', type=lambda text: parse_level_values(text, parse_byte_size),
+                        metavar='LOD=SIZE,...',
+                        help='Output size targets instead of ratios, e.g. lod4=300KB,lod3=600KB,lod2=1.5MB')
     parser.add_argument('--max-memory', type=int, default=2048, help='Max memory in MB (default: 2048)')
+    parser.add_argument('--cascade', action='store_true',
+                        help='Decimate each level from the previous level instead of the original')
+    parser.add_argument('--max-error', type=float, default=0.01,
+                        help='Cascade mode: max error vs original as fraction of bbox diagonal (default: 0.01)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Decimate levels in parallel with N processes (default: 1)')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='Stream the model through spatial cells to stay within --max-memory')
+    parser.add_argument('--preserve-scene', action='store_true',
+                        help='Keep the scene graph and materials, decimating each geometry separately')
+    parser.add_argument('--budget-by', choices=['area', 'error'], default='area',
+                        help='With --preserve-scene: split the face budget by area or curvature error (default: area)')
+    parser.add_argument('--textures', action='store_true',
+                        help='Downscale and re-encode textures per level (off by default: textures are '
+                             'exported unchanged)')
+    parser.add_argument('--texture-scale', type=parse_level_values, metavar='LOD=SCALE,...',
+                        help='Texture size factor per level (default: lod2=0.5,lod3=0.25,lod4=0.125); '
+                             'implies --textures')
+    parser.add_argument('--texture-quality', type=lambda text: parse_level_values(text, int),
+                        metavar='LOD=QUALITY,...',
+                        help='JPEG/WebP quality per level (default: lod0=90 ... lod4=70); implies --textures')
+    parser.add_argument('--texture-format', choices=['keep', 'jpeg', 'png', 'webp'],
+                        help='Texture encoding of re-encoded levels (default: keep original format); '
+                             'implies --textures')
+    parser.add_argument('--keep-textures', action='store_true',
+                        help='Export textures unchanged in every level (the default; overrides the '
+                             'options above)')
+    parser.add_argument('--optimize', action='store_true',
+                        help='Reorder triangles/vertices for GPU cache locality and better compression')
+    parser.add_argument('--quantize', action='store_true',
+                        help='Write KHR_mesh_quantization levels (int16 positions, int8 normals, uint16 UVs)')
+    parser.add_argument('--quantize-bits', type=lambda text: parse_level_values(text, int),
+                        metavar='LOD=BITS,...',
+                        help='Position bits per level, at most 16 (default: lod0/lod1=16, lod2=14, lod3/lod4=12)')
+    parser.add_argument('--no-error', action='store_true',
+                        help='Do not measure the surface error of each level against the original')
+    parser.add_argument('--clean', action='store_true',
+                        help='Weld vertices and drop degenerate/duplicate faces before decimating')
+    parser.add_argument('--weld-tolerance', type=float,
+                        help='With --clean: weld distance in model units (default: 1e-6 of bbox diagonal)')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild every level, even those the build record shows as up to date')
+    parser.add_argument('--thumbnail', metavar='PNG',
+                        help='Also render a thumbnail from the cheapest level dense enough for it')
+    parser.add_argument('--thumbnail-size', type=int, nargs=2, default=[512, 512], metavar=('WIDTH', 'HEIGHT'),
+                        help='Thumbnail size (default: 512 512)')
+    parser.add_argument('--batch', action='store_true',
+                        help='Process every GLB in a directory or list file')
+    parser.add_argument('--jobs', type=int, default=2,
+                        help='Batch mode: models processed at the same time (default: 2)')
+    add_profile_argument(parser)
     
     args = parser.parse_args()
     
+    if args.cascade and args.preserve_scene:
+        parser.error('--cascade is not supported with --preserve-scene')
+    if args.cascade and args.workers > 1:
+        parser.error('--cascade builds levels one after another and cannot be combined with --workers')
+    if args.batch and args.workers > 1:
+        parser.error('use --jobs to parallelise --batch runs')
+    if args.batch and args.thumbnail:
+        parser.error('--thumbnail names one file and cannot be combined with --batch')
+    
+    with profile_session(args.profile, 'create_lod_advanced'):
+        run(args)
+
+def run(args):
+    """Build the LOD levels (or batch) described by the parsed command line"""
     lod_config = {
         "lod0": args.lod0,
         "lod1": args.lod1,
@@ -196,8 +1166,46 @@ def main():
     
     lod_config = {k: v for k, v in lod_config.items() if v > 0}
     
+    quantize_bits = None
+    if args.quantize:
+        from lod_quantize import DEFAULT_POSITION_BITS
+        quantize_bits = {**DEFAULT_POSITION_BITS, **(args.quantize_bits or {})}
+    
+    # Re-encoding is lossy, so it only runs when asked for
+    texture_options = None
+    if (args.textures or args.texture_scale or args.texture_quality or args.texture_format) \
+            and not args.keep_textures:
+        from lod_textures import DEFAULT_TEXTURE_SCALES, DEFAULT_TEXTURE_QUALITY
+        texture_options = {
+            'scales': {**DEFAULT_TEXTURE_SCALES, **(args.texture_scale or {})},
+            'quality': {**DEFAULT_TEXTURE_QUALITY, **(args.texture_quality or {})},
+            'format': args.texture_format or 'keep'
+        }
+    
     try:
-        create_lod_levels(args.input, args.output, lod_config, args.max_memory)
+        if args.batch:
+            jobs = create_lod_batch(args.input, args.output, lod_config, args.max_memory, args.jobs,
+                                    cascade=args.cascade, max_error=args.max_error,
+                                    out_of_core=args.out_of_core, preserve_scene=args.preserve_scene,
+                                    budget_by=args.budget_by, texture_options=texture_options,
+                                    optimize=args.optimize, quantize_bits=quantize_bits,
+                                    lod_bytes=args.lod_bytes, use_cache=not args.force,
+                                    measure_error=not args.no_error, clean=args.clean,
+                                    weld_tolerance=args.weld_tolerance)
+            failed = [job for job in jobs if job['error']]
+            if failed:
+                print(f"\n❌ {len(failed)} of {len(jobs)} models failed")
+                sys.exit(1)
+        else:
+            create_lod_levels(args.input, args.output, lod_config, args.max_memory,
+                              cascade=args.cascade, max_error=args.max_error, workers=args.workers,
+                              out_of_core=args.out_of_core, preserve_scene=args.preserve_scene,
+                              budget_by=args.budget_by, texture_options=texture_options,
+                              optimize=args.optimize, quantize_bits=quantize_bits,
+                              lod_bytes=args.lod_bytes, use_cache=not args.force,
+                              measure_error=not args.no_error, clean=args.clean,
+                              weld_tolerance=args.weld_tolerance, thumbnail=args.thumbnail,
+                              thumbnail_size=tuple(args.thumbnail_size))
         print("\n✅ LOD models created successfully!")
     except Exception as e:
         print(f"\n❌ Error: {e}")
@@ -209,6 +1217,17 @@ if __name__ == "__main__":
         print("  python3 create_lod_advanced.py model.glb")
         print("  python3 create_lod_advanced.py https://example.com/model.glb")
         print("  python3 create_lod_advanced.py model.glb -o output_dir --lod1 0.6 --lod2 0.3")
+        print("  python3 create_lod_advanced.py model.glb --cascade")
+        print("  python3 create_lod_advanced.py model.glb --lod-bytes lod4=300KB,lod3=600KB,lod2=1.5MB")
+        print("  python3 create_lod_advanced.py model.glb --workers 4")
+        print("  python3 create_lod_advanced.py model.glb --optimize")
+        print("  python3 create_lod_advanced.py scan.glb --clean")
+        print("  python3 create_lod_advanced.py scan.glb --thumbnail public/thumbnails/scan_thumbnail.png")
+        print("  python3 create_lod_advanced.py model.glb --quantize --quantize-bits lod4=10")
+        print("  python3 create_lod_advanced.py scans/ --batch --jobs 4 --max-memory 8192")
+        print("  python3 create_lod_advanced.py huge_scan.glb --out-of-core --max-memory 4096")
+        print("  python3 create_lod_advanced.py scene.glb --preserve-scene --workers 8")
+        print("  python3 create_lod_advanced.py scene.glb --preserve-scene --texture-format webp --texture-scale lod4=0.1")
         print("\nFor more options: python3 create_lod_advanced.py -h")
     else:
         main()
\ No newline at end of file
@@ -2,12 +2,16 @@
 
 import json
 import os
+import re
+import struct
 import sys
 import argparse
 from pathlib import Path
 from datetime import datetime
 import glob
 
+from pipeline_profile import span, add_profile_argument, profile_session
+
 def find_lod_files(model_dir, model_name):
     """Find all LOD files for a model following the naming convention"""
     lod_files = {}
@@ -32,6 +36,15 @@ def find_lod_files(model_dir, model_name):
     
     return lod_files
 
+def read_lod_error(file_path):
+    """Surface error stored in a LOD file by the LOD builder (see lod_error.py), or None"""
+    from glb_stats import read_glb_layout
+    try:
+        gltf, _ = read_glb_layout(file_path)
+    except (OSError, ValueError):
+        return None
+    return gltf.get('asset', {}).get('extras', {}).get('lodError')
+
 def get_quality_for_lod(lod_level):
     """Map LOD level to quality descriptor"""
     quality_map = {
@@ -54,7 +67,150 @@ def get_label_for_lod(lod_level):
     }
     return label_map.get(lod_level, f'Level {lod_level}')
 
-def create_iiif_manifest(model_name, model_dir, base_url, metadata=None, nav_place=None):
+def find_progressive_file(model_dir, model_name, model_dir_relative):
+    """
+    Describe <model_name>_progressive.glb (see create_progressive_mesh.py) as a manifest service
+    
+    The byte ranges let a client fetch the base mesh and then any number of
+    refinement batches with HTTP Range requests.
+    """
+    file_path = os.path.join(model_dir, f"{model_name}_progressive.glb")
+    if not os.path.exists(file_path):
+        return None
+    
+    from glb_stats import read_glb_layout
+    gltf, _ = read_glb_layout(file_path)
+    table = gltf.get('asset', {}).get('extras', {}).get('progressive')
+    if not table:
+        return None
+    
+    model_url = f"{model_dir_relative}/{os.path.basename(file_path)}"
+    base = table['base']
+    return {
+        "id": model_url,
+        "type": "ProgressiveMeshService",
+        "format": "model/gltf-binary",
+        "profile": "https://www.khronos.org/gltf/",
+        "fileSize": os.path.getsize(file_path),
+        "version": table['version'],
+        "compression": table.get('compression', 'none'),
+        "vertices": table['vertices'],
+        "faces": table['faces'],
+        "base": {
+            "byteRange": [base['offset'], base['offset'] + base['length'] - 1],
+            "vertices": base['vertices'],
+            "faces": base['faces']
+        },
+        "batches": [
+            {
+                "byteRange": [batch['offset'], batch['offset'] + batch['length'] - 1],
+                "rawLength": batch.get('rawLength', batch['length']),
+                "vertices": batch['vertices'],
+                "faces": batch['faces']
+            }
+            for batch in table['batches']
+        ]
+    }
+
+def find_tileset(model_dir, model_name, model_dir_relative):
+    """
+    Describe <model_name>_tileset/tileset.json (see create_tileset.py) as a manifest service
+    
+    The tileset is an octree of tile GLBs with geometric errors, for clients
+    that refine by screen-space error instead of switching whole LOD files.
+    """
+    file_path = os.path.join(model_dir, f"{model_name}_tileset", "tileset.json")
+    if not os.path.exists(file_path):
+        return None
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        tileset = json.load(f)
+    
+    tiles = 0
+    depth = 0
+    stack = [(tileset['root'], 0)]
+    while stack:
+        tile, level = stack.pop()
+        tiles += 1
+        depth = max(depth, level)
+        stack.extend((child, level + 1) for child in tile.get('children', []))
+    
+    return {
+        "id": f"{model_dir_relative}/{model_name}_tileset/tileset.json",
+        "type": "Tileset3DService",
+        "format": "application/json",
+        "profile": "http://www.opengis.net/spec/3DTiles/1.1",
+        "version": tileset['asset']['version'],
+        "geometricError": tileset['geometricError'],
+        "tiles": tiles,
+        "depth": depth,
+        "faces": tileset.get('extras', {}).get('faces')
+    }
+
+def read_png_size(file_path):
+    """(width, height) from the IHDR chunk of a PNG file"""
+    with open(file_path, 'rb') as f:
+        header = f.read(24)
+    if len(header) < 24 or header[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError(f"{file_path} is not a PNG file")
+    return struct.unpack('>II', header[16:24])
+
+def find_thumbnails(thumbnails_dir, model_name, base_url):
+    """
+    Sized thumbnail entries of <model_name>_thumbnail.png and its smaller copies (see generate_thumbnail.py)
+    
+    Every size is listed with its width and height so a client downloads the
+    smallest one covering its display size. The largest comes first, so
+    clients reading only the first entry get the full thumbnail.
+    """
+    if not thumbnails_dir or not os.path.isdir(thumbnails_dir):
+        return []
+    
+    pattern = re.compile(rf'^{re.escape(model_name)}_thumbnail(_\d+)?\.png$')
+    thumbnails = []
+    for file in os.listdir(thumbnails_dir):
+        if not pattern.match(file):
+            continue
+        try:
+            width, height = read_png_size(os.path.join(thumbnails_dir, file))
+        except (OSError, ValueError) as e:
+            print(f"Warning: Skipping thumbnail {file}: {e}")
+            continue
+        thumbnails.append({
+            "id": f"{base_url}/thumbnails/{file}",
+            "type": "Image",
+            "format": "image/png",
+            "width": width,
+            "height": height
+        })
+    return sorted(thumbnails, key=lambda thumbnail: thumbnail['width'], reverse=True)
+
+def find_turntable(thumbnails_dir, model_name, base_url):
+    """
+    Describe <model_name>_thumbnail_turntable.png (see generate_thumbnail.py) as a manifest service
+    
+    The sprite sheet holds square views orbiting the model in one row, so the
+    frame count follows from its width and height.
+    """
+    if not thumbnails_dir:
+        return None
+    file_path = os.path.join(thumbnails_dir, f"{model_name}_thumbnail_turntable.png")
+    if not os.path.exists(file_path):
+        return None
+    
+    width, height = read_png_size(file_path)
+    return {
+        "id": f"{base_url}/thumbnails/{os.path.basename(file_path)}",
+        "type": "TurntableSpriteService",
+        "format": "image/png",
+        "width": width,
+        "height": height,
+        "frames": width // height,
+        "frameWidth": height,
+        "frameHeight": height
+    }
+
+def create_iiif_manifest(model_name, model_dir, base_url, metadata=None, nav_place=None, thumbnails_dir=None):
     """Create IIIF manifest for a model with LOD levels
     
     Args:
@@ -63,16 +219,30 @@ def create_iiif_manifest(model_name, model_dir, base_url, metadata=None, nav_pla
         base_url: Base URL for the manifest
         metadata: Additional metadata dictionary
         nav_place: Navigation/camera settings dictionary
+        thumbnails_dir: Directory of the rendered thumbnails; every size found
+            there is listed (default: a single 512x512 thumbnail)
     """
     
     # Find all LOD files
-    lod_files = find_lod_files(model_dir, model_name)
+    with span('scan'):
+        lod_files = find_lod_files(model_dir, model_name)
     
     if not lod_files:
         print(f"Warning: No LOD files found for model '{model_name}' in {model_dir}")
         print(f"Looking for pattern: {model_name}_lod*.glb")
         return None
     
+    # Thumbnail sizes, or the default 512x512 thumbnail when none were found
+    thumbnails = find_thumbnails(thumbnails_dir, model_name, base_url) or [
+        {
+            "id": f"{base_url}/thumbnails/{model_name}_thumbnail.png",
+            "type": "Image",
+            "format": "image/png",
+            "width": 512,
+            "height": 512
+        }
+    ]
+    
     # Calculate total size
     total_size = sum(f['size'] for f in lod_files.values())
     total_size_mb = total_size / (1024 * 1024)
@@ -137,15 +307,7 @@ def create_iiif_manifest(model_name, model_dir, base_url, metadata=None, nav_pla
         "label": {"en": ["3D Model View"]},
         "height": 1000,
         "width": 1000,
-        "thumbnail": [
-            {
-                "id": f"{base_url}/thumbnails/{model_name}_thumbnail.png",
-                "type": "Image",
-                "format": "image/png",
-                "width": 512,
-                "height": 512
-            }
-        ],
+        "thumbnail": [dict(thumbnail) for thumbnail in thumbnails],
         "items": [],
         "annotations": []
     }
@@ -222,6 +384,15 @@ def create_iiif_manifest(model_name, model_dir, base_url, metadata=None, nav_pla
                 }
             ]
         }
+        
+        # Measured deviation from the original, for switching levels by screen-space error
+        lod_error = read_lod_error(file_info['path'])
+        if lod_error:
+            choice_item["service"][0].update({
+                "geometricError": lod_error['hausdorff'],
+                "rmsError": lod_error['rms'],
+                "relativeError": lod_error['relativeHausdorff']
+            })
         choice_items.append(choice_item)
         
         # Add rendering item
@@ -253,16 +424,23 @@ def create_iiif_manifest(model_name, model_dir, base_url, metadata=None, nav_pla
     # Set rendering items
     manifest["rendering"] = rendering_items
     
-    # Set thumbnail (use PNG image)
-    manifest["thumbnail"] = [
-        {
-            "id": f"{base_url}/thumbnails/{model_name}_thumbnail.png",
-            "type": "Image",
-            "format": "image/png",
-            "width": 512,
-            "height": 512
-        }
-    ]
+    # Single-file progressive mesh, if one was encoded for this model
+    progressive = find_progressive_file(model_dir, model_name, model_dir_relative)
+    if progressive:
+        manifest["service"].append(progressive)
+    
+    # Octree tileset, if one was built for this model
+    tileset = find_tileset(model_dir, model_name, model_dir_relative)
+    if tileset:
+        manifest["service"].append(tileset)
+    
+    # Turntable sprite sheet, if one was rendered with the thumbnail
+    turntable = find_turntable(thumbnails_dir, model_name, base_url)
+    if turntable:
+        manifest["service"].append(turntable)
+    
+    # Set thumbnail (use PNG images)
+    manifest["thumbnail"] = thumbnails
     
     return manifest
 
@@ -289,9 +467,17 @@ def main():
     parser.add_argument('--look-at', nargs=3, type=float, metavar=('X', 'Y', 'Z'),
                         help='3D camera look-at target (default: 0 0 0)')
     parser.add_argument('--fov', type=float, help='Field of view in degrees (default: 45)')
+    parser.add_argument('--thumbnails-dir', default='public/thumbnails',
+                        help='Directory of the rendered thumbnails, listed in every size (default: public/thumbnails)')
+    add_profile_argument(parser)
     
     args = parser.parse_args()
     
+    with profile_session(args.profile, 'create_model_manifest'):
+        run(args)
+
+def run(args):
+    """Create and write the manifest described by the parsed command line"""
     # Prepare metadata
     metadata = {
         'label': args.label or args.model_name,
@@ -325,7 +511,8 @@ def main():
         model_dir=args.model_dir,
         base_url=args.url,
         metadata=metadata,
-        nav_place=nav_place if nav_place else None
+        nav_place=nav_place if nav_place else None,
+        thumbnails_dir=args.thumbnails_dir
     )
     
     if manifest:
@@ -337,13 +524,21 @@ def main():
         
         # Write manifest
         os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else '.', exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
+        with span('serialize'), open(output_path, 'w', encoding='utf-8') as f:
             json.dump(manifest, f, indent=2, ensure_ascii=False)
         
         print(f"✅ IIIF manifest created: {output_path}")
         print(f"📊 LOD levels found: {len(manifest['rendering'])}")
         for item in manifest['rendering']:
             print(f"  - {item['label']['en'][0]}")
+        print(f"🖼️  Thumbnail sizes: {', '.join(str(item['width']) for item in manifest['thumbnail'])}")
+        for service in manifest['service']:
+            if service.get('type') == 'ProgressiveMeshService':
+                print(f"📶 Progressive mesh: {len(service['batches'])} refinement batches")
+            elif service.get('type') == 'Tileset3DService':
+                print(f"🧊 Tileset: {service['tiles']} tiles, depth {service['depth']}")
+            elif service.get('type') == 'TurntableSpriteService':
+                print(f"🔄 Turntable: {service['frames']} frames")
     else:
         print("❌ Failed to create manifest")
         sys.exit(1)
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Encode a model as a single progressive mesh file
+
+Instead of one GLB per LOD level, the output holds the coarsest mesh followed
+by ordered refinement batches of vertex splits. Any prefix of the file (the
+base plus the first N batches) decodes to a valid mesh, and the full file
+restores the original geometry exactly, so a client streaming it with HTTP
+Range requests downloads roughly one copy of the data instead of one per level.
+
+File layout: a regular GLB whose mesh is the base level, so any glTF viewer
+shows the coarse model. The BIN chunk continues after the base buffers with
+the refinement batches; the batch table (absolute byte offsets) is stored in
+the JSON chunk under asset.extras.progressive and is published in the IIIF
+manifest by create_model_manifest.py.
+
+The collapse order comes from the quadric decimator (fast_simplification's
+collapse history). Vertices keep their original positions (half-edge
+collapses), so a split only adds one vertex and never moves an existing one.
+
+Each batch is stored deflate-compressed (zlib stream, DecompressionStream
+('deflate') in browsers) unless compression is disabled; the batch table
+gives both the stored and the raw length. Decompressed layout (little
+endian, 4-byte aligned):
+
+    uint32   split_count, face_count, update_count, 0
+    float32  positions[split_count][3]     new vertices, appended in order
+    uint32   faces[face_count][3]          new triangles, appended in order
+    uint32   update_counts[split_count]    index-buffer corners per split
+    uint32   updates[update_count]         index-buffer positions that switch
+                                           to the split's new vertex
+
+A client keeps an index buffer sized for the full mesh: it appends vertices
+and triangles, then applies each split's updates in order (writing the new
+vertex index at each listed position) and draws the triangles so far.
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+import trimesh
+
+from create_lod_advanced import download_model, clean_model_name, write_glb
+from glb_stats import read_glb_layout
+from pipeline_profile import span, add_profile_argument, profile_session
+
+# Fraction of the original faces kept in the base mesh
+DEFAULT_BASE_RATIO = 0.05
+
+# Batches end at these face ratios (each interval is split further by batches_per_level)
+DEFAULT_LEVEL_RATIOS = [0.1, 0.25, 0.5, 1.0]
+
+FORMAT_VERSION = 1
+
+# zlib level for refinement batches
+COMPRESSION_LEVEL = 9
+
+def collapse_history(vertices, faces, base_faces):
+    """
+    Quadric-decimate down to base_faces and return the collapse order
+
+    Returns:
+        (n, 2) int64 array; row k = (kept, removed) for the k-th edge collapse
+    """
+    import fast_simplification
+    target_reduction = 1.0 - base_faces / max(len(faces), 1)
+    _, _, collapses = fast_simplification.simplify(vertices, faces, target_reduction=target_reduction,
+                                                   return_collapses=True)
+    return np.asarray(collapses, dtype=np.int64)
+
+def replay_collapses(faces, collapses):
+    """
+    Replay collapses on the face list, recording what each split must undo
+
+    Returns:
+        Dict with 'alive' (faces surviving in the base mesh), 'base_faces'
+        (their final corners), 'death_step' (collapse that removed each face,
+        -1 if none), 'death_corners' (corners of removed faces just before
+        removal) and 'updates' (per collapse, the (face, corner) pairs that
+        switched from the removed to the kept vertex)
+    """
+    face_count = len(faces)
+    current = faces.tolist()
+
+    # Faces around each vertex; lists only grow, dead faces are skipped
+    order = np.argsort(faces.ravel(), kind='stable')
+    starts = np.searchsorted(faces.ravel()[order], np.arange(faces.max() + 2))
+    face_of = (order // 3).tolist()
+    vertex_faces = {}
+
+    alive = bytearray(b'\x01') * face_count
+    death_step = np.full(face_count, -1, dtype=np.int64)
+    death_corners = {}
+    updates = []
+
+    for step, (kept, removed) in enumerate(collapses.tolist()):
+        step_updates = []
+        around = vertex_faces.pop(removed, None)
+        if around is None:
+            around = face_of[starts[removed]:starts[removed + 1]]
+        kept_faces = vertex_faces.get(kept)
+        if kept_faces is None:
+            kept_faces = vertex_faces[kept] = face_of[starts[kept]:starts[kept + 1]]
+        for face in around:
+            if not alive[face]:
+                continue
+            corners = current[face]
+            if kept in corners:
+                alive[face] = 0
+                death_step[face] = step
+                death_corners[face] = tuple(corners)
+            else:
+                corner = corners.index(removed)
+                corners[corner] = kept
+                step_updates.append((face, corner))
+                kept_faces.append(face)
+        updates.append(step_updates)
+
+    alive = np.frombuffer(bytes(alive), dtype=np.uint8).astype(bool)
+    return {
+        'alive': alive,
+        'base_faces': np.array([current[f] for f in np.flatnonzero(alive)], dtype=np.int64).reshape(-1, 3),
+        'death_step': death_step,
+        'death_corners': death_corners,
+        'updates': updates,
+    }
+
+def batch_boundaries(split_faces, original_faces, level_ratios, batches_per_level):
+    """
+    Split indices (exclusive) at which refinement batches end
+
+    Args:
+        split_faces: Face count after each split, in refinement order
+    """
+    targets = []
+    previous = split_faces[0] if len(split_faces) else 0
+    for ratio in sorted(level_ratios):
+        level_faces = int(original_faces * ratio)
+        for part in range(1, batches_per_level + 1):
+            targets.append(previous + (level_faces - previous) * part / batches_per_level)
+        previous = level_faces
+
+    ends = sorted({int(np.searchsorted(split_faces, target, side='left')) + 1 for target in targets})
+    ends = [min(end, len(split_faces)) for end in ends if end > 0]
+    if not ends or ends[-1] != len(split_faces):
+        ends.append(len(split_faces))
+    return sorted(set(ends))
+
+def encode_progressive(vertices, faces, base_ratio=DEFAULT_BASE_RATIO, level_ratios=None,
+                       batches_per_level=2, compress=True):
+    """
+    Build the base mesh and refinement batches of a progressive mesh
+
+    Returns:
+        (base_vertices, base_faces, batches) where each batch is a dict with
+        its stored 'data', 'raw_length' and the cumulative 'vertices' and
+        'faces' after it
+    """
+    level_ratios = level_ratios or DEFAULT_LEVEL_RATIOS
+    vertices = np.ascontiguousarray(vertices, dtype=np.float64)
+    faces = np.ascontiguousarray(faces, dtype=np.int64)
+
+    collapses = collapse_history(vertices, faces, max(int(len(faces) * base_ratio), 12))
+    replay = replay_collapses(faces, collapses)
+
+    # Client numbering: base vertices in original order, then one vertex per split
+    removed = collapses[:, 1]
+    survivors = np.setdiff1d(np.unique(faces), removed)
+    split_order = removed[::-1]
+    new_index = np.full(len(vertices), -1, dtype=np.int64)
+    new_index[survivors] = np.arange(len(survivors))
+    new_index[split_order] = len(survivors) + np.arange(len(split_order))
+
+    # Triangles restored by each split (collapse steps in refinement order)
+    death_step = replay['death_step']
+    dead = np.flatnonzero(death_step >= 0)
+    dead = dead[np.argsort(-death_step[dead], kind='stable')]
+    step_of_dead = death_step[dead]
+    face_index = np.full(len(faces), -1, dtype=np.int64)
+    face_index[np.flatnonzero(replay['alive'])] = np.arange(int(replay['alive'].sum()))
+    face_index[dead] = int(replay['alive'].sum()) + np.arange(len(dead))
+
+    steps = np.arange(len(collapses))[::-1]
+    restored_per_split = np.bincount(len(collapses) - 1 - step_of_dead, minlength=len(collapses))
+    split_faces = int(replay['alive'].sum()) + np.cumsum(restored_per_split)
+
+    ends = batch_boundaries(split_faces, len(faces), level_ratios, batches_per_level)
+    batches = []
+    start = 0
+    face_cursor = 0
+    for end in ends:
+        batch_steps = steps[start:end]
+        batch_face_count = int(restored_per_split[start:end].sum())
+        batch_faces = dead[face_cursor:face_cursor + batch_face_count]
+        face_cursor += batch_face_count
+
+        positions = vertices[removed[batch_steps]].astype(np.float32)
+        if len(batch_faces):
+            corners = np.array([replay['death_corners'][f] for f in batch_faces], dtype=np.int64)
+            new_faces = new_index[corners].astype(np.uint32)
+        else:
+            new_faces = np.zeros((0, 3), dtype=np.uint32)
+        update_counts = np.array([len(replay['updates'][step]) for step in batch_steps], dtype=np.uint32)
+        update_positions = np.array([face_index[face] * 3 + corner for step in batch_steps
+                                     for face, corner in replay['updates'][step]], dtype=np.uint32)
+
+        data = b''.join([
+            struct.pack('<4I', len(batch_steps), len(new_faces), len(update_positions), 0),
+            positions.tobytes(), new_faces.tobytes(), update_counts.tobytes(), update_positions.tobytes(),
+        ])
+        batches.append({
+            'data': zlib.compress(data, COMPRESSION_LEVEL) if compress else data,
+            'raw_length': len(data),
+            'vertices': len(survivors) + end,
+            'faces': int(split_faces[end - 1]),
+        })
+        start = end
+
+    base_vertices = vertices[survivors].astype(np.float32)
+    base_faces = new_index[replay['base_faces']].astype(np.uint32)
+    return base_vertices, base_faces, batches
+
+def write_progressive_glb(output_file, base_vertices, base_faces, batches, total_vertices, total_faces,
+                          compress=True):
+    """
+    Write the base mesh as a GLB and append the refinement batches to its BIN chunk
+
+    Returns:
+        The progressive batch table stored in the file (absolute byte offsets)
+    """
+    positions = base_vertices.tobytes()
+    indices = base_faces.tobytes()
+    base_length = len(positions) + len(indices)
+
+    def gltf_with(table):
+        return {
+            "asset": {"version": "2.0", "generator": "create_progressive_mesh.py",
+                      "extras": {"progressive": table}},
+            "scene": 0,
+            "scenes": [{"nodes": [0]}],
+            "nodes": [{"mesh": 0}],
+            "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "mode": 4}]}],
+            "accessors": [
+                {"bufferView": 0, "componentType": 5126, "count": len(base_vertices), "type": "VEC3",
+                 "min": base_vertices.min(axis=0).tolist(), "max": base_vertices.max(axis=0).tolist()},
+                {"bufferView": 1, "componentType": 5125, "count": base_faces.size, "type": "SCALAR"},
+            ],
+            "bufferViews": [
+                {"buffer": 0, "byteOffset": 0, "byteLength": len(positions), "target": 34962},
+                {"buffer": 0, "byteOffset": len(positions), "byteLength": len(indices), "target": 34963},
+            ],
+            "buffers": [{"byteLength": base_length + sum(len(b['data']) for b in batches)}],
+        }
+
+    # Offsets depend on the JSON length, which depends on the offsets: settle them
+    # by re-serializing until the padded JSON chunk stops growing
+    table = None
+    json_length = 0
+    for _ in range(5):
+        bin_start = 12 + 8 + json_length + 8
+        offset = bin_start + base_length
+        entries = []
+        for batch in batches:
+            entries.append({'offset': offset, 'length': len(batch['data']), 'rawLength': batch['raw_length'],
+                            'vertices': batch['vertices'], 'faces': batch['faces']})
+            offset += len(batch['data'])
+        table = {
+            'version': FORMAT_VERSION,
+            'compression': 'deflate' if compress else 'none',
+            'vertices': total_vertices,
+            'faces': total_faces,
+            'base': {'offset': 0, 'length': bin_start + base_length,
+                     'vertices': len(base_vertices), 'faces': len(base_faces)},
+            'batches': entries,
+        }
+        encoded = json.dumps(gltf_with(table), separators=(',', ':')).encode('utf-8')
+        padded = len(encoded) + (-len(encoded)) % 4
+        if padded == json_length:
+            break
+        json_length = padded
+
+    write_glb(output_file, gltf_with(table), positions + indices + b''.join(b['data'] for b in batches))
+    return table
+
+def read_progressive_table(glb_path):
+    """Read the batch table of a progressive GLB (JSON chunk only)"""
+    gltf, _ = read_glb_layout(glb_path)
+    return gltf.get('asset', {}).get('extras', {}).get('progressive')
+
+def decode_progressive(glb_path, batch_count=None):
+    """
+    Decode a progressive GLB up to batch_count refinement batches
+
+    Returns:
+        (vertices, faces) of the refined mesh
+    """
+    table = read_progressive_table(glb_path)
+    with open(glb_path, 'rb') as f:
+        data = f.read()
+    gltf, layout = read_glb_layout(glb_path)
+    bin_start = layout['bin_range'][0]
+    base = table['base']
+    vertices = np.zeros((table['vertices'], 3), dtype=np.float32)
+    indices = np.zeros(table['faces'] * 3, dtype=np.uint32)
+    vertices[:base['vertices']] = np.frombuffer(data, np.float32, base['vertices'] * 3, bin_start).reshape(-1, 3)
+    views = gltf['bufferViews']
+    indices[:base['faces'] * 3] = np.frombuffer(data, np.uint32, base['faces'] * 3,
+                                                bin_start + views[1]['byteOffset'])
+
+    vertex_count, face_count = base['vertices'], base['faces']
+    for entry in table['batches'][:batch_count]:
+        batch = data[entry['offset']:entry['offset'] + entry['length']]
+        if table.get('compression') == 'deflate':
+            batch = zlib.decompress(batch)
+        offset = 0
+        split_count, new_faces, update_count, _ = struct.unpack_from('<4I', batch, offset)
+        offset += 16
+        vertices[vertex_count:vertex_count + split_count] = np.frombuffer(
+            batch, np.float32, split_count * 3, offset).reshape(-1, 3)
+        offset += split_count * 12
+        indices[face_count * 3:(face_count + new_faces) * 3] = np.frombuffer(batch, np.uint32, new_faces * 3, offset)
+        offset += new_faces * 12
+        counts = np.frombuffer(batch, np.uint32, split_count, offset)
+        offset += split_count * 4
+        positions = np.frombuffer(batch, np.uint32, update_count, offset)
+        # Later splits override earlier ones, which fancy assignment does in order
+        indices[positions] = np.repeat(np.arange(vertex_count, vertex_count + split_count, dtype=np.uint32), counts)
+        vertex_count += split_count
+        face_count += new_faces
+
+    return vertices[:vertex_count], indices[:face_count * 3].reshape(-1, 3)
+
+def create_progressive_mesh(input_source, output_dir="lod_models", base_ratio=DEFAULT_BASE_RATIO,
+                            level_ratios=None, batches_per_level=2, compress=True):
+    """
+    Encode a model as <name>_progressive.glb
+
+    Returns:
+        Path of the written file
+    """
+    if input_source.startswith(('http://', 'https://')):
+        input_file = download_model(input_source)
+    else:
+        input_file = input_source
+        if not os.path.exists(input_file):
+            raise FileNotFoundError(f"Model file not found: {input_file}")
+
+    print(f"\nLoading model: {input_file}")
+    with span('load', file=os.path.basename(input_file)):
+        mesh = trimesh.load(input_file, force='mesh', process=False)
+        # Split seams would decimate into cracks; only positions are encoded
+        mesh.merge_vertices(merge_tex=True, merge_norm=True)
+        mesh.remove_unreferenced_vertices()
+    print(f"Geometry: {len(mesh.faces):,} faces, {len(mesh.vertices):,} vertices")
+
+    start_time = time.time()
+    with span('encode', faces=len(mesh.faces)):
+        base_vertices, base_faces, batches = encode_progressive(
+            mesh.vertices.view(np.ndarray), mesh.faces.view(np.ndarray), base_ratio, level_ratios,
+            batches_per_level, compress)
+    encode_time = time.time() - start_time
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"{clean_model_name(input_file)}_progressive.glb")
+    with span('serialize'):
+        table = write_progressive_glb(output_file, base_vertices, base_faces, batches,
+                                      len(mesh.vertices), len(mesh.faces), compress)
+
+    size = os.path.getsize(output_file)
+    print(f"\n  ✓ Base: {table['base']['faces']:,} faces, {table['base']['length'] / 1024:,.0f} KB")
+    for index, entry in enumerate(table['batches']):
+        print(f"    Batch {index + 1}: +{entry['length'] / 1024:,.0f} KB -> {entry['faces']:,} faces "
+              f"({entry['faces'] / len(mesh.faces) * 100:.1f}%) at byte {entry['offset']:,}")
+    print(f"    File: {output_file}")
+    print(f"    Size: {size / (1024 * 1024):.2f} MB "
+          f"(plain GLB of the same mesh: {(len(mesh.vertices) * 12 + len(mesh.faces) * 12) / (1024 * 1024):.2f} MB)")
+    print(f"    Time: {encode_time:.2f}s")
+    return output_file
+
+def main():
+    parser = argparse.ArgumentParser(description='Encode a model as a single progressive mesh GLB')
+    parser.add_argument('input', help='Path or URL to GLB model')
+    parser.add_argument('-o', '--output', default='lod_models', help='Output directory (default: lod_models)')
+    parser.add_argument('--base', type=float, default=DEFAULT_BASE_RATIO,
+                        help=f'Face ratio of the base mesh (default: {DEFAULT_BASE_RATIO})')
+    parser.add_argument('--levels', type=lambda text: [float(x) for x in text.split(',')],
+                        default=DEFAULT_LEVEL_RATIOS,
+                        help='Face ratios where batches end, comma separated (default: 0.1,0.25,0.5,1.0)')
+    parser.add_argument('--batches-per-level', type=int, default=2,
+                        help='Batches between consecutive levels (default: 2)')
+    parser.add_argument('--no-compress', action='store_true',
+                        help='Store refinement batches without deflate compression')
+    add_profile_argument(parser)
+
+    args = parser.parse_args()
+
+    with profile_session(args.profile, 'create_progressive_mesh'):
+        run(args)
+
+def run(args):
+    """Encode the progressive mesh for the parsed command line"""
+    try:
+        create_progressive_mesh(args.input, args.output, args.base, args.levels, args.batches_per_level,
+                                not args.no_compress)
+        print("\n✅ Progressive mesh created successfully!")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        print("Usage examples:")
+        print("  python3 create_progressive_mesh.py model.glb")
+        print("  python3 create_progressive_mesh.py model.glb -o public/data/models/model --base 0.02")
+        print("  python3 create_progressive_mesh.py model.glb --levels 0.1,0.5,1.0 --batches-per-level 4")
+        print("\nFor more options: python3 create_progressive_mesh.py -h")
+    else:
+        main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Split a model into an octree of 3D Tiles
+
+The scene is flattened to world space and its faces are sorted into an
+octree by centroid, splitting any cell with more than the tile face budget.
+Leaf tiles hold the full-resolution faces of their cell. Every inner tile
+holds its children's content decimated back to the tile budget, so each
+region of the model is available at one resolution per octree depth (a
+hierarchical LOD with "REPLACE" refinement).
+
+A tile's geometric error is the measured maximum deviation of its content
+from its children's content (in model units), plus the largest error among
+its children; leaves have zero error. Inner tiles also get their textures
+halved per level above the leaves.
+
+Output: <name>_tileset/tileset.json and <name>_tileset/tiles/<id>.glb,
+referenced by create_model_manifest.py. Tile images are written once to
+<name>_tileset/tiles/textures/ and referenced by URI: every leaf of a part
+would otherwise embed its whole texture. Tiles are built in parallel worker
+processes; a tile is submitted as soon as all of its children are done.
+
+Tile content is glTF (y-up); bounding volumes are written in the tileset's
+z-up frame as the 3D Tiles specification expects.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import trimesh
+
+from create_lod_advanced import (download_model, clean_model_name, export_level, geometry_weight,
+                                 allocate_face_budget, decimate_geometry, transfer_visuals,
+                                 build_error_reference, measure_lod_error)
+from pipeline_profile import span, add_profile_argument, profile_session
+
+# Faces per tile, for leaves and for the decimated content of inner tiles
+DEFAULT_TILE_FACES = 50000
+
+DEFAULT_MAX_DEPTH = 6
+
+# Inner tile textures are halved per level above the leaves, down to this scale
+MIN_TEXTURE_SCALE = 0.125
+
+TILES_VERSION = '1.1'
+
+def world_parts(scene):
+    """
+    Flatten a scene into world-space meshes, one per source geometry
+
+    Instances of a geometry share its material, so they are merged into one
+    part; tiles keep one primitive per part.
+
+    Returns:
+        {geometry name: Trimesh}
+    """
+    instances = {}
+    for mesh in scene.dump(concatenate=False):
+        if isinstance(mesh, trimesh.Trimesh) and len(mesh.faces):
+            instances.setdefault(mesh.metadata.get('name', 'mesh'), []).append(mesh)
+    return {name: meshes[0] if len(meshes) == 1 else trimesh.util.concatenate(meshes)
+            for name, meshes in instances.items()}
+
+def build_octree(centroids, lower, upper, max_tile_faces, max_depth):
+    """
+    Sort faces into octree cells by centroid
+
+    Args:
+        centroids: (n, 3) face centroids
+        lower, upper: Corners of the root cell
+
+    Returns:
+        Root node dict (id, depth, children, and 'faces' indices for leaves);
+        empty cells are left out
+    """
+    def split(node_id, indices, lower, upper, depth):
+        node = {'id': node_id, 'depth': depth, 'children': []}
+        if len(indices) <= max_tile_faces or depth >= max_depth:
+            node['faces'] = indices
+            return node
+
+        center = (lower + upper) / 2
+        above = centroids[indices] >= center
+        octants = above[:, 0] * 1 + above[:, 1] * 2 + above[:, 2] * 4
+        for octant in range(8):
+            selected = indices[octants == octant]
+            if not len(selected):
+                continue
+            high = np.array([octant & 1, octant & 2, octant & 4], dtype=bool)
+            child_lower = np.where(high, center, lower)
+            child_upper = np.where(high, upper, center)
+            node['children'].append(split(f"{node_id}_{octant}", selected, child_lower, child_upper, depth + 1))
+        return node
+
+    return split('0', np.arange(len(centroids)), lower, upper, 0)
+
+def leaf_parts(parts, names, part_index, local_index, faces):
+    """Full-resolution content of a leaf: its faces of every part, keeping materials"""
+    content = {}
+    for part in np.unique(part_index[faces]):
+        selected = local_index[faces][part_index[faces] == part]
+        name = names[part]
+        content[name] = parts[name].submesh([selected], append=True)
+    return content
+
+def merge_parts(contents):
+    """Union of several tiles' content, merging parts of the same source geometry"""
+    grouped = {}
+    for content in contents:
+        for name, mesh in content.items():
+            grouped.setdefault(name, []).append(mesh)
+    return {name: meshes[0] if len(meshes) == 1 else trimesh.util.concatenate(meshes)
+            for name, meshes in grouped.items()}
+
+def build_tile(parts, target_faces, output_file, texture_dir, texture_scale=1.0, error_samples=20000):
+    """
+    Process pool worker: decimate one tile's content to target_faces and export it
+
+    The face budget is split across parts by area. The error is measured
+    against the undecimated content. Images are moved to texture_dir (see
+    lod_textures.share_glb_textures); the returned size leaves them out.
+
+    Returns:
+        (content, faces, error, size): the exported parts, their face count,
+        the maximum deviation in model units and the GLB size in bytes
+    """
+    faces = sum(len(mesh.faces) for mesh in parts.values())
+    error = 0.0
+
+    if target_faces and faces > target_faces:
+        names = list(parts)
+        targets = allocate_face_budget([len(parts[name].faces) for name in names],
+                                       [geometry_weight(parts[name], 'area') for name in names], target_faces)
+        tree, diagonal = build_error_reference(trimesh.util.concatenate(list(parts.values())), error_samples * 2)
+
+        simplified = {}
+        for name, target in zip(names, targets):
+            if target < len(parts[name].faces):
+                vertices, new_faces = decimate_geometry(parts[name].vertices.view(np.ndarray),
+                                                        parts[name].faces.view(np.ndarray), int(target))
+                simplified[name] = transfer_visuals(parts[name], vertices, new_faces)
+            else:
+                simplified[name] = parts[name]
+        parts = simplified
+        faces = sum(len(mesh.faces) for mesh in parts.values())
+
+        max_error, _ = measure_lod_error(tree, trimesh.util.concatenate(list(parts.values())), diagonal,
+                                         error_samples)
+        error = max_error * diagonal
+
+    export_level(trimesh.Scene(geometry=parts), output_file)
+    if texture_scale < 1.0:
+        from lod_textures import process_glb_textures
+        process_glb_textures(output_file, texture_scale, workers=1)
+    from lod_textures import share_glb_textures
+    share_glb_textures(output_file, texture_dir)
+
+    return parts, faces, error, os.path.getsize(output_file)
+
+def bounding_box(lower, upper):
+    """3D Tiles box (center and half axes) of a y-up glTF bounding box, in the z-up tileset frame"""
+    center = (lower + upper) / 2
+    half = (upper - lower) / 2
+    return [float(center[0]), float(-center[2]), float(center[1]),
+            float(half[0]), 0.0, 0.0,
+            0.0, float(half[2]), 0.0,
+            0.0, 0.0, float(half[1])]
+
+def tile_height(node):
+    """Levels between a node and its deepest leaf"""
+    return 1 + max((tile_height(child) for child in node['children']), default=-1)
+
+def create_tileset(input_source, output_dir="lod_models", max_tile_faces=DEFAULT_TILE_FACES,
+                   max_depth=DEFAULT_MAX_DEPTH, workers=None):
+    """
+    Write <name>_tileset/tileset.json and its tile GLBs
+
+    Returns:
+        Path of the tileset JSON
+    """
+    if input_source.startswith(('http://', 'https://')):
+        input_file = download_model(input_source)
+    else:
+        input_file = input_source
+        if not os.path.exists(input_file):
+            raise FileNotFoundError(f"Model file not found: {input_file}")
+
+    print(f"\nLoading scene: {input_file}")
+    start_time = time.time()
+    with span('load', file=os.path.basename(input_file)):
+        scene = trimesh.load(input_file, force='scene', process=False)
+        parts = world_parts(scene)
+    if not parts:
+        raise ValueError("No valid mesh geometry found in the scene")
+
+    names = list(parts)
+    part_index = np.concatenate([np.full(len(parts[name].faces), i) for i, name in enumerate(names)])
+    local_index = np.concatenate([np.arange(len(parts[name].faces)) for name in names])
+    centroids = np.vstack([parts[name].triangles_center for name in names])
+    lower = np.min([parts[name].bounds[0] for name in names], axis=0)
+    upper = np.max([parts[name].bounds[1] for name in names], axis=0)
+    total_faces = len(centroids)
+    print(f"Geometry: {total_faces:,} faces in {len(names)} parts ({time.time() - start_time:.2f}s)")
+
+    with span('octree', faces=total_faces):
+        root = build_octree(centroids, lower, upper, max_tile_faces, max_depth)
+    nodes = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        for child in node['children']:
+            child['parent'] = node
+            stack.append(child)
+    textured = any(isinstance(mesh.visual, trimesh.visual.TextureVisuals) for mesh in parts.values())
+    print(f"Octree: {len(nodes)} tiles, {sum(1 for node in nodes if not node['children'])} leaves, "
+          f"depth {max(node['depth'] for node in nodes)}")
+
+    tileset_dir = os.path.join(output_dir, f"{clean_model_name(input_file)}_tileset")
+    texture_dir = os.path.join(tileset_dir, 'tiles', 'textures')
+    os.makedirs(os.path.join(tileset_dir, 'tiles'), exist_ok=True)
+
+    print(f"\nBuilding tiles (budget {max_tile_faces:,} faces per tile)...")
+    start_time = time.time()
+    done = {}
+    total_size = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit(node):
+            uri = f"tiles/{node['id']}.glb"
+            if node['children']:
+                content = merge_parts(done[child['id']]['content'] for child in node['children'])
+                texture_scale = max(0.5 ** tile_height(node), MIN_TEXTURE_SCALE) if textured else 1.0
+                future = executor.submit(build_tile, content, max_tile_faces, os.path.join(tileset_dir, uri),
+                                         texture_dir, texture_scale)
+            else:
+                content = leaf_parts(parts, names, part_index, local_index, node['faces'])
+                future = executor.submit(build_tile, content, None, os.path.join(tileset_dir, uri), texture_dir)
+            pending[future] = node
+
+        pending = {}
+        for node in nodes:
+            if not node['children']:
+                submit(node)
+
+        while pending:
+            with span('wait_tiles', pending=len(pending)):
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                node = pending.pop(future)
+                content, faces, error, size = future.result()
+                total_size += size
+
+                children = [done[child['id']] for child in node['children']]
+                bounds = [mesh.bounds for mesh in content.values()] + [child['bounds'] for child in children]
+                done[node['id']] = {
+                    'content': content,
+                    'bounds': np.array([np.min([b[0] for b in bounds], axis=0),
+                                        np.max([b[1] for b in bounds], axis=0)]),
+                    'error': error + max((child['error'] for child in children), default=0.0),
+                    'faces': faces,
+                }
+                # Children's content is only needed to build their parent
+                for child in children:
+                    child['content'] = None
+
+                parent = node.get('parent')
+                if parent and all(child['id'] in done for child in parent['children']):
+                    submit(parent)
+
+    def tile_json(node):
+        tile = done[node['id']]
+        entry = {
+            'boundingVolume': {'box': bounding_box(*tile['bounds'])},
+            'geometricError': round(tile['error'], 6),
+            'refine': 'REPLACE',
+            'content': {'uri': f"tiles/{node['id']}.glb"},
+            'extras': {'faces': tile['faces']},
+        }
+        if node['children']:
+            entry['children'] = [tile_json(child) for child in node['children']]
+        return entry
+
+    root_tile = tile_json(root)
+    tileset = {
+        'asset': {'version': TILES_VERSION, 'generator': 'create_tileset.py'},
+        # Error of showing nothing at all: the size of the model
+        'geometricError': round(float(np.linalg.norm(upper - lower)), 6),
+        'root': root_tile,
+        'extras': {'faces': total_faces, 'tileFaces': max_tile_faces},
+    }
+    tileset_file = os.path.join(tileset_dir, 'tileset.json')
+    with span('serialize'), open(tileset_file, 'w', encoding='utf-8') as f:
+        json.dump(tileset, f, indent=2)
+
+    print(f"\n  ✓ {len(nodes)} tiles in {time.time() - start_time:.2f}s")
+    for depth in range(max(node['depth'] for node in nodes) + 1):
+        level = [done[node['id']] for node in nodes if node['depth'] == depth]
+        print(f"    Depth {depth}: {len(level)} tiles, {sum(tile['faces'] for tile in level):,} faces, "
+              f"max error {max(tile['error'] for tile in level):.4g}")
+    texture_size = 0
+    if os.path.isdir(texture_dir):
+        texture_size = sum(entry.stat().st_size for entry in os.scandir(texture_dir))
+    print(f"    Tileset: {tileset_file}")
+    print(f"    Size: {(total_size + texture_size) / (1024 * 1024):.2f} MB "
+          f"({texture_size / (1024 * 1024):.2f} MB of shared textures)")
+    return tileset_file
+
+def main():
+    parser = argparse.ArgumentParser(description='Split a model into an octree of 3D Tiles')
+    parser.add_argument('input', help='Path or URL to GLB model')
+    parser.add_argument('-o', '--output', default='lod_models', help='Output directory (default: lod_models)')
+    parser.add_argument('--tile-faces', type=int, default=DEFAULT_TILE_FACES,
+                        help=f'Maximum faces per tile (default: {DEFAULT_TILE_FACES})')
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_MAX_DEPTH,
+                        help=f'Maximum octree depth (default: {DEFAULT_MAX_DEPTH})')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes building tiles (default: CPU count)')
+    add_profile_argument(parser)
+
+    args = parser.parse_args()
+
+    with profile_session(args.profile, 'create_tileset'):
+        run(args)
+
+def run(args):
+    """Build the tileset for the parsed command line"""
+    try:
+        create_tileset(args.input, args.output, args.tile_faces, args.max_depth, args.workers)
+        print("\n✅ Tileset created successfully!")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        print("Usage examples:")
+        print("  python3 create_tileset.py model.glb")
+        print("  python3 create_tileset.py model.glb -o public/data/models/model --tile-faces 20000")
+        print("  python3 create_tileset.py model.glb --max-depth 4 --workers 8")
+        print("\nFor more options: python3 create_tileset.py -h")
+    else:
+        main()
@@ -10,7 +10,30 @@ import os
 import sys
 import argparse
 
-def generate_thumbnail(glb_path, output_path, size=(512, 512), bg_color=(240, 240, 240)):
+from pipeline_profile import span, add_profile_argument, profile_session
+
+def save_pyramid(image, output_path, size, pyramid=None):
+    """
+    Save smaller copies of a thumbnail render, area-resampled, next to the thumbnail
+    
+    Args:
+        image: The render, at the thumbnail size or larger
+        output_path: Path of the thumbnail; copies are saved as <base>_<width>.png
+        size: Tuple of (width, height) of the thumbnail; only narrower widths are saved
+        pyramid: Widths to save (default PYRAMID_WIDTHS)
+    """
+    from thumbnail_raster import PYRAMID_WIDTHS, resample_pyramid
+    from thumbnail_batch import save_png_atomic, variant_path
+    
+    widths = [width for width in (PYRAMID_WIDTHS if pyramid is None else pyramid) if width < size[0]]
+    with span('pyramid', widths=len(widths)):
+        for width, variant in resample_pyramid(image, widths).items():
+            save_png_atomic(variant, variant_path(output_path, width))
+    if widths:
+        print(f"Saved {len(widths)} smaller sizes ({', '.join(str(width) for width in widths)} px wide)")
+
+def generate_thumbnail(glb_path, output_path, size=(512, 512), bg_color=(240, 240, 240), model=None,
+                       pyramid=None, turntable=0, turntable_size=256):
     """
     Generate a thumbnail image from a GLB file
     
@@ -19,39 +42,54 @@ def generate_thumbnail(glb_path, output_path, size=(512, 512), bg_color=(240, 24
         output_path: Path to save the thumbnail image
         size: Tuple of (width, height) for the thumbnail
         bg_color: Background color as RGB tuple
+        model: Already loaded trimesh.Scene or Trimesh to render instead of
+            loading glb_path (it is not modified)
+        pyramid: Widths of the smaller copies saved as <base>_<width>.png
+            (default PYRAMID_WIDTHS; an empty list saves none)
+        turntable: Frames of a turntable sprite sheet saved as
+            <base>_turntable.png (0 for none)
+        turntable_size: Edge of the square turntable frames in pixels
     """
-    print(f"Loading model from {glb_path}...")
-    
-    # Load the GLB file
-    scene = trimesh.load(glb_path, force='scene')
-    
-    # Get the mesh from the scene
-    if hasattr(scene, 'geometry'):
-        # Combine all geometries
-        meshes = list(scene.geometry.values())
-        if meshes:
-            mesh = trimesh.util.concatenate(meshes)
-        else:
-            print("No geometry found in the scene")
-            return False
+    if model is None:
+        print(f"Loading model from {glb_path}...")
+        
+        # Load the GLB file
+        with span('load'):
+            scene = trimesh.load(glb_path, force='scene')
     else:
-        mesh = scene
+        scene = model if isinstance(model, trimesh.Scene) else trimesh.Scene(model)
+    
+    # Merge the scene in world space, keeping repeated geometry instanced
+    from scene_merge import merge_scene
+    with span('concatenate', geometries=len(scene.geometry), nodes=len(scene.graph.nodes_geometry)):
+        mesh, instances = merge_scene(scene, keep_instances=True)
+    if mesh is None and not instances:
+        print("No geometry found in the scene")
+        return False
     
-    # Create a scene for rendering
-    scene_for_render = trimesh.Scene(mesh)
+    # Create a scene for rendering; instanced geometry is stored once and placed per node
+    scene_for_render = trimesh.Scene(mesh) if mesh is not None else trimesh.Scene()
+    for name, (geometry, transforms) in instances.items():
+        scene_for_render.add_geometry(geometry, geom_name=name, transform=transforms[0])
+        for i, transform in enumerate(transforms[1:], 1):
+            scene_for_render.graph.update(frame_from=scene_for_render.graph.base_frame,
+                                          frame_to=f"{name}_instance_{i}", matrix=transform, geometry=name)
     
-    # Set up camera to view the entire mesh
-    # Get the bounding box of the mesh
-    bounds = mesh.bounds
-    center = mesh.centroid
-    extents = mesh.extents
+    # Set up camera to view the entire model
+    # Get the bounding box of the model
+    bounds = scene_for_render.bounds
+    center = scene_for_render.centroid
+    extents = scene_for_render.extents
     
     # Calculate camera distance based on model size
     max_extent = max(extents)
     camera_distance = max_extent * 2.5
     
     # Set camera position (looking at the model from a 45-degree angle)
-    camera_position = center + np.array([camera_distance * 0.7, camera_distance * 0.5, camera_distance * 0.7])
+    from thumbnail_raster import (VIEW_DIRECTION, LIGHT_DIRECTIONS, look_at, prepare_parts, render_prepared,
+                                  render_turntable)
+    view_direction = np.array(VIEW_DIRECTION) / np.linalg.norm(VIEW_DIRECTION)
+    camera_position = center + view_direction * camera_distance
     
     # Create camera with proper field of view
     camera = trimesh.scene.Camera(
@@ -63,30 +101,24 @@ def generate_thumbnail(glb_path, output_path, size=(512, 512), bg_color=(240, 24
     scene_for_render.camera = camera
     
     # Set camera view
-    scene_for_render.set_camera(
-        angles=[np.radians(30), np.radians(45), 0],
-        distance=camera_distance,
-        center=center
-    )
+    scene_for_render.camera_transform = np.linalg.inv(look_at(camera_position, center))
     
     # Add lighting
-    # Create directional lights for better visualization
-    light_directions = [
-        [1, 1, 1],
-        [-1, 1, 0.5],
-        [0, -0.5, 1]
-    ]
-    
+    # Create directional lights for better visualization; a light shines
+    # down the -Z axis of its node
     lights = []
-    for direction in light_directions:
-        light = trimesh.scene.lighting.DirectionalLight(
-            color=[255, 255, 255],
-            direction=direction
-        )
+    for direction in LIGHT_DIRECTIONS:
+        light = trimesh.scene.lighting.DirectionalLight(color=[255, 255, 255])
+        scene_for_render.graph[light.name] = trimesh.geometry.align_vectors(
+            [0, 0, -1], -np.asarray(direction, dtype=np.float64))
         lights.append(light)
     
     scene_for_render.lights = lights
     
+    # Meshes placed for the software rasterizer, shared by every view of it
+    parts = [(mesh, None)] + list(instances.values())
+    prepared = None
+    
     try:
         # Render the scene to an image
         print(f"Rendering thumbnail...")
@@ -95,63 +127,51 @@ def generate_thumbnail(glb_path, output_path, size=(512, 512), bg_color=(240, 24
         # Note: This requires pyglet or other rendering backend
         try:
             # Try to render with the scene's built-in method
-            image_data = scene_for_render.save_image(resolution=size, visible=False)
+            with span('render'):
+                image_data = scene_for_render.save_image(resolution=size, visible=False)
             
             # Convert bytes to PIL Image
             from io import BytesIO
             image = Image.open(BytesIO(image_data))
+            render = image
             
         except Exception as e:
             print(f"Failed to render with built-in renderer: {e}")
-            print("Trying alternative method...")
+            print("Rendering with the software rasterizer...")
             
-            # Alternative: Use trimesh's simple rendering
-            from trimesh.viewer import windowed
+            # Same camera and lights, z-buffered and shaded in NumPy (no display needed)
+            with span('render', renderer='raster'):
+                prepared = prepare_parts(parts)
+                render = render_prepared(prepared, size, bg_color, view_direction=view_direction,
+                                         light_directions=LIGHT_DIRECTIONS, distance_scale=2.5)
+            image = render.resize(size, Image.BOX)
             
-            # Get a simple rendered view
-            # This creates a basic orthographic projection
-            rotation_matrix = trimesh.transformations.rotation_matrix(
-                np.radians(30), [1, 0, 0]
-            ) @ trimesh.transformations.rotation_matrix(
-                np.radians(45), [0, 1, 0]
-            )
-            
-            mesh.apply_transform(rotation_matrix)
-            
-            # Project to 2D
-            vertices_2d = mesh.vertices[:, [0, 2]]  # Use X and Z coordinates
-            
-            # Normalize to image coordinates
-            min_vals = vertices_2d.min(axis=0)
-            max_vals = vertices_2d.max(axis=0)
-            vertices_2d = (vertices_2d - min_vals) / (max_vals - min_vals)
-            
-            # Scale to image size with padding
-            padding = 50
-            vertices_2d = vertices_2d * (np.array(size) - 2 * padding) + padding
-            
-            # Create image
-            image = Image.new('RGB', size, bg_color)
-            
-            # Draw the mesh edges as a wireframe
-            from PIL import ImageDraw
-            draw = ImageDraw.Draw(image)
-            
-            if hasattr(mesh, 'faces'):
-                for face in mesh.faces[:1000]:  # Limit faces for performance
-                    points = vertices_2d[face]
-                    for i in range(len(face)):
-                        p1 = tuple(points[i].astype(int))
-                        p2 = tuple(points[(i + 1) % len(face)].astype(int))
-                        draw.line([p1, p2], fill=(100, 100, 100), width=1)
-            
-            print("Created wireframe thumbnail as fallback")
+            print("Rendered thumbnail with the software rasterizer")
         
         # Save the thumbnail
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        image.save(output_path, 'PNG')
+        from thumbnail_batch import save_png_atomic
+        save_png_atomic(image, output_path)
         print(f"Thumbnail saved to {output_path}")
         
+        # Smaller sizes come from the same render, which is supersampled with the rasterizer
+        save_pyramid(render, output_path, size, pyramid)
+        
+        if turntable:
+            # Orbit the geometry already placed for the thumbnail; a failure
+            # here keeps the thumbnail
+            from thumbnail_batch import variant_path
+            try:
+                if prepared is None:
+                    prepared = prepare_parts(parts)
+                with span('turntable', frames=turntable):
+                    sheet = render_turntable(prepared, turntable, turntable_size, bg_color,
+                                             view_direction=view_direction, light_directions=LIGHT_DIRECTIONS,
+                                             distance_scale=2.5)
+                save_png_atomic(sheet, variant_path(output_path, 'turntable'))
+                print(f"Turntable of {turntable} frames saved to {variant_path(output_path, 'turntable')}")
+            except Exception as e:
+                print(f"Could not render the turntable: {e}")
+        
         return True
         
     except Exception as e:
@@ -195,37 +215,43 @@ def generate_thumbnail(glb_path, output_path, size=(512, 512), bg_color=(240, 24
         draw.text((text_x, text_y), text, fill=(100, 100, 100), font=font)
         
         # Save placeholder
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        image.save(output_path, 'PNG')
+        from thumbnail_batch import save_png_atomic
+        save_png_atomic(image, output_path)
         print(f"Placeholder thumbnail saved to {output_path}")
+        save_pyramid(image, output_path, size, pyramid)
         
         return True
 
-def process_all_models(models_dir, thumbnails_dir):
-    """
-    Process all GLB files in the models directory and generate thumbnails
+def process_all_models(models_dir, thumbnails_dir, size=(512, 512), jobs=1, force=False, pyramid=None,
+                       turntable=0, turntable_size=256):
     """
-    # Find all GLB files
-    glb_files = []
-    for root, dirs, files in os.walk(models_dir):
-        for file in files:
-            if file.endswith('.glb') and 'lod0' in file:  # Use LOD0 for thumbnails
-                glb_files.append(os.path.join(root, file))
+    Generate thumbnails for all models in the models directory
     
-    if not glb_files:
-        print(f"No LOD0 GLB files found in {models_dir}")
-        return
+    Each model is rendered from its cheapest LOD file that is still dense
+    enough for the thumbnail size (see thumbnail_source). Thumbnails whose
+    source and render parameters are unchanged are skipped, the rest are
+    rendered by jobs processes (see thumbnail_batch). pyramid, turntable and
+    turntable_size are passed to generate_thumbnail.
     
-    print(f"Found {len(glb_files)} models to process")
+    Returns:
+        Dict with the number of 'rendered', 'fresh' and 'failed' models
+    """
+    from thumbnail_raster import VIEW_DIRECTION, LIGHT_DIRECTIONS, PYRAMID_WIDTHS
+    from thumbnail_batch import run_thumbnail_batch
     
-    for glb_path in glb_files:
-        # Generate output filename
-        base_name = os.path.basename(glb_path).replace('_lod0.glb', '')
-        thumbnail_name = f"{base_name}_thumbnail.png"
-        thumbnail_path = os.path.join(thumbnails_dir, thumbnail_name)
-        
-        print(f"\nProcessing {base_name}...")
-        generate_thumbnail(glb_path, thumbnail_path)
+    params = {
+        'renderer': 'generate_thumbnail',
+        'size': list(size),
+        'view': VIEW_DIRECTION,
+        'lights': LIGHT_DIRECTIONS,
+        'background': [240, 240, 240],
+        'pyramid': list(PYRAMID_WIDTHS if pyramid is None else pyramid),
+        'turntable': turntable,
+        'turntable_size': turntable_size
+    }
+    render_options = {'pyramid': params['pyramid'], 'turntable': turntable, 'turntable_size': turntable_size}
+    return run_thumbnail_batch(models_dir, thumbnails_dir, generate_thumbnail, params, jobs, force,
+                               render_options)
 
 def main():
     parser = argparse.ArgumentParser(description='Generate thumbnails from GLB files')
@@ -234,12 +260,29 @@ def main():
                        default='public/thumbnails')
     parser.add_argument('-s', '--size', type=int, nargs=2, default=[512, 512],
                        help='Thumbnail size as width height (default: 512 512)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                       help='Directory input: thumbnails rendered at the same time (default: 1)')
+    parser.add_argument('--force', action='store_true',
+                       help='Directory input: render every thumbnail, even those that are up to date')
+    parser.add_argument('--no-pyramid', action='store_true',
+                       help='Do not save the smaller sizes (<name>_thumbnail_<width>.png)')
+    parser.add_argument('--turntable', type=int, default=0, metavar='FRAMES',
+                       help='Also save a turntable sprite sheet of FRAMES views (<name>_thumbnail_turntable.png)')
+    parser.add_argument('--turntable-size', type=int, default=256,
+                       help='Edge of the square turntable frames in pixels (default: 256)')
+    add_profile_argument(parser)
     
     args = parser.parse_args()
     
+    with profile_session(args.profile, 'generate_thumbnail'):
+        run(args)
+
+def run(args):
+    """Render the thumbnails asked for on the command line"""
     input_path = args.input
     output_path = args.output
     size = tuple(args.size)
+    pyramid = [] if args.no_pyramid else None
     
     if os.path.isfile(input_path):
         # Process single file
@@ -249,11 +292,15 @@ def main():
         else:
             output_file = output_path
         
-        generate_thumbnail(input_path, output_file, size)
+        generate_thumbnail(input_path, output_file, size, pyramid=pyramid, turntable=args.turntable,
+                           turntable_size=args.turntable_size)
     
     elif os.path.isdir(input_path):
         # Process directory
-        process_all_models(input_path, output_path)
+        results = process_all_models(input_path, output_path, size, args.jobs, args.force, pyramid,
+                                     args.turntable, args.turntable_size)
+        if results['failed']:
+            sys.exit(1)
     
     else:
         print(f"Error: {input_path} is not a valid file or directory")
@@ -10,6 +10,8 @@ import os
 import sys
 import argparse
 
+from pipeline_profile import span, add_profile_argument, profile_session
+
 def generate_thumbnail(glb_path, output_path, size=(512, 512)):
     """
     Generate a thumbnail image from a GLB file
@@ -18,7 +20,8 @@ def generate_thumbnail(glb_path, output_path, size=(512, 512)):
     
     try:
         # Load the GLB file
-        mesh = trimesh.load(glb_path, force='mesh')
+        with span('load'):
+            mesh = trimesh.load(glb_path, force='mesh')
         
         if mesh.is_empty:
             print("Warning: Mesh is empty")
@@ -44,19 +47,30 @@ def generate_thumbnail(glb_path, output_path, size=(512, 512)):
         
         try:
             # Try to export as image
-            png = scene.save_image(resolution=size, visible=False)
+            with span('render'):
+                png = scene.save_image(resolution=size, visible=False)
             
             # Save the image
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            with open(output_path, 'wb') as f:
-                f.write(png)
+            from io import BytesIO
+            from thumbnail_batch import save_png_atomic
+            save_png_atomic(Image.open(BytesIO(png)), output_path)
             
             print(f"Thumbnail saved to {output_path}")
             return True
             
         except Exception as e:
             print(f"Could not render with built-in renderer: {e}")
-            return create_placeholder(output_path, size)
+            
+            # Render the rotated mesh in NumPy instead, viewed from +Z like the default camera
+            from thumbnail_raster import render_parts
+            with span('render', renderer='raster'):
+                image = render_parts([(mesh, None)], size, view_direction=[0, 0, 1])
+            
+            from thumbnail_batch import save_png_atomic
+            save_png_atomic(image, output_path)
+            
+            print(f"Thumbnail saved to {output_path} (software rasterizer)")
+            return True
             
     except Exception as e:
         print(f"Error loading GLB: {e}")
@@ -124,36 +138,34 @@ def create_placeholder(output_path, size=(512, 512)):
     draw.text((text_x, text_y), text, fill=(80, 80, 120), font=font)
     
     # Save image
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    image.save(output_path, 'PNG')
+    from thumbnail_batch import save_png_atomic
+    save_png_atomic(image, output_path)
     print(f"Placeholder saved to {output_path}")
     return True
 
-def process_all_models(models_dir, thumbnails_dir):
+def process_all_models(models_dir, thumbnails_dir, size=(512, 512), jobs=1, force=False):
     """
-    Process all GLB files in the models directory
+    Process all models in the models directory
+    
+    Each model is rendered from its cheapest LOD file that is still dense
+    enough for the thumbnail size (see thumbnail_source); up-to-date
+    thumbnails are skipped and the rest rendered by jobs processes (see
+    thumbnail_batch).
+    
+    Returns:
+        Dict with the number of 'rendered', 'fresh' and 'failed' models
     """
-    # Find all LOD0 GLB files
-    glb_files = []
-    for root, dirs, files in os.walk(models_dir):
-        for file in files:
-            if file.endswith('_lod0.glb'):
-                glb_files.append(os.path.join(root, file))
-    
-    if not glb_files:
-        print(f"No LOD0 GLB files found in {models_dir}")
-        return
-    
-    print(f"Found {len(glb_files)} models to process")
-    
-    for glb_path in glb_files:
-        # Generate output filename
-        base_name = os.path.basename(glb_path).replace('_lod0.glb', '')
-        thumbnail_name = f"{base_name}_thumbnail.png"
-        thumbnail_path = os.path.join(thumbnails_dir, thumbnail_name)
-        
-        print(f"\nProcessing {base_name}...")
-        generate_thumbnail(glb_path, thumbnail_path)
+    from thumbnail_raster import LIGHT_DIRECTIONS
+    from thumbnail_batch import run_thumbnail_batch
+    
+    params = {
+        'renderer': 'generate_thumbnail_simple',
+        'size': list(size),
+        'rotation': [-30, 45],
+        'lights': LIGHT_DIRECTIONS,
+        'background': [240, 240, 240]
+    }
+    return run_thumbnail_batch(models_dir, thumbnails_dir, generate_thumbnail, params, jobs, force)
 
 def main():
     parser = argparse.ArgumentParser(description='Generate thumbnails from GLB files')
@@ -162,9 +174,19 @@ def main():
                        default='public/thumbnails')
     parser.add_argument('-s', '--size', type=int, nargs=2, default=[512, 512],
                        help='Thumbnail size (default: 512 512)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                       help='Directory input: thumbnails rendered at the same time (default: 1)')
+    parser.add_argument('--force', action='store_true',
+                       help='Directory input: render every thumbnail, even those that are up to date')
+    add_profile_argument(parser)
     
     args = parser.parse_args()
     
+    with profile_session(args.profile, 'generate_thumbnail_simple'):
+        run(args)
+
+def run(args):
+    """Render the thumbnails asked for on the command line"""
     input_path = args.input
     output_path = args.output
     size = tuple(args.size)
@@ -181,7 +203,9 @@ def main():
     
     elif os.path.isdir(input_path):
         # Process directory
-        process_all_models(input_path, output_path)
+        results = process_all_models(input_path, output_path, size, args.jobs, args.force)
+        if results['failed']:
+            sys.exit(1)
     
     else:
         print(f"Error: {input_path} is not a valid file or directory")
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Instant GLB statistics from the header and JSON chunk
+
+A GLB is memory-mapped and only its 12-byte header, the JSON chunk and the
+BIN chunk header are read; the binary payload is never touched. Face and
+vertex counts come from accessor counts and bounds from the POSITION
+accessors' min/max (required by the glTF spec), transformed through the
+node graph for world-space bounds.
+
+Usage:
+    python3 glb_stats.py model.glb
+    python3 glb_stats.py models/ --workers 8 --csv stats.csv
+    python3 glb_stats.py models/ --json > stats.jsonl
+"""
+
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from pipeline_profile import span, add_profile_argument, profile_session
+
+GLB_MAGIC = b'glTF'
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
+
+# Divisors of normalized integer accessors (KHR_mesh_quantization)
+NORMALIZED_DIVISORS = {5120: 127.0, 5121: 255.0, 5122: 32767.0, 5123: 65535.0}
+
+def read_glb_layout(glb_path):
+    """
+    Memory-map a GLB and parse its header and JSON chunk
+
+    Returns:
+        (gltf, layout) where layout holds 'file_size', 'version',
+        'json_range' and 'bin_range' ((start, end) file offsets; bin_range is
+        None without a BIN chunk)
+    """
+    with open(glb_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size < 20:
+            raise ValueError(f"Not a GLB file: {glb_path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, length = struct.unpack_from('<4sII', mapped, 0)
+            if magic != GLB_MAGIC:
+                raise ValueError(f"Not a GLB file: {glb_path}")
+            json_length, chunk_type = struct.unpack_from('<II', mapped, 12)
+            if chunk_type != GLB_CHUNK_JSON:
+                raise ValueError(f"GLB file does not start with a JSON chunk: {glb_path}")
+            gltf = json.loads(mapped[20:20 + json_length])
+
+            bin_range = None
+            bin_header = 20 + json_length
+            if bin_header + 8 <= min(length, file_size):
+                bin_length, chunk_type = struct.unpack_from('<II', mapped, bin_header)
+                if chunk_type == GLB_CHUNK_BIN:
+                    bin_range = (bin_header + 8, bin_header + 8 + bin_length)
+
+    return gltf, {
+        'file_size': file_size,
+        'version': version,
+        'json_range': (20, 20 + json_length),
+        'bin_range': bin_range,
+    }
+
+def read_glb(glb_path):
+    """
+    Read a GLB file
+
+    Returns:
+        (gltf, binary): the parsed JSON chunk and the BIN chunk bytes (b'' if absent)
+    """
+    gltf, layout = read_glb_layout(glb_path)
+    binary = b''
+    if layout['bin_range']:
+        start, end = layout['bin_range']
+        with open(glb_path, 'rb') as f:
+            f.seek(start)
+            binary = f.read(end - start)
+    return gltf, binary
+
+def node_matrix(node):
+    """Local 4x4 transform of a glTF node"""
+    if 'matrix' in node:
+        return np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T
+
+    matrix = np.eye(4)
+    if 'scale' in node:
+        matrix = np.diag(list(node['scale']) + [1.0]) @ matrix
+    if 'rotation' in node:
+        x, y, z, w = node['rotation']
+        rotation = np.array([
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w), 0],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w), 0],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y), 0],
+            [0, 0, 0, 1],
+        ])
+        matrix = rotation @ matrix
+    if 'translation' in node:
+        translation = np.eye(4)
+        translation[:3, 3] = node['translation']
+        matrix = translation @ matrix
+    return matrix
+
+def mesh_instances(gltf):
+    """
+    List (mesh_index, world_matrix) for every node instance of a mesh
+
+    Falls back to every mesh with an identity transform when the file has
+    no node graph.
+    """
+    nodes = gltf.get('nodes', [])
+    if not nodes:
+        return [(i, np.eye(4)) for i in range(len(gltf.get('meshes', [])))]
+
+    scenes = gltf.get('scenes', [])
+    if scenes:
+        roots = scenes[gltf.get('scene', 0)].get('nodes', [])
+    else:
+        children = {c for node in nodes for c in node.get('children', [])}
+        roots = [i for i in range(len(nodes)) if i not in children]
+
+    instances = []
+    stack = [(root, np.eye(4)) for root in roots]
+    while stack:
+        index, parent = stack.pop()
+        node = nodes[index]
+        world = parent @ node_matrix(node)
+        if 'mesh' in node:
+            instances.append((node['mesh'], world))
+        for child in node.get('children', []):
+            stack.append((child, world))
+    return instances
+
+def accessor_bounds(accessor):
+    """(min, max) of a POSITION accessor in model units, or None if not recorded"""
+    if 'min' not in accessor or 'max' not in accessor:
+        return None
+    lower = np.array(accessor['min'][:3], dtype=np.float64)
+    upper = np.array(accessor['max'][:3], dtype=np.float64)
+    if accessor.get('normalized'):
+        divisor = NORMALIZED_DIVISORS.get(accessor['componentType'], 1.0)
+        lower, upper = np.maximum(lower / divisor, -1.0), upper / divisor
+    return lower, upper
+
+def transform_bounds(lower, upper, matrix):
+    """Axis-aligned bounds of a transformed box"""
+    corners = np.array([[x, y, z, 1.0] for x in (lower[0], upper[0])
+                        for y in (lower[1], upper[1]) for z in (lower[2], upper[2])])
+    transformed = corners @ matrix.T
+    return transformed[:, :3].min(axis=0), transformed[:, :3].max(axis=0)
+
+def glb_statistics(glb_path):
+    """
+    Statistics of a GLB file without reading its binary payload
+
+    Returns:
+        Dict with file layout, per-mesh statistics ('meshes': name, primitives,
+        faces, vertices, instances and local bounds), totals over all instances
+        ('faces', 'vertices', 'bounds' in world space), 'buffer_views' with
+        absolute file byte ranges, and image/material/texture counts
+    """
+    gltf, layout = read_glb_layout(glb_path)
+    accessors = gltf.get('accessors', [])
+    instances = mesh_instances(gltf)
+
+    instance_counts = {}
+    for mesh_index, _ in instances:
+        instance_counts[mesh_index] = instance_counts.get(mesh_index, 0) + 1
+
+    meshes = []
+    for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+        faces = vertices = 0
+        lower = upper = None
+        for primitive in mesh.get('primitives', []):
+            position = primitive.get('attributes', {}).get('POSITION')
+            if position is None:
+                continue
+            vertex_count = accessors[position]['count']
+            index_count = accessors[primitive['indices']]['count'] if 'indices' in primitive else vertex_count
+            mode = primitive.get('mode', 4)
+            if mode == 4:
+                faces += index_count // 3
+            elif mode in (5, 6):
+                faces += max(index_count - 2, 0)
+            vertices += vertex_count
+            bounds = accessor_bounds(accessors[position])
+            if bounds is not None:
+                lower = bounds[0] if lower is None else np.minimum(lower, bounds[0])
+                upper = bounds[1] if upper is None else np.maximum(upper, bounds[1])
+        meshes.append({
+            'name': mesh.get('name', f'mesh_{mesh_index}'),
+            'primitives': len(mesh.get('primitives', [])),
+            'faces': faces,
+            'vertices': vertices,
+            'instances': instance_counts.get(mesh_index, 0),
+            'bounds': None if lower is None else [lower.tolist(), upper.tolist()],
+        })
+
+    world_lower = world_upper = None
+    for mesh_index, matrix in instances:
+        if meshes[mesh_index]['bounds'] is None:
+            continue
+        lower, upper = transform_bounds(*map(np.array, meshes[mesh_index]['bounds']), matrix)
+        world_lower = lower if world_lower is None else np.minimum(world_lower, lower)
+        world_upper = upper if world_upper is None else np.maximum(world_upper, upper)
+
+    bin_start = layout['bin_range'][0] if layout['bin_range'] else None
+    buffer_views = []
+    for index, view in enumerate(gltf.get('bufferViews', [])):
+        start = view.get('byteOffset', 0)
+        if view.get('buffer', 0) == 0 and bin_start is not None and 'uri' not in gltf['buffers'][0]:
+            start += bin_start
+        buffer_views.append({
+            'index': index,
+            'buffer': view.get('buffer', 0),
+            'range': [start, start + view['byteLength']],
+            'stride': view.get('byteStride'),
+            'target': view.get('target'),
+        })
+
+    return {
+        'file': str(glb_path),
+        'file_size': layout['file_size'],
+        'version': layout['version'],
+        'json_range': list(layout['json_range']),
+        'bin_range': list(layout['bin_range']) if layout['bin_range'] else None,
+        'generator': gltf.get('asset', {}).get('generator'),
+        'extensions': gltf.get('extensionsUsed', []),
+        'meshes': meshes,
+        'faces': sum(instance_counts.get(i, 0) * mesh['faces'] for i, mesh in enumerate(meshes)),
+        'vertices': sum(instance_counts.get(i, 0) * mesh['vertices'] for i, mesh in enumerate(meshes)),
+        'bounds': None if world_lower is None else [world_lower.tolist(), world_upper.tolist()],
+        'nodes': len(gltf.get('nodes', [])),
+        'materials': len(gltf.get('materials', [])),
+        'textures': len(gltf.get('textures', [])),
+        'images': len(gltf.get('images', [])),
+        'buffer_views': buffer_views,
+    }
+
+def safe_statistics(glb_path):
+    """glb_statistics for the process pool: errors are returned, not raised"""
+    try:
+        return glb_statistics(glb_path)
+    except Exception as e:
+        return {'file': str(glb_path), 'error': str(e)}
+
+def find_glb_files(paths):
+    """Expand files and directories (searched recursively) to GLB paths"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(str(p) for p in Path(path).rglob('*.glb')))
+        else:
+            files.append(path)
+    return files
+
+def summary_row(stats):
+    """Flat table row of a statistics dict"""
+    if 'error' in stats:
+        return {'file': stats['file'], 'size_mb': '', 'meshes': '', 'faces': '', 'vertices': '',
+                'extent': '', 'status': f"error: {stats['error']}"}
+    extent = ''
+    if stats['bounds']:
+        extent = ' x '.join(f"{e:.3g}" for e in np.subtract(stats['bounds'][1], stats['bounds'][0]))
+    return {
+        'file': stats['file'],
+        'size_mb': f"{stats['file_size'] / (1024 * 1024):.2f}",
+        'meshes': len(stats['meshes']),
+        'faces': stats['faces'],
+        'vertices': stats['vertices'],
+        'extent': extent,
+        'status': 'ok',
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Print GLB statistics without loading the models')
+    parser.add_argument('paths', nargs='+', help='GLB files or directories (searched recursively)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Files read in parallel (default: CPU count)')
+    parser.add_argument('--json', action='store_true', help='Print full statistics as JSON lines')
+    parser.add_argument('--csv', help='Also save the summary table as CSV')
+    add_profile_argument(parser)
+
+    args = parser.parse_args()
+
+    with profile_session(args.profile, 'glb_stats'):
+        run(args)
+
+def run(args):
+    """Print the statistics of the GLB files named on the command line"""
+    files = find_glb_files(args.paths)
+    if not files:
+        print("No GLB files found")
+        sys.exit(1)
+
+    with span('statistics', files=len(files)):
+        if args.workers > 1 and len(files) > 1:
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                results = list(executor.map(safe_statistics, files, chunksize=16))
+        else:
+            results = [safe_statistics(path) for path in files]
+
+    if args.json:
+        for stats in results:
+            print(json.dumps(stats))
+    else:
+        rows = [summary_row(stats) for stats in results]
+        headers = list(rows[0].keys())
+        widths = [max(len(h), *(len(str(row[h])) for row in rows)) for h in headers]
+        print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+        print("  ".join("-" * w for w in widths))
+        for row in rows:
+            print("  ".join(str(row[h]).ljust(w) for h, w in zip(headers, widths)))
+        ok = [stats for stats in results if 'error' not in stats]
+        print(f"\n{len(ok)} files, {sum(s['faces'] for s in ok):,} faces, "
+              f"{sum(s['file_size'] for s in ok) / (1024 * 1024):,.1f} MB")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(summary_row(results[0]).keys()))
+            writer.writeheader()
+            writer.writerows(summary_row(stats) for stats in results)
+
+    if any('error' in stats for stats in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Byte-budget LOD targets
+
+Output sizes are predicted from an analytic model of what the exporter
+writes: a JSON chunk, vertex attributes, 32-bit (or quantized 16-bit)
+indices and embedded images. The model is read from the input GLB's JSON
+chunk, so no mesh has to be loaded to turn a byte target into a face count.
+
+Decimated levels only keep positions and indices, while full-resolution and
+scene-preserving levels keep every attribute and image. The vertex count of
+a decimated level is estimated from the input's vertices per face; when the
+mesh is decimated in memory, the actual counts refine the face count with a
+short bisection (see decimate_to_size), without exporting each guess.
+"""
+
+import json
+
+from glb_stats import read_glb_layout, glb_statistics
+
+# JSON chunk and GLB/chunk headers of a positions-only export
+GEOMETRY_OVERHEAD_BYTES = 1024
+
+# Decimation attempts per level when refining towards a byte target
+MAX_SIZE_STEPS = 4
+
+# Stop refining once the predicted size is this close below the target
+SIZE_TOLERANCE = 0.05
+
+COMPONENT_SIZES = {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT4': 16}
+
+# Size of quantized float attributes relative to float32 (see lod_quantize)
+QUANTIZED_ATTRIBUTE_RATIO = {'POSITION': 8 / 12, 'NORMAL': 4 / 12, 'TEXCOORD': 0.5}
+
+def glb_size_model(glb_path):
+    """
+    Read the size model parameters of a GLB from its JSON chunk
+
+    Returns:
+        Dict with the input 'faces' and 'vertices' (per instance), 'json_bytes',
+        'image_bytes' and 'attributes' ({name: (bytes per vertex, is float)})
+    """
+    gltf, _ = read_glb_layout(glb_path)
+    stats = glb_statistics(glb_path)
+    faces, vertices = stats['faces'], stats['vertices']
+    accessors = gltf.get('accessors', [])
+
+    totals = {}
+    is_float = {}
+    stored_vertices = 0
+    for mesh in gltf.get('meshes', []):
+        for primitive in mesh.get('primitives', []):
+            attributes = primitive.get('attributes', {})
+            if 'POSITION' in attributes:
+                stored_vertices += accessors[attributes['POSITION']]['count']
+            for name, index in attributes.items():
+                accessor = accessors[index]
+                if name.startswith('TEXCOORD_'):
+                    name = 'TEXCOORD'
+                size = COMPONENT_SIZES[accessor['componentType']] * TYPE_SIZES[accessor['type']]
+                totals[name] = totals.get(name, 0) + size * accessor['count']
+                is_float[name] = accessor['componentType'] == 5126
+
+    image_bytes = sum(gltf['bufferViews'][image['bufferView']]['byteLength']
+                      for image in gltf.get('images', []) if 'bufferView' in image)
+
+    return {
+        'faces': faces,
+        'vertices': vertices,
+        'json_bytes': len(json.dumps(gltf, separators=(',', ':'))) + 28,
+        'image_bytes': image_bytes,
+        'attributes': {name: (total / max(stored_vertices, 1), is_float[name])
+                       for name, total in totals.items()},
+    }
+
+def level_size_options(lod_name, finish_options=None):
+    """Texture scale and quantization a level gets from its post-processing options"""
+    finish_options = finish_options or {}
+    texture_scale = 1.0
+    texture_options = finish_options.get('texture_options')
+    if texture_options:
+        from lod_textures import DEFAULT_TEXTURE_SCALES
+        texture_scale = texture_options.get('scales', DEFAULT_TEXTURE_SCALES).get(lod_name, 1.0)
+    return {'texture_scale': texture_scale, 'quantize': bool(finish_options.get('quantize_bits'))}
+
+def predict_level_size(model, faces, vertices, keep_visuals=False, texture_scale=1.0, quantize=False):
+    """
+    Predict the GLB size in bytes of a level with the given counts
+
+    Args:
+        model: Size model from glb_size_model
+        keep_visuals: The level keeps all attributes and images (otherwise positions only)
+        texture_scale: Image size factor; encoded images are assumed to scale with pixel count
+        quantize: The level is written with KHR_mesh_quantization
+    """
+    if keep_visuals:
+        vertex_bytes = 0.0
+        for name, (size, is_float) in model['attributes'].items():
+            if quantize and is_float:
+                size *= QUANTIZED_ATTRIBUTE_RATIO.get(name, 1.0)
+            vertex_bytes += size
+        overhead = model['json_bytes'] + model['image_bytes'] * min(texture_scale, 1.0) ** 2
+    else:
+        vertex_bytes = 8 if quantize else 12
+        overhead = GEOMETRY_OVERHEAD_BYTES
+
+    index_bytes = 2 if quantize and vertices <= 65535 else 4
+    return int(overhead + vertices * vertex_bytes + faces * 3 * index_bytes)
+
+def faces_for_size(model, target_bytes, keep_visuals=False, texture_scale=1.0, quantize=False,
+                   vertices_per_face=None, max_faces=None):
+    """
+    Largest face count whose predicted size fits within target_bytes
+
+    The size is not linear in the face count (quantized indices switch to 16
+    bits below 65536 vertices), so the count is found by bisection on the model.
+    """
+    if vertices_per_face is None:
+        vertices_per_face = model['vertices'] / max(model['faces'], 1)
+    max_faces = max(max_faces or model['faces'], 12)
+
+    def size(faces):
+        return predict_level_size(model, faces, int(round(faces * vertices_per_face)),
+                                  keep_visuals, texture_scale, quantize)
+
+    low, high = 12, max_faces
+    if size(high) <= target_bytes:
+        return high
+    if size(low) > target_bytes:
+        return low
+    while high - low > 1:
+        middle = (low + high) // 2
+        if size(middle) <= target_bytes:
+            low = middle
+        else:
+            high = middle
+    return low
+
+def byte_targets_to_ratios(model, lod_bytes, finish_options=None, preserve_scene=False):
+    """
+    Convert {lod: bytes} targets into face ratios with the size model
+
+    A target that fits the full-resolution model gives ratio 1.0.
+    """
+    ratios = {}
+    print("\nByte targets (size model):")
+    for lod_name, target_bytes in sorted(lod_bytes.items(), key=lambda item: -item[1]):
+        options = level_size_options(lod_name, finish_options)
+        full_size = predict_level_size(model, model['faces'], model['vertices'], True, **options)
+        if full_size <= target_bytes:
+            faces, predicted = model['faces'], full_size
+        else:
+            faces = faces_for_size(model, target_bytes, preserve_scene, max_faces=model['faces'] - 1,
+                                   **options)
+            vertices = int(round(faces * model['vertices'] / max(model['faces'], 1)))
+            predicted = predict_level_size(model, faces, vertices, preserve_scene, **options)
+        ratios[lod_name] = faces / max(model['faces'], 1)
+        print(f"  {lod_name}: {target_bytes / 1024:,.0f} KB -> {faces:,} faces "
+              f"({ratios[lod_name] * 100:.2f}%, predicted {predicted / 1024:,.0f} KB)")
+    return ratios
+
+def decimate_to_size(decimate, model, target_bytes, first_faces, max_faces, lod_name,
+                     finish_options=None):
+    """
+    Decimate towards a byte target, refining the face count by bisection
+
+    Each attempt is decimated in memory and sized with the model from its
+    actual vertex and face counts; nothing is exported until a result is chosen.
+
+    Args:
+        decimate: Function(target_faces) returning a decimated mesh
+        first_faces: Initial face count (from byte_targets_to_ratios)
+        max_faces: Face count of the mesh being decimated
+
+    Returns:
+        The largest attempt predicted to fit the target, or the smallest attempt
+        if none fits
+    """
+    options = level_size_options(lod_name, finish_options)
+    low, high = 12, max_faces
+    faces = min(max(first_faces, low), high)
+    best = best_size = smallest = smallest_size = None
+
+    for step in range(MAX_SIZE_STEPS):
+        mesh = decimate(faces)
+        size = predict_level_size(model, len(mesh.faces), len(mesh.vertices), **options)
+        print(f"    Size model: {len(mesh.faces):,} faces -> {size / 1024:,.0f} KB "
+              f"(target {target_bytes / 1024:,.0f} KB)")
+
+        if size <= target_bytes:
+            if best is None or size > best_size:
+                best, best_size = mesh, size
+            low = max(low, faces)
+            if size >= target_bytes * (1 - SIZE_TOLERANCE):
+                break
+        else:
+            if smallest is None or size < smallest_size:
+                smallest, smallest_size = mesh, size
+            high = min(high, faces)
+
+        # Re-solve the model with the observed vertices per face, kept inside the bracket
+        vertices_per_face = len(mesh.vertices) / max(len(mesh.faces), 1)
+        guess = faces_for_size(model, target_bytes, vertices_per_face=vertices_per_face,
+                               max_faces=max_faces, **options)
+        if not low < guess < high:
+            guess = (low + high) // 2
+        if guess in (faces, low, high):
+            break
+        faces = guess
+
+    return best if best is not None else smallest
+
+def report_byte_targets(results, lod_bytes):
+    """Print actual level sizes against their byte targets"""
+    if not lod_bytes:
+        return results
+    print("\nByte targets:")
+    for level in results:
+        target_bytes = lod_bytes.get(level['lod'])
+        if target_bytes:
+            print(f"  {level['lod']}: {level['size'] / 1024:,.0f} KB of {target_bytes / 1024:,.0f} KB "
+                  f"({(level['size'] / target_bytes - 1) * 100:+.1f}%)")
+    return results
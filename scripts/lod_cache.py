@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Content-addressed incremental build cache for LOD outputs
+
+Each level is keyed by a hash of the input file's content, the level's own
+settings (ratio or byte target, texture and quantization options), the build
+mode and the tool version. The keys and the exported files' sizes and
+modification times are kept in a JSON build record next to the outputs
+(<name>_lod_build.json). A level whose key matches and whose file is unchanged
+is skipped without loading the model.
+
+The input hash is only recomputed when the input's size or modification time
+differs from the record, so an up-to-date check costs a few stat calls.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import trimesh
+
+# Bump when a change to the LOD scripts alters the files written for the same
+# input and settings, so existing records stop matching
+LOD_BUILD_VERSION = 2
+
+HASH_CHUNK_BYTES = 4 * 1024 * 1024
+
+def tool_version():
+    """Versions that affect the exported bytes"""
+    return {'lod_build': LOD_BUILD_VERSION, 'trimesh': trimesh.__version__, 'numpy': np.__version__}
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_record_path(output_dir, clean_name):
+    """Path of the build record for a model's outputs"""
+    return os.path.join(output_dir, f"{clean_name}_lod_build.json")
+
+def open_build_record(input_file, output_dir, clean_name):
+    """
+    Load the build record of a model and make sure its input hash is current
+
+    Returns:
+        The record dict (an empty record when none exists or it is unreadable)
+    """
+    record_path = build_record_path(output_dir, clean_name)
+    record = {}
+    if os.path.exists(record_path):
+        try:
+            with open(record_path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            record = {}
+    if record.get('tool') != tool_version():
+        record = {}
+
+    stat = os.stat(input_file)
+    previous = record.get('input', {})
+    if previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+        sha256 = previous['sha256']
+    else:
+        sha256 = file_sha256(input_file)
+
+    record['tool'] = tool_version()
+    record['input'] = {'file': os.path.abspath(input_file), 'size': stat.st_size,
+                       'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    record.setdefault('levels', {})
+    return record
+
+def level_keys(record, lod_config, level_settings, chained=False):
+    """
+    Cache key of every level
+
+    Args:
+        level_settings: {lod: settings dict} of everything besides the input that
+            determines a level's output
+        chained: Each level is built from the previous (finer) one, so its key
+            also covers the keys of all finer levels
+
+    Returns:
+        {lod: key}
+    """
+    keys = {}
+    previous = None
+    for lod_name, _ in sorted(lod_config.items(), key=lambda x: -x[1]):
+        payload = {'input': record['input']['sha256'], 'tool': record['tool'],
+                   'level': lod_name, 'settings': level_settings[lod_name]}
+        if chained:
+            payload['previous'] = previous
+        keys[lod_name] = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        previous = keys[lod_name]
+    return keys
+
+def split_cached_levels(record, keys, output_dir, chained=False):
+    """
+    Separate levels that are up to date from those that need building
+
+    Args:
+        chained: Keys are chained (see level_keys). A stale level is decimated from
+            the finer levels, which are only built in memory when they are built
+            too, so every level finer than a stale one is rebuilt with it
+
+    Returns:
+        (cached_results, stale_levels): result dicts of the up-to-date levels and
+        the names of the levels to rebuild
+    """
+    cached_results = []
+    stale_levels = []
+    for lod_name, key in keys.items():
+        level = record['levels'].get(lod_name)
+        output_file = os.path.join(output_dir, level['file']) if level else None
+        if level and level.get('key') == key and os.path.exists(output_file):
+            stat = os.stat(output_file)
+            if stat.st_size == level['size'] and stat.st_mtime_ns == level['mtime_ns']:
+                cached_results.append({'lod': lod_name, 'faces': level['faces'], 'file': output_file,
+                                       'size': level['size'], 'time': 0.0, 'cached': True})
+                continue
+        stale_levels.append(lod_name)
+
+    if chained and stale_levels:
+        # Keys come finest first: rebuild everything down to the coarsest stale level
+        order = list(keys)
+        coarsest = max(order.index(lod_name) for lod_name in stale_levels)
+        stale_levels = order[:coarsest + 1]
+        cached_results = [level for level in cached_results if level['lod'] not in stale_levels]
+    return cached_results, stale_levels
+
+def save_build_record(record, output_dir, clean_name, keys, results):
+    """Record the freshly built levels and write the record atomically"""
+    for level in results:
+        if level.get('cached'):
+            continue
+        stat = os.stat(level['file'])
+        record['levels'][level['lod']] = {
+            'key': keys[level['lod']],
+            'file': os.path.basename(level['file']),
+            'faces': level['faces'],
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'time': round(level['time'], 3),
+            'built': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+    record_path = build_record_path(output_dir, clean_name)
+    temp_path = record_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=2)
+    os.replace(temp_path, record_path)
+    return record_path
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Parallel, resumable model downloads with a content-addressed LRU cache
+
+Cache layout (under cache_dir):
+
+    index.json                       URL -> content hash, validators, last use
+    objects/<sha256[:16]>/<name>     downloaded files, one per distinct content
+    partial/<url hash>.part          download in progress
+    partial/<url hash>.json          completed ranges and validators of the .part
+
+Large files are fetched as HTTP Range requests over several connections.
+Completed ranges are recorded as they finish, so an interrupted download
+resumes where it stopped as long as the server still reports the same
+ETag/Last-Modified. Cached entries are revalidated with a conditional request
+and evicted least-recently-used first once the cache exceeds its size cap.
+
+Everything goes through plain HTTP(S) URLs and an optional requests.Session,
+so a local HTTP server with Range support can stand in for the real host.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process cache access only
+    fcntl = None
+
+# Size of one Range request
+RANGE_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Parallel connections per download
+DEFAULT_CONNECTIONS = 4
+
+# Cache size cap before least-recently-used entries are evicted
+DEFAULT_MAX_CACHE_MB = 20 * 1024
+
+REQUEST_TIMEOUT = 60
+
+# Attempts per Range request before the download is left for a later resume
+RANGE_ATTEMPTS = 3
+
+STREAM_BLOCK_BYTES = 1024 * 1024
+
+def url_key(url):
+    """Stable file-name-safe key of a URL"""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+
+def url_filename(url):
+    """File name of a URL's path (model.glb when it has none)"""
+    return os.path.basename(urlparse(url).path) or "model.glb"
+
+@contextmanager
+def locked_index(cache_dir):
+    """
+    Load the cache index under an exclusive lock and save it on exit
+
+    Batch mode downloads from several processes, so index updates are serialized.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, 'index.lock'), 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        index_path = os.path.join(cache_dir, 'index.json')
+        index = {'entries': {}}
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except ValueError:
+                print(f"Warning: ignoring unreadable cache index {index_path}")
+        yield index
+        temp_path = index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(temp_path, index_path)
+
+def probe(session, url, entry=None):
+    """
+    HEAD a URL, conditionally when a cached entry has validators
+
+    Returns:
+        (status_code, info) where info holds 'size', 'etag', 'last_modified',
+        'ranges' (Range support) and the final 'url' after redirects
+    """
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    response = session.head(url, headers=headers, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+    if response.status_code != 304:
+        response.raise_for_status()
+    length = response.headers.get('Content-Length')
+    return response.status_code, {
+        'size': int(length) if length and length.isdigit() else None,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'ranges': response.headers.get('Accept-Ranges', '').lower() == 'bytes',
+        'url': response.url,
+    }
+
+def is_fresh(entry, status_code, info):
+    """Whether a cached entry still matches what the server reports"""
+    if status_code == 304:
+        return True
+    if info['etag'] and entry.get('etag'):
+        return info['etag'] == entry['etag']
+    if info['last_modified'] and entry.get('last_modified'):
+        return info['last_modified'] == entry['last_modified'] and info['size'] in (None, entry['size'])
+    # No validators: fall back to the size
+    return info['size'] is not None and info['size'] == entry['size']
+
+def load_partial_state(state_path, info):
+    """Completed ranges of an interrupted download, if it is for the same remote file"""
+    if not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except ValueError:
+        return None
+    same_file = (state.get('size') == info['size'] and state.get('etag') == info['etag']
+                 and state.get('last_modified') == info['last_modified'])
+    return state if same_file else None
+
+def save_partial_state(state_path, state):
+    """Write the partial download state atomically"""
+    temp_path = state_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(temp_path, state_path)
+
+def download_ranges(session, url, part_path, state_path, info, connections, chunk_bytes):
+    """
+    Fetch a file as parallel Range requests into a preallocated .part file
+
+    Completed chunks are recorded in the state file after each one finishes.
+    If-Range makes the server send the whole (changed) file instead of a
+    range when the remote file was replaced mid-download, which aborts it.
+    """
+    size = info['size']
+    state = load_partial_state(state_path, info)
+    if state is None or state.get('chunk_bytes') != chunk_bytes or not os.path.exists(part_path):
+        state = {'url': url, 'size': size, 'etag': info['etag'], 'last_modified': info['last_modified'],
+                 'chunk_bytes': chunk_bytes, 'done': []}
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+        save_partial_state(state_path, state)
+
+    chunk_count = (size + chunk_bytes - 1) // chunk_bytes
+    pending = [i for i in range(chunk_count) if i not in set(state['done'])]
+    if len(pending) < chunk_count:
+        print(f"Resuming download: {chunk_count - len(pending)} of {chunk_count} chunks already done")
+
+    lock = threading.Lock()
+    downloaded = [sum(min(chunk_bytes, size - i * chunk_bytes) for i in state['done'])]
+    validator = info['etag'] or info['last_modified']
+
+    def fetch_range(start, end):
+        headers = {'Range': f'bytes={start}-{end}'}
+        if validator:
+            headers['If-Range'] = validator
+        with session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise ValueError(f"Server ignored the range request (HTTP {response.status_code}); "
+                                 f"the remote file may have changed")
+            with open(part_path, 'r+b') as f:
+                f.seek(start)
+                written = 0
+                for block in response.iter_content(chunk_size=STREAM_BLOCK_BYTES):
+                    f.write(block)
+                    written += len(block)
+        if written != end - start + 1:
+            raise IOError(f"Short read for bytes {start}-{end}: got {written:,} bytes")
+        return written
+
+    def fetch(index):
+        start = index * chunk_bytes
+        end = min(start + chunk_bytes, size) - 1
+        for attempt in range(1, RANGE_ATTEMPTS + 1):
+            try:
+                written = fetch_range(start, end)
+                break
+            except (requests.RequestException, IOError) as e:
+                if attempt == RANGE_ATTEMPTS:
+                    raise
+                print(f"\nRetrying bytes {start:,}-{end:,} ({e})")
+                time.sleep(attempt)
+        with lock:
+            state['done'].append(index)
+            save_partial_state(state_path, state)
+            downloaded[0] += written
+            print(f"Progress: {downloaded[0] / size * 100:.1f}% ({downloaded[0]:,} / {size:,} bytes)", end='\r')
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        # list() re-raises the first failure; finished chunks stay recorded for a resume
+        list(executor.map(fetch, pending))
+    print()
+
+def download_stream(session, url, part_path, info):
+    """Single-connection download, resuming a .part file when the server allows ranges"""
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) and info['ranges'] else 0
+    headers = {}
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+        if info['etag'] or info['last_modified']:
+            # A changed file comes back whole (HTTP 200) and replaces the partial one
+            headers['If-Range'] = info['etag'] or info['last_modified']
+    with session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            offset = 0
+        # Without a HEAD response the validators come from the GET
+        info['etag'] = info['etag'] or response.headers.get('ETag')
+        info['last_modified'] = info['last_modified'] or response.headers.get('Last-Modified')
+        total_size = info['size'] or int(response.headers.get('content-length', 0))
+        downloaded = offset
+        with open(part_path, 'ab' if offset else 'wb') as f:
+            for block in response.iter_content(chunk_size=STREAM_BLOCK_BYTES):
+                f.write(block)
+                downloaded += len(block)
+                if total_size > 0:
+                    percent = (downloaded / total_size) * 100
+                    print(f"Progress: {percent:.1f}% ({downloaded:,} / {total_size:,} bytes)", end='\r')
+    print()
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(STREAM_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def evict(cache_dir, index, max_cache_bytes, keep_sha256=None):
+    """
+    Remove least-recently-used objects until the cache fits max_cache_bytes
+
+    Objects shared by several URLs are used as recently as their most recent URL.
+    """
+    objects = {}
+    for url, entry in index['entries'].items():
+        blob = objects.setdefault(entry['sha256'], {'size': entry['size'], 'last_used': 0,
+                                                    'path': entry['path'], 'urls': []})
+        blob['last_used'] = max(blob['last_used'], entry['last_used'])
+        blob['urls'].append(url)
+
+    total = sum(blob['size'] for blob in objects.values())
+    for sha256, blob in sorted(objects.items(), key=lambda item: item[1]['last_used']):
+        if total <= max_cache_bytes:
+            break
+        if sha256 == keep_sha256:
+            continue
+        shutil.rmtree(os.path.dirname(os.path.join(cache_dir, blob['path'])), ignore_errors=True)
+        for url in blob['urls']:
+            del index['entries'][url]
+        total -= blob['size']
+        print(f"Evicted from cache: {os.path.basename(blob['path'])} ({blob['size'] / (1024 * 1024):,.1f} MB)")
+
+def fetch_model(url, cache_dir=".model_cache", connections=DEFAULT_CONNECTIONS,
+                max_cache_mb=DEFAULT_MAX_CACHE_MB, chunk_bytes=RANGE_CHUNK_BYTES, session=None):
+    """
+    Return a local path for a model URL, downloading it when needed
+
+    Args:
+        url: HTTP(S) URL of the model
+        cache_dir: Cache directory (see module docstring for the layout)
+        connections: Parallel Range connections for large files
+        max_cache_mb: Cache size cap; older entries are evicted whenever a model is used
+        chunk_bytes: Size of one Range request
+        session: requests.Session to use (a new one by default)
+
+    Returns:
+        Path of the cached file; it keeps the URL's file name
+    """
+    session = session or requests.Session()
+    os.makedirs(os.path.join(cache_dir, 'partial'), exist_ok=True)
+
+    with locked_index(cache_dir) as index:
+        entry = index['entries'].get(url)
+        if entry and not os.path.exists(os.path.join(cache_dir, entry['path'])):
+            del index['entries'][url]
+            entry = None
+
+    max_cache_bytes = max_cache_mb * 1024 * 1024
+    try:
+        status_code, info = probe(session, url, entry)
+    except requests.RequestException as e:
+        if entry:
+            print(f"Could not revalidate ({e}), using cached model")
+            return touch_entry(cache_dir, url, max_cache_bytes)
+        if not isinstance(e, requests.HTTPError):
+            raise
+        # Some servers and presigned URLs reject HEAD but serve GET
+        print(f"HEAD request failed ({e}), downloading with a single GET")
+        status_code = 200
+        info = {'size': None, 'etag': None, 'last_modified': None, 'ranges': False, 'url': url}
+
+    if entry and is_fresh(entry, status_code, info):
+        print(f"Using cached model: {os.path.join(cache_dir, entry['path'])}")
+        return touch_entry(cache_dir, url, max_cache_bytes)
+    if status_code == 304:
+        # Conditional request without a usable cached copy; ask again unconditionally
+        status_code, info = probe(session, url)
+
+    key = url_key(url)
+    part_path = os.path.join(cache_dir, 'partial', f'{key}.part')
+    state_path = os.path.join(cache_dir, 'partial', f'{key}.json')
+
+    print(f"Downloading model from {url}...")
+    if info['size'] and info['ranges'] and info['size'] > chunk_bytes and connections > 1:
+        print(f"{info['size']:,} bytes over {connections} connections")
+        download_ranges(session, info['url'], part_path, state_path, info, connections, chunk_bytes)
+    else:
+        if os.path.exists(state_path):
+            # Left over from a ranged download; its .part is preallocated, not a prefix
+            os.remove(state_path)
+            os.remove(part_path)
+        download_stream(session, info['url'], part_path, info)
+
+    if info['size'] is not None and os.path.getsize(part_path) != info['size']:
+        raise IOError(f"Incomplete download: {os.path.getsize(part_path):,} of {info['size']:,} bytes")
+
+    sha256 = file_sha256(part_path)
+    relative_path = os.path.join('objects', sha256[:16], url_filename(url))
+    object_path = os.path.join(cache_dir, relative_path)
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    os.replace(part_path, object_path)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+    with locked_index(cache_dir) as index:
+        index['entries'][url] = {
+            'path': relative_path,
+            'sha256': sha256,
+            'size': os.path.getsize(object_path),
+            'etag': info['etag'],
+            'last_modified': info['last_modified'],
+            'last_used': time.time(),
+        }
+        evict(cache_dir, index, max_cache_bytes, keep_sha256=sha256)
+
+    print(f"Downloaded to: {object_path}")
+    return object_path
+
+def touch_entry(cache_dir, url, max_cache_bytes=None):
+    """Mark a cached entry as used now, evict others beyond max_cache_bytes and return its path"""
+    with locked_index(cache_dir) as index:
+        entry = index['entries'][url]
+        entry['last_used'] = time.time()
+        if max_cache_bytes is not None:
+            evict(cache_dir, index, max_cache_bytes, keep_sha256=entry['sha256'])
+        return os.path.join(cache_dir, entry['path'])
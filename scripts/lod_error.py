@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Symmetric surface error of LOD levels
+
+Both surfaces are sampled uniformly by area and each sample set is measured
+against the other surface: original -> level catches holes and lost detail,
+level -> original catches geometry the decimator pushed away from the
+surface. The symmetric Hausdorff distance is the larger of the two maxima;
+the RMS covers both sample sets.
+
+Distances are exact point-to-surface distances. A few candidate triangles
+per query point (the faces of the nearest centroids and of the nearest
+samples) give an upper bound d. Triangles are grouped by the radius r of
+their bounding sphere around the centroid, and a triangle within d of the
+point has its centroid within d + r; where that range reaches past the
+centroids already checked, the group's centroid KD-tree is searched until
+every centroid inside it has been checked.
+
+The measurement of each level is stored in its GLB (asset.extras.lodError)
+so it stays with the file; create_model_manifest.py copies it into the
+level's service block. Errors are in model units and relative to the
+original's bounding box diagonal.
+"""
+
+import os
+
+import numpy as np
+import trimesh
+
+from create_lod_advanced import write_glb, load_model_mesh
+from glb_stats import read_glb
+from pipeline_profile import span
+
+# Samples per surface, at most; smaller models get SAMPLES_PER_FACE per original face
+ERROR_SAMPLES = 100000
+MIN_ERROR_SAMPLES = 20000
+SAMPLES_PER_FACE = 1
+
+# Candidate triangles per query point giving the first distance bound, from
+# the nearest centroids and samples
+CENTROID_CANDIDATES = 4
+SAMPLE_CANDIDATES = 1
+
+# Triangle radii within a group differ by at most this factor
+RADIUS_GROUP_FACTOR = 2.0
+
+# Neighbours searched per group first; doubled for points not yet settled
+GROUP_CANDIDATES = 8
+
+# Query points per batch of exact distance computations
+QUERY_BATCH = 65536
+
+# Points per KD-tree query while settling, sorted by their distance bound
+SETTLE_BATCH = 4096
+
+def sample_surface(triangles, count, seed=0):
+    """
+    Uniform area-weighted points on triangles (vectorized)
+
+    Returns:
+        (points, face indices of the points)
+    """
+    areas = np.linalg.norm(np.cross(triangles[:, 1] - triangles[:, 0],
+                                    triangles[:, 2] - triangles[:, 0]), axis=1)
+    if len(triangles) == 0 or areas.sum() <= 0:
+        return np.empty((0, 3)), np.empty(0, dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    chosen = np.searchsorted(np.cumsum(areas), rng.random(count) * areas.sum())
+    chosen = np.minimum(chosen, len(triangles) - 1)
+    u, v = rng.random((2, count))
+    outside = u + v > 1
+    u[outside], v[outside] = 1 - u[outside], 1 - v[outside]
+    corners = triangles[chosen]
+    points = (corners[:, 0] + u[:, None] * (corners[:, 1] - corners[:, 0])
+              + v[:, None] * (corners[:, 2] - corners[:, 0]))
+    return points, chosen
+
+def surface_reference(mesh, samples=ERROR_SAMPLES):
+    """
+    Sample a surface and index it for distance queries
+
+    Returns:
+        Dict with 'points' (the samples) and their 'point_faces', 'triangles',
+        KD-trees 'sample_tree' and 'centroid_tree', 'groups' of triangles of
+        similar radius ((centroid KD-tree, face indices, radius) each), the
+        triangle 'radii' and 'diagonal' (bounding box diagonal)
+    """
+    from scipy.spatial import cKDTree
+
+    triangles = mesh.vertices.view(np.ndarray)[mesh.faces.view(np.ndarray)]
+    points, point_faces = sample_surface(triangles, samples)
+    centroids = triangles.mean(axis=1)
+
+    radii = np.linalg.norm(triangles - centroids[:, None], axis=2).max(axis=1)
+    groups = []
+    if len(triangles):
+        scale = max(float(radii.max()), 1e-300)
+        group_index = np.floor(np.log(np.maximum(radii, scale * 1e-12) / scale)
+                               / np.log(RADIUS_GROUP_FACTOR)).astype(np.int64)
+        for index in np.unique(group_index):
+            faces = np.flatnonzero(group_index == index)
+            groups.append((cKDTree(centroids[faces]), faces, float(radii[faces].max())))
+
+    return {
+        'points': points,
+        'point_faces': point_faces,
+        'triangles': triangles,
+        'sample_tree': cKDTree(points) if len(points) else None,
+        'centroid_tree': cKDTree(centroids) if len(triangles) else None,
+        'groups': groups,
+        'radii': radii,
+        'diagonal': float(np.linalg.norm(mesh.extents)),
+    }
+
+def segment_closest(points, start, end):
+    """Closest point to each point on the segment of the same row"""
+    direction = end - start
+    length = np.einsum('ij,ij->i', direction, direction)
+    t = np.einsum('ij,ij->i', points - start, direction) / np.where(length > 0, length, 1.0)
+    return start + np.clip(t, 0.0, 1.0)[:, None] * direction
+
+def triangle_distances(points, triangles):
+    """
+    Exact distance from each point to the triangle of the same row
+
+    Voronoi region tests without tolerances (Ericson, Real-Time Collision
+    Detection 5.1.5); trimesh.triangles.closest_point compares against an
+    absolute tolerance and misplaces points near the edges of small triangles.
+    """
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    ab, ac = b - a, c - a
+    dot = lambda u, v: np.einsum('ij,ij->i', u, v)
+    ap, bp, cp = points - a, points - b, points - c
+    d1, d2 = dot(ab, ap), dot(ac, ap)
+    d3, d4 = dot(ab, bp), dot(ac, bp)
+    d5, d6 = dot(ab, cp), dot(ac, cp)
+    va, vb, vc = d3 * d6 - d5 * d4, d5 * d2 - d1 * d6, d1 * d4 - d3 * d2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        on_ab = a + (d1 / (d1 - d3))[:, None] * ab
+        on_ac = a + (d2 / (d2 - d6))[:, None] * ac
+        on_bc = b + ((d4 - d3) / ((d4 - d3) + (d5 - d6)))[:, None] * (c - b)
+        denominator = va + vb + vc
+        inside = a + (vb / denominator)[:, None] * ab + (vc / denominator)[:, None] * ac
+
+    regions = [
+        (d1 <= 0) & (d2 <= 0),
+        (d3 >= 0) & (d4 <= d3),
+        (d6 >= 0) & (d5 <= d6),
+        (vc <= 0) & (d1 >= 0) & (d3 <= 0),
+        (vb <= 0) & (d2 >= 0) & (d6 <= 0),
+        (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0),
+    ]
+    closest = np.select([region[:, None] for region in regions], [a, b, c, on_ab, on_ac, on_bc], inside)
+
+    # Degenerate (zero-area) triangles: the nearest of their edges
+    degenerate = ~np.isfinite(closest).all(axis=1)
+    if degenerate.any():
+        p, ta, tb, tc = points[degenerate], a[degenerate], b[degenerate], c[degenerate]
+        edges = np.stack([segment_closest(p, ta, tb), segment_closest(p, tb, tc), segment_closest(p, tc, ta)])
+        closest[degenerate] = edges[np.linalg.norm(edges - p, axis=2).argmin(axis=0), np.arange(len(p))]
+
+    return np.linalg.norm(closest - points, axis=1)
+
+def surface_distances(points, reference):
+    """Exact distance from each point to the reference surface"""
+    if not len(points) or reference['sample_tree'] is None:
+        return np.empty(0)
+    centroid_k = min(CENTROID_CANDIDATES, len(reference['triangles']))
+    sample_k = min(SAMPLE_CANDIDATES, len(reference['points']))
+    k = centroid_k + sample_k
+
+    distances = np.empty(len(points))
+    for start in range(0, len(points), QUERY_BATCH):
+        batch = points[start:start + QUERY_BATCH]
+        reach, near_centroids = reference['centroid_tree'].query(batch, k=centroid_k, workers=-1)
+        _, near_samples = reference['sample_tree'].query(batch, k=sample_k, workers=-1)
+        candidates = np.hstack([near_centroids.reshape(len(batch), centroid_k),
+                                reference['point_faces'][near_samples.reshape(len(batch), sample_k)]])
+        repeated = np.repeat(batch, k, axis=0)
+        bound = triangle_distances(repeated, reference['triangles'][candidates.ravel()]).reshape(-1, k).min(axis=1)
+        reach = reach.reshape(len(batch), centroid_k)[:, -1]
+        distances[start:start + len(batch)] = settle_distances(batch, bound, reach, reference)
+    return distances
+
+def settle_distances(points, bound, reach, reference):
+    """
+    Lower upper bounds on point-surface distances to the exact distances
+
+    A triangle closer than the bound has its centroid within bound + its
+    group's radius. Triangles with centroids nearer than reach (per point) are
+    already checked, so a group is only searched for points whose range
+    extends past reach; the search widens until its k-th centroid lies
+    outside the range. The bound only shrinks, so settled points stay settled.
+    """
+    bound = bound.copy()
+    for tree, faces, radius in reference['groups']:
+        pending = np.flatnonzero(reach <= bound + radius)
+        # Points with similar bounds share a query range, which prunes the tree walk
+        pending = pending[np.argsort(bound[pending])]
+        known = 0
+        k = GROUP_CANDIDATES
+        while len(pending) and known < len(faces):
+            k = min(k, len(faces))
+            unsettled = []
+            for start in range(0, len(pending), SETTLE_BATCH):
+                chunk = pending[start:start + SETTLE_BATCH]
+                limit = bound[chunk] + radius
+                distance, near = tree.query(points[chunk], k=k, distance_upper_bound=float(limit.max()),
+                                            workers=-1)
+                distance = distance.reshape(len(chunk), k)[:, known:]
+                near = near.reshape(len(chunk), k)[:, known:]
+                # Only triangles whose own bounding sphere reaches within the bound
+                new_faces = faces[np.minimum(near, len(faces) - 1)]
+                rows, columns = np.nonzero(distance - reference['radii'][new_faces] <= bound[chunk][:, None])
+                if len(rows):
+                    found = np.full(new_faces.shape, np.inf)
+                    found[rows, columns] = triangle_distances(points[chunk[rows]],
+                                                              reference['triangles'][new_faces[rows, columns]])
+                    bound[chunk] = np.minimum(bound[chunk], found.min(axis=1))
+                # Missing neighbours (inf) lie outside the range: the chunk's points are settled
+                unsettled.append(chunk[distance[:, -1] <= bound[chunk] + radius])
+            pending = np.concatenate(unsettled)
+            known = k
+            k *= 2
+    return bound
+
+def surface_error(original, level):
+    """
+    Symmetric error between two surface references
+
+    Returns:
+        Dict with 'hausdorff' and 'rms' (model units), 'relativeHausdorff' and
+        'relativeRms' (fractions of the original diagonal), and the one-sided
+        maxima 'forward' (level -> original) and 'backward' (original -> level)
+    """
+    forward = surface_distances(level['points'], original)
+    backward = surface_distances(original['points'], level)
+    distances = np.concatenate([forward, backward])
+    if not len(distances):
+        return None
+
+    hausdorff = float(distances.max())
+    rms = float(np.sqrt(np.mean(distances ** 2)))
+    diagonal = original['diagonal'] or 1.0
+    return {
+        'hausdorff': hausdorff,
+        'rms': rms,
+        'relativeHausdorff': hausdorff / diagonal,
+        'relativeRms': rms / diagonal,
+        'forward': float(forward.max()) if len(forward) else 0.0,
+        'backward': float(backward.max()) if len(backward) else 0.0,
+        'samples': len(distances),
+    }
+
+def write_level_error(glb_path, error):
+    """Store a level's error in asset.extras.lodError of its GLB, replacing the file atomically"""
+    gltf, binary = read_glb(glb_path)
+    gltf.setdefault('asset', {}).setdefault('extras', {})['lodError'] = error
+    temp_path = glb_path + '.tmp'
+    write_glb(temp_path, gltf, binary)
+    os.replace(temp_path, glb_path)
+
+def read_level_error(glb_path):
+    """The error stored by write_level_error, or None"""
+    from glb_stats import read_glb_layout
+    gltf, _ = read_glb_layout(glb_path)
+    return gltf.get('asset', {}).get('extras', {}).get('lodError')
+
+def measure_level_errors(input_file, results, samples=ERROR_SAMPLES, original=None):
+    """
+    Measure every freshly built level against the original and store the errors
+
+    Levels skipped as up to date keep the error stored when they were built.
+    The original is loaded from input_file unless its mesh is passed in.
+
+    Returns:
+        results, with a 'surface_error' dict added to each measured level
+    """
+    levels = [level for level in results if not level.get('cached')]
+    if not levels:
+        return results
+
+    mesh = original if original is not None else load_model_mesh(input_file, visuals=False)
+    samples = min(samples, max(MIN_ERROR_SAMPLES, SAMPLES_PER_FACE * len(mesh.faces)))
+    print(f"\nMeasuring surface error ({samples:,} samples per surface)...")
+    original = surface_reference(mesh, samples)
+
+    for level in levels:
+        with span('measure_level', lod=level['lod']):
+            mesh = trimesh.load(level['file'], force='mesh', process=False)
+            error = surface_error(original, surface_reference(mesh, samples))
+        if error is None:
+            continue
+        write_level_error(level['file'], error)
+        level['size'] = os.path.getsize(level['file'])
+        level['surface_error'] = error
+        print(f"  ✓ {level['lod']}: Hausdorff {error['relativeHausdorff'] * 100:.3f}%, "
+              f"RMS {error['relativeRms'] * 100:.3f}% of diagonal")
+    return results
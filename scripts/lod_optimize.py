@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Vertex-cache and vertex-fetch ordering for exported LOD meshes
+
+Triangles are reordered with Tipsify (Sander, Nehab and Barczak, "Fast
+Triangle Reordering for Vertex Locality and Reduced Overdraw", 2007), which
+emits triangle fans around vertices that are still in the GPU post-transform
+cache. Vertices are then renumbered in first-use order, so vertex fetches
+walk memory sequentially.
+
+The cache miss ratio of the new order is simulated before it is used: a mesh
+that already has a good order (decimators often emit one) keeps it.
+"""
+
+import gzip
+
+import numpy as np
+import trimesh
+
+# Post-transform cache size used when reporting ACMR (typical FIFO size)
+CACHE_SIZE = 32
+
+# ACMR is simulated on at most this many triangles to keep reporting cheap
+ACMR_SAMPLE_FACES = 500_000
+
+# Larger meshes keep their order: Tipsify runs triangle by triangle in Python
+# (each step depends on the cache state the previous one left) at about 2 s
+# and a few hundred MB of lists per million triangles
+REORDER_MAX_FACES = 2_000_000
+
+def triangle_order(faces, vertex_count, cache_size=CACHE_SIZE):
+    """
+    Triangle permutation for a FIFO post-transform cache (Tipsify)
+
+    Triangles are emitted in fans around a current vertex. The next fan
+    vertex is the neighbour of the last fan that will still be in the cache
+    after its remaining triangles are emitted, preferring the one loaded
+    longest ago; when there is none, the most recently used vertex with
+    triangles left is taken from a dead-end stack, then the next such vertex
+    in index order. Runs in time linear in the number of triangles.
+    """
+    face_count = len(faces)
+    corners = faces.ravel()
+    # Triangles around each vertex (compressed adjacency)
+    adjacency = (np.argsort(corners, kind='stable') // 3).tolist()
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(corners, minlength=vertex_count))]).tolist()
+    live = np.bincount(corners, minlength=vertex_count).tolist()
+    triangles = faces.tolist()
+
+    cache_time = [0] * vertex_count
+    emitted = bytearray(face_count)
+    dead_end = []
+    order = []
+    timestamp = cache_size + 1
+    cursor = 0
+    fan = 0
+    while fan >= 0:
+        candidates = []
+        for t in adjacency[offsets[fan]:offsets[fan + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = 1
+            order.append(t)
+            for v in triangles[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if timestamp - cache_time[v] > cache_size:
+                    cache_time[v] = timestamp
+                    timestamp += 1
+
+        # Next fan: a candidate that stays cached while its fan is emitted
+        fan = -1
+        best = -1
+        for v in candidates:
+            if live[v] > 0:
+                age = timestamp - cache_time[v]
+                priority = age if age + 2 * live[v] <= cache_size else 0
+                if priority > best:
+                    best = priority
+                    fan = v
+        if fan >= 0:
+            continue
+        while dead_end:
+            v = dead_end.pop()
+            if live[v] > 0:
+                fan = v
+                break
+        if fan >= 0:
+            continue
+        while cursor < vertex_count:
+            if live[cursor] > 0:
+                fan = cursor
+                break
+            cursor += 1
+
+    return np.asarray(order, dtype=np.int64)
+
+def vertex_order(faces, vertex_count):
+    """
+    Vertex permutation in first-use order of the face list
+
+    Unreferenced vertices keep their relative order at the end.
+    """
+    flat = faces.ravel()
+    used, first = np.unique(flat, return_index=True)
+    order = used[np.argsort(first)]
+    unused = np.setdiff1d(np.arange(vertex_count), used, assume_unique=True)
+    return np.concatenate([order, unused])
+
+def simulate_acmr(faces, cache_size=CACHE_SIZE, max_faces=ACMR_SAMPLE_FACES):
+    """
+    Average cache miss ratio (transformed vertices per triangle) of a FIFO cache
+
+    Only the first max_faces triangles are simulated on large meshes.
+    """
+    faces = faces[:max_faces]
+    if len(faces) == 0:
+        return 0.0
+    # A vertex is cached while fewer than cache_size misses happened since it
+    # was loaded, which is exactly FIFO replacement
+    loaded_at = [-cache_size - 1] * (int(faces.max()) + 1)
+    misses = 0
+    for v in faces.ravel().tolist():
+        if misses - loaded_at[v] > cache_size:
+            loaded_at[v] = misses
+            misses += 1
+    return misses / len(faces)
+
+def reorder_visuals(visual, vertex_permutation, face_permutation):
+    """Apply vertex and face permutations to a mesh's visual attributes"""
+    if visual is None or visual.kind is None:
+        return None
+    if isinstance(visual, trimesh.visual.TextureVisuals):
+        uv = visual.uv[vertex_permutation] if visual.uv is not None else None
+        return trimesh.visual.TextureVisuals(uv=uv, material=visual.material)
+    if visual.kind == 'vertex':
+        return trimesh.visual.ColorVisuals(vertex_colors=visual.vertex_colors[vertex_permutation])
+    if visual.kind == 'face':
+        return trimesh.visual.ColorVisuals(face_colors=visual.face_colors[face_permutation])
+    return None
+
+def optimize_mesh(mesh, normals=False):
+    """
+    Reorder a mesh's triangles for cache locality and its vertices for fetch order
+
+    The mesh is returned unchanged when the new order does not lower the
+    simulated ACMR, or when it has more than REORDER_MAX_FACES triangles.
+
+    Args:
+        mesh: trimesh.Trimesh
+        normals: True when the mesh carries vertex normals to keep (as loaded
+            from a file that has them); they are reordered with the vertices
+
+    Returns:
+        (optimized_mesh, stats) where stats holds 'acmr_before', 'acmr_after',
+        whether the mesh was 'reordered' and whether it was 'too_large' to try
+    """
+    vertices = mesh.vertices.view(np.ndarray)
+    faces = mesh.faces.view(np.ndarray)
+    acmr_before = simulate_acmr(faces)
+    kept = {'acmr_before': acmr_before, 'acmr_after': acmr_before, 'reordered': False,
+            'too_large': len(faces) > REORDER_MAX_FACES}
+    if len(faces) == 0 or kept['too_large']:
+        return mesh, kept
+
+    face_permutation = triangle_order(faces, len(vertices))
+    faces = faces[face_permutation]
+    acmr_after = simulate_acmr(faces)
+    if acmr_after >= acmr_before:
+        return mesh, kept
+    vertex_permutation = vertex_order(faces, len(vertices))
+    remap = np.empty(len(vertices), dtype=np.int64)
+    remap[vertex_permutation] = np.arange(len(vertices))
+    faces = remap[faces]
+
+    vertex_normals = mesh.vertex_normals[vertex_permutation] if normals else None
+    optimized = trimesh.Trimesh(vertices=vertices[vertex_permutation], faces=faces,
+                                vertex_normals=vertex_normals, process=False)
+    visual = reorder_visuals(mesh.visual, vertex_permutation, face_permutation)
+    if visual is not None:
+        optimized.visual = visual
+
+    return optimized, {'acmr_before': acmr_before, 'acmr_after': acmr_after, 'reordered': True,
+                       'too_large': False}
+
+def optimize_scene(scene, normals=()):
+    """
+    Optimize every mesh geometry of a scene in place
+
+    Args:
+        scene: trimesh.Scene
+        normals: Names of the geometries whose vertex normals are kept
+
+    Returns:
+        Stats with face-weighted ACMR before and after and the number of
+        geometries 'reordered' and kept as 'too_large'
+    """
+    weighted_before = weighted_after = 0.0
+    total_faces = reordered = too_large = 0
+    for name, geometry in list(scene.geometry.items()):
+        if not isinstance(geometry, trimesh.Trimesh) or len(geometry.faces) == 0:
+            continue
+        optimized, stats = optimize_mesh(geometry, name in normals)
+        scene.geometry[name] = optimized
+        reordered += stats['reordered']
+        too_large += stats['too_large']
+        weighted_before += stats['acmr_before'] * len(geometry.faces)
+        weighted_after += stats['acmr_after'] * len(geometry.faces)
+        total_faces += len(geometry.faces)
+    total_faces = max(total_faces, 1)
+    return {'acmr_before': weighted_before / total_faces, 'acmr_after': weighted_after / total_faces,
+            'reordered': reordered, 'too_large': too_large}
+
+def compressed_sizes(data):
+    """Compressed sizes of a byte string: gzip always, brotli when installed"""
+    sizes = {'gzip': len(gzip.compress(data, compresslevel=6))}
+    try:
+        import brotli
+        sizes['brotli'] = len(brotli.compress(data, quality=9))
+    except ImportError:
+        pass
+    return sizes
+
+def report_optimization(stats, data):
+    """Print ACMR before and after optimization and the compressed size of the exported level"""
+    if stats['too_large'] and not stats['reordered']:
+        print(f"  Vertex cache: ACMR {stats['acmr_before']:.3f}, kept the original order "
+              f"(over {REORDER_MAX_FACES:,} faces)")
+    elif not stats['reordered']:
+        print(f"  Vertex cache: ACMR {stats['acmr_before']:.3f}, kept the original order (no improvement)")
+    else:
+        print(f"  Vertex cache: ACMR {stats['acmr_before']:.3f} -> {stats['acmr_after']:.3f}")
+    sizes = compressed_sizes(data)
+    print("  Compressed: " + ", ".join(f"{codec} {size / 1024:,.0f} KB" for codec, size in sizes.items()))
@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+Out-of-core LOD generation for GLB models larger than available memory
+
+The model is streamed from a memory-mapped GLB into spatial cells (a uniform
+grid, with overfull cells split octree-style) stored as triangle soup on disk.
+Each cell is then decimated on its own with the vertices it shares with
+other cells locked in place, and the cells are stitched back together while
+the output GLB is written in a single streaming pass. Peak memory is bounded by
+the cell size, which is derived from max_memory_mb rather than the model size.
+
+Cells are decimated with quadric-weighted vertex clustering: the quadric
+decimator used for in-memory builds cannot keep selected vertices fixed, and
+stitching requires border vertices to stay exactly where they are.
+"""
+
+import json
+import math
+import os
+import shutil
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from create_lod_advanced import report_level, finish_level
+from glb_stats import read_glb_layout, mesh_instances, glb_statistics
+
+# Working set per face while welding and decimating one cell: the float32
+# triangle soup, welded int64 faces, per-vertex and per-face quadrics and the
+# sort buffers used for welding and de-duplication
+OOC_BYTES_PER_FACE = 400
+
+# Faces read from the memory map per streaming step
+STREAM_CHUNK_FACES = 1_000_000
+
+# Octree refinement stops at this depth even if a cell is still too full
+MAX_OCTREE_DEPTH = 8
+
+# A level keeping more than this multiple of its target face ratio is reported
+RATIO_WARNING_FACTOR = 1.5
+
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT4': 16}
+
+GLB_MAGIC = 0x46546C67
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
+
+def accessor_view(gltf, data, bin_offset, accessor_index):
+    """Zero-copy (count, components) view of an accessor inside the mapped GLB"""
+    accessor = gltf['accessors'][accessor_index]
+    if 'sparse' in accessor or 'bufferView' not in accessor:
+        raise ValueError("Sparse accessors are not supported out-of-core")
+
+    view = gltf['bufferViews'][accessor['bufferView']]
+    if view.get('buffer', 0) != 0 or 'uri' in gltf['buffers'][view.get('buffer', 0)]:
+        raise ValueError("External buffers are not supported out-of-core")
+
+    dtype = np.dtype(COMPONENT_DTYPES[accessor['componentType']])
+    components = TYPE_SIZES[accessor['type']]
+    stride = view.get('byteStride') or dtype.itemsize * components
+    offset = bin_offset + view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+    return np.ndarray((accessor['count'], components), dtype=dtype, buffer=data,
+                      offset=offset, strides=(stride, dtype.itemsize))
+
+def to_float_positions(positions, normalized):
+    """Convert (possibly quantized) positions to float64"""
+    if positions.dtype == np.float32:
+        return positions.astype(np.float64)
+    values = positions.astype(np.float64)
+    if normalized:
+        values /= np.iinfo(positions.dtype).max
+        if np.issubdtype(positions.dtype, np.signedinteger):
+            values = np.maximum(values, -1.0)
+    return values
+
+def iter_glb_triangles(glb_path, chunk_faces=STREAM_CHUNK_FACES):
+    """
+    Stream the triangles of a GLB as world-space float32 soup
+
+    Yields:
+        (n, 3, 3) float32 arrays of triangle corner positions
+    """
+    gltf, layout = read_glb_layout(glb_path)
+    if any(ext in gltf.get('extensionsRequired', [])
+           for ext in ('KHR_draco_mesh_compression', 'EXT_meshopt_compression')):
+        raise ValueError("Compressed GLB files are not supported out-of-core")
+
+    if layout['bin_range'] is None:
+        raise ValueError(f"GLB file has no binary chunk: {glb_path}")
+    bin_offset = layout['bin_range'][0]
+    data = np.memmap(glb_path, dtype=np.uint8, mode='r')
+
+    for mesh_index, world in mesh_instances(gltf):
+        for primitive in gltf['meshes'][mesh_index].get('primitives', []):
+            if primitive.get('mode', 4) != 4 or 'POSITION' not in primitive.get('attributes', {}):
+                continue
+            position_index = primitive['attributes']['POSITION']
+            positions = accessor_view(gltf, data, bin_offset, position_index)
+            normalized = gltf['accessors'][position_index].get('normalized', False)
+            if 'indices' in primitive:
+                indices = accessor_view(gltf, data, bin_offset, primitive['indices'])[:, 0]
+            else:
+                indices = None
+
+            face_count = (len(indices) if indices is not None else len(positions)) // 3
+            identity = np.allclose(world, np.eye(4))
+            for start in range(0, face_count, chunk_faces):
+                stop = min(start + chunk_faces, face_count)
+                if indices is not None:
+                    corner_index = np.asarray(indices[start * 3:stop * 3], dtype=np.int64)
+                else:
+                    corner_index = np.arange(start * 3, stop * 3)
+                corners = positions[corner_index]
+                if identity and corners.dtype == np.float32:
+                    yield np.ascontiguousarray(corners).reshape(-1, 3, 3)
+                    continue
+                corners = to_float_positions(corners, normalized)
+                corners = corners @ world[:3, :3].T + world[:3, 3]
+                yield corners.astype(np.float32).reshape(-1, 3, 3)
+
+def grid_shape(lower, upper, cell_count):
+    """Grid divisions per axis giving roughly cubic cells (overfull cells are split later)"""
+    extents = np.maximum(upper - lower, 1e-9 * max(float(np.max(upper - lower)), 1e-9))
+    side = (np.prod(extents) / max(cell_count, 1)) ** (1.0 / 3.0)
+    return np.maximum(np.round(extents / side), 1).astype(np.int64)
+
+def cell_of_points(points, lower, cell_size, shape):
+    """Flat grid cell index of each point"""
+    coords = np.floor((points - lower) / cell_size).astype(np.int64)
+    coords = np.clip(coords, 0, shape - 1)
+    return (coords[:, 0] * shape[1] + coords[:, 1]) * shape[2] + coords[:, 2]
+
+def append_grouped(soup, cell_ids, paths):
+    """Append each triangle of a soup chunk to the file of its cell"""
+    order = np.argsort(cell_ids, kind='stable')
+    sorted_ids = cell_ids[order]
+    cells, starts = np.unique(sorted_ids, return_index=True)
+    ends = np.append(starts[1:], len(sorted_ids))
+    for cell, start, end in zip(cells, starts, ends):
+        with open(paths(int(cell)), 'ab') as f:
+            soup[order[start:end]].tofile(f)
+    return cells, ends - starts
+
+def border_path(cell_path):
+    """File of the border corner positions of a cell (see append_border)"""
+    return f"{cell_path[:-4]}_border.bin"
+
+def append_border(soup, cell_ids, corner_cells, paths):
+    """
+    Record the corners of triangles straddling cell borders
+
+    A triangle is binned by its centroid; when one of its corners lies in
+    another cell, all three corners are appended to the border file of every
+    cell it touches. A vertex shared by triangles of two cells lies in at most
+    one of them, so at least one of the triangles straddles and the vertex
+    ends up in the border files of both cells.
+
+    Args:
+        soup: (n, 3, 3) triangles
+        cell_ids: (n,) cell of each triangle's centroid
+        corner_cells: (n, 3) cell of each corner
+        paths: Function mapping a cell to its border file
+    """
+    touched = np.column_stack([cell_ids, corner_cells])
+    straddling = np.flatnonzero((touched[:, 1:] != touched[:, :1]).any(axis=1))
+    if len(straddling) == 0:
+        return
+    pairs = np.unique(np.stack([np.repeat(straddling, 4), touched[straddling].ravel()], axis=1), axis=0)
+    append_grouped(soup[pairs[:, 0]], pairs[:, 1], paths)
+
+def bin_triangles(glb_path, work_dir, lower, upper, shape):
+    """
+    Stream the model into per-cell triangle soup files and border files
+
+    Returns:
+        Per grid cell face counts
+    """
+    cell_size = (upper - lower) / shape
+    counts = np.zeros(int(np.prod(shape)), dtype=np.int64)
+
+    def path(cell):
+        return os.path.join(work_dir, f"cell_{cell}.bin")
+
+    for soup in iter_glb_triangles(glb_path):
+        cell_ids = cell_of_points(soup.mean(axis=1, dtype=np.float64), lower, cell_size, shape)
+        corner_cells = cell_of_points(soup.reshape(-1, 3).astype(np.float64), lower, cell_size,
+                                      shape).reshape(-1, 3)
+        append_border(soup, cell_ids, corner_cells, lambda cell: border_path(path(cell)))
+        cells, cell_counts = append_grouped(soup, cell_ids, path)
+        counts[cells] += cell_counts
+
+    return counts
+
+def split_cell(cell, work_dir, max_faces, depth=0):
+    """
+    Recursively split an overfull cell into octants (octree refinement)
+
+    Returns:
+        List of leaf cells
+    """
+    if cell['faces'] <= max_faces or depth >= MAX_OCTREE_DEPTH:
+        return [cell]
+
+    lower, upper = cell['lower'], cell['upper']
+    middle = (lower + upper) / 2
+    children = []
+    for octant in range(8):
+        bits = np.array([(octant >> 2) & 1, (octant >> 1) & 1, octant & 1])
+        children.append({
+            'path': f"{cell['path'][:-4]}_{octant}.bin",
+            'lower': np.where(bits, middle, lower),
+            'upper': np.where(bits, upper, middle),
+            'borders': cell['borders'] + [border_path(f"{cell['path'][:-4]}_{octant}.bin")],
+            'faces': 0,
+        })
+
+    floats_per_chunk = STREAM_CHUNK_FACES * 9
+    total = cell['faces'] * 9
+    for start in range(0, total, floats_per_chunk):
+        soup = np.fromfile(cell['path'], dtype=np.float32, count=min(floats_per_chunk, total - start),
+                           offset=start * 4).reshape(-1, 3, 3)
+        centroids = soup.mean(axis=1, dtype=np.float64)
+        octants = ((centroids >= middle) * np.array([4, 2, 1])).sum(axis=1)
+        corner_octants = ((soup.reshape(-1, 3) >= middle) * np.array([4, 2, 1])).sum(axis=1).reshape(-1, 3)
+        append_border(soup, octants, corner_octants, lambda o: children[o]['borders'][-1])
+        cells, counts = append_grouped(soup, octants, lambda o: children[o]['path'])
+        for octant, count in zip(cells, counts):
+            children[octant]['faces'] += int(count)
+    os.remove(cell['path'])
+
+    if all(child['faces'] in (0, cell['faces']) for child in children):
+        # All centroids fall in one octant at the smallest scale we split to;
+        # nothing is gained by subdividing further
+        child = next(child for child in children if child['faces'])
+        child['lower'], child['upper'] = lower, upper
+        return [child]
+
+    leaves = []
+    for child in children:
+        if child['faces']:
+            leaves.extend(split_cell(child, work_dir, max_faces, depth + 1))
+    return leaves
+
+def weld_soup(soup):
+    """
+    Weld identical corner positions of a triangle soup
+
+    Returns:
+        (vertices, faces) with degenerate faces removed
+    """
+    corners = np.ascontiguousarray(soup.reshape(-1, 3))
+    keys = corners.view(np.dtype((np.void, corners.dtype.itemsize * 3))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    vertices = corners[first]
+    faces = inverse.reshape(-1, 3).astype(np.int64)
+    keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+    return vertices, faces[keep]
+
+def locked_vertices(vertices, cell):
+    """
+    Vertices shared with triangles of another cell
+
+    These are exactly the welded positions recorded in the border files of
+    the cell and of the cells it was split from (see append_border).
+    """
+    tables = [np.fromfile(path, dtype=np.float32).reshape(-1, 3)
+              for path in cell['borders'] if os.path.exists(path)]
+    if not tables or not len(vertices):
+        return np.zeros(len(vertices), dtype=bool)
+    border = np.unique(np.ascontiguousarray(np.concatenate(tables)).view(np.dtype((np.void, 12))).ravel())
+    keys = np.ascontiguousarray(vertices).view(np.dtype((np.void, 12))).ravel()
+    index = np.minimum(np.searchsorted(border, keys), len(border) - 1)
+    return border[index] == keys
+
+def vertex_quadrics(vertices, faces):
+    """Area-weighted plane quadrics accumulated per vertex, as (n, 10) arrays"""
+    v0, v1, v2 = (vertices[faces[:, i]].astype(np.float64) for i in range(3))
+    normals = np.cross(v1 - v0, v2 - v0)
+    double_area = np.linalg.norm(normals, axis=1)
+    valid = double_area > 0
+    normals[valid] /= double_area[valid, None]
+    normals[~valid] = 0
+    offsets = -(normals * v0).sum(axis=1)
+    weights = double_area * 0.5
+
+    nx, ny, nz = normals.T
+    components = np.stack([nx * nx, nx * ny, nx * nz, ny * ny, ny * nz, nz * nz,
+                           nx * offsets, ny * offsets, nz * offsets, offsets * offsets], axis=1)
+    components *= weights[:, None]
+
+    corner_index = faces.ravel()
+    quadrics = np.empty((len(vertices), 10))
+    for k in range(10):
+        quadrics[:, k] = np.bincount(corner_index, weights=np.repeat(components[:, k], 3),
+                                     minlength=len(vertices))
+    return quadrics, float(weights.sum())
+
+def cluster_ids(vertices, locked, lower, size):
+    """Cluster index per vertex for a grid of the given cell size; locked vertices stay alone"""
+    coords = np.floor((vertices - lower) / size).astype(np.int64)
+    coords -= coords.min(axis=0)
+    dims = coords.max(axis=0) + 1
+    keys = (coords[:, 0] * dims[1] + coords[:, 1]) * dims[2] + coords[:, 2]
+    keys[locked] = -1 - np.flatnonzero(locked)
+    _, inverse = np.unique(keys, return_inverse=True)
+    return inverse
+
+def surviving_faces(clusters, faces):
+    """Faces whose corners fall into three different clusters"""
+    mapped = clusters[faces]
+    keep = (mapped[:, 0] != mapped[:, 1]) & (mapped[:, 1] != mapped[:, 2]) & (mapped[:, 0] != mapped[:, 2])
+    return mapped[keep]
+
+def cluster_decimate(vertices, faces, locked, target_faces, lower, upper):
+    """
+    Decimate a cell by quadric-weighted vertex clustering
+
+    The clustering grid size is bisected until the surviving face count is
+    close to target_faces. Each cluster collapses to the point minimizing its
+    summed plane quadric (clamped to the cluster cell); locked vertices keep
+    their exact position.
+
+    Returns:
+        (vertices, faces, locked) of the decimated cell
+    """
+    if target_faces >= len(faces):
+        return vertices, faces, locked
+
+    quadrics, area = vertex_quadrics(vertices, faces)
+
+    # Initial guess: clusters of side h cover about h^2 of surface each and a
+    # closed surface has about half as many vertices as faces
+    size = math.sqrt(max(area, 1e-12) / max(target_faces / 2, 1))
+    low, high = size / 8, size * 8
+    best = None
+    for _ in range(10):
+        size = math.sqrt(low * high)
+        clusters = cluster_ids(vertices, locked, lower, size)
+        count = len(surviving_faces(clusters, faces))
+        if best is None or abs(count - target_faces) < abs(best[1] - target_faces):
+            best = (size, count, clusters)
+        if count > target_faces:
+            low = size
+        else:
+            high = size
+    size, _, clusters = best
+
+    cluster_count = int(clusters.max()) + 1
+    summed = np.empty((cluster_count, 10))
+    for k in range(10):
+        summed[:, k] = np.bincount(clusters, weights=quadrics[:, k], minlength=cluster_count)
+    members = np.bincount(clusters, minlength=cluster_count)
+    mean = np.stack([np.bincount(clusters, weights=vertices[:, k].astype(np.float64),
+                                 minlength=cluster_count) for k in range(3)], axis=1) / members[:, None]
+
+    a = summed[:, [0, 1, 2, 1, 3, 4, 2, 4, 5]].reshape(-1, 3, 3)
+    b = summed[:, 6:9]
+    det = np.linalg.det(a)
+    solvable = np.abs(det) > 1e-12 * np.maximum(np.abs(a).max(axis=(1, 2)), 1e-30) ** 3
+    positions = mean.copy()
+    if solvable.any():
+        positions[solvable] = np.linalg.solve(a[solvable], -b[solvable][..., None])[..., 0]
+
+    # Keep optimal points inside their cluster cell
+    cell_lower = lower + np.floor((mean - lower) / size) * size
+    positions = np.clip(positions, cell_lower, cell_lower + size)
+
+    cluster_locked = np.zeros(cluster_count, dtype=bool)
+    cluster_locked[clusters[locked]] = True
+    positions[clusters[locked]] = vertices[locked]
+
+    new_faces = surviving_faces(clusters, faces)
+    _, unique_rows = np.unique(np.sort(new_faces, axis=1), axis=0, return_index=True)
+    new_faces = new_faces[np.sort(unique_rows)]
+
+    used = np.unique(new_faces)
+    remap = np.full(cluster_count, -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    return positions[used].astype(np.float32), remap[new_faces], cluster_locked[used]
+
+def write_glb_streaming(output_file, vertex_count, face_count, lower, upper, write_positions, write_indices):
+    """
+    Write a single-mesh GLB whose buffers are produced by callbacks
+
+    write_positions(f) must write vertex_count float32 xyz triples and
+    write_indices(f) face_count uint32 index triples, in that order.
+    """
+    position_bytes = vertex_count * 12
+    index_bytes = face_count * 12
+    gltf = {
+        "asset": {"version": "2.0", "generator": "create_lod_advanced out-of-core"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "mode": 4}]}],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": vertex_count, "type": "VEC3",
+             "min": [float(x) for x in lower], "max": [float(x) for x in upper]},
+            {"bufferView": 1, "componentType": 5125, "count": face_count * 3, "type": "SCALAR"},
+        ],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": position_bytes, "target": 34962},
+            {"buffer": 0, "byteOffset": position_bytes, "byteLength": index_bytes, "target": 34963},
+        ],
+        "buffers": [{"byteLength": position_bytes + index_bytes}],
+    }
+    json_bytes = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_bytes += b' ' * (-len(json_bytes) % 4)
+    total = 12 + 8 + len(json_bytes) + 8 + position_bytes + index_bytes
+
+    with open(output_file, 'wb') as f:
+        f.write(struct.pack('<III', GLB_MAGIC, 2, total))
+        f.write(struct.pack('<II', len(json_bytes), GLB_CHUNK_JSON))
+        f.write(json_bytes)
+        f.write(struct.pack('<II', position_bytes + index_bytes, GLB_CHUNK_BIN))
+        write_positions(f)
+        write_indices(f)
+
+def stitch_level(cells, lod_name, work_dir, output_file):
+    """
+    Merge the decimated cells of one level into a GLB
+
+    Locked border vertices are shared between neighbouring cells at identical
+    positions; they are de-duplicated into one table written first, followed
+    by each cell's free vertices.
+
+    Returns:
+        Number of faces written
+    """
+    parts = [os.path.join(work_dir, f"{os.path.basename(cell['path'])[:-4]}_{lod_name}.npz")
+             for cell in cells]
+    parts = [part for part in parts if os.path.exists(part)]
+
+    locked_tables = []
+    free_counts = []
+    face_count = 0
+    lower = np.full(3, np.inf)
+    upper = np.full(3, -np.inf)
+    for part in parts:
+        with np.load(part) as data:
+            vertices, locked = data['vertices'], data['locked']
+            locked_tables.append(vertices[locked])
+            free_counts.append(int((~locked).sum()))
+            face_count += len(data['faces'])
+            if len(vertices):
+                lower = np.minimum(lower, vertices.min(axis=0))
+                upper = np.maximum(upper, vertices.max(axis=0))
+
+    shared = np.concatenate(locked_tables) if locked_tables else np.zeros((0, 3), np.float32)
+    shared_keys = np.unique(np.ascontiguousarray(shared).view(np.dtype((np.void, 12))).ravel())
+    shared = shared_keys.view(np.float32).reshape(-1, 3)
+    vertex_count = len(shared) + sum(free_counts)
+
+    def write_positions(f):
+        shared.astype('<f4').tofile(f)
+        for part in parts:
+            with np.load(part) as data:
+                data['vertices'][~data['locked']].astype('<f4').tofile(f)
+
+    def write_indices(f):
+        offset = len(shared)
+        for part, free_count in zip(parts, free_counts):
+            with np.load(part) as data:
+                vertices, faces, locked = data['vertices'], data['faces'], data['locked']
+                remap = np.empty(len(vertices), dtype=np.int64)
+                keys = np.ascontiguousarray(vertices[locked]).view(np.dtype((np.void, 12))).ravel()
+                remap[locked] = np.searchsorted(shared_keys, keys)
+                remap[~locked] = offset + np.arange(free_count)
+                remap[faces].astype('<u4').tofile(f)
+            offset += free_count
+
+    write_glb_streaming(output_file, vertex_count, face_count, lower, upper, write_positions, write_indices)
+    return face_count
+
+def create_lod_levels_out_of_core(input_file, output_dir, clean_name, lod_config, max_memory_mb=2048,
+                                  finish_options=None):
+    """
+    Create LOD levels of a GLB with memory bounded by max_memory_mb
+
+    Args:
+        input_file: Local GLB file
+        output_dir: Directory to save LOD models
+        clean_name: Base name of the output files
+        lod_config: Dictionary with LOD ratios
+        max_memory_mb: Memory budget that determines the cell size
+        finish_options: Keyword arguments for finish_level applied to each exported level
+
+    Returns:
+        List of dicts (lod, faces, file, size, time) for the exported levels
+    """
+    stats = glb_statistics(input_file)
+    if stats['bounds'] is None:
+        raise ValueError("POSITION accessors without min/max are not supported out-of-core")
+    lower, upper = (np.array(bound) for bound in stats['bounds'])
+    original_faces, original_vertices = stats['faces'], stats['vertices']
+    max_cell_faces = max(int(max_memory_mb * 1024 * 1024 / OOC_BYTES_PER_FACE), 1000)
+    shape = grid_shape(lower, upper, math.ceil(original_faces / max_cell_faces))
+
+    print(f"\nOut-of-core build: {original_faces:,} faces, {original_vertices:,} vertices")
+    print(f"Memory budget: {max_memory_mb:,} MB (up to {max_cell_faces:,} faces per cell)")
+    print(f"Grid: {shape[0]} x {shape[1]} x {shape[2]} cells")
+
+    results = []
+    levels = sorted(lod_config.items(), key=lambda x: -x[1])
+
+    with tempfile.TemporaryDirectory(prefix='.ooc_', dir=output_dir) as work_dir:
+        start_time = time.time()
+        counts = bin_triangles(input_file, work_dir, lower, upper, shape)
+        cell_size = (upper - lower) / shape
+
+        cells = []
+        for index in np.flatnonzero(counts):
+            coords = np.array(np.unravel_index(index, tuple(shape)))
+            path = os.path.join(work_dir, f"cell_{index}.bin")
+            cell = {
+                'path': path,
+                'lower': lower + coords * cell_size,
+                'upper': lower + (coords + 1) * cell_size,
+                'borders': [border_path(path)],
+                'faces': int(counts[index]),
+            }
+            cells.extend(split_cell(cell, work_dir, max_cell_faces))
+        print(f"Binned into {len(cells)} cells in {time.time() - start_time:.2f}s "
+              f"(largest: {max(cell['faces'] for cell in cells):,} faces)")
+
+        decimate_start = time.time()
+        for i, cell in enumerate(cells):
+            soup = np.fromfile(cell['path'], dtype=np.float32).reshape(-1, 3, 3)
+            vertices, faces = weld_soup(soup)
+            del soup
+            locked = locked_vertices(vertices, cell)
+            for lod_name, ratio in levels:
+                if ratio == 1.0:
+                    continue
+                target_faces = max(int(len(faces) * ratio), 1)
+                out_vertices, out_faces, out_locked = cluster_decimate(
+                    vertices, faces, locked, target_faces, cell['lower'], cell['upper'])
+                part = os.path.join(work_dir, f"{os.path.basename(cell['path'])[:-4]}_{lod_name}.npz")
+                np.savez(part, vertices=out_vertices, faces=out_faces, locked=out_locked)
+            os.remove(cell['path'])
+            print(f"  Cell {i + 1}/{len(cells)}: {len(faces):,} faces, {int(locked.sum()):,} locked vertices",
+                  end='\r')
+        decimate_time = time.time() - decimate_start
+        print(f"\nDecimated {len(cells)} cells in {decimate_time:.2f}s")
+
+        for lod_name, ratio in levels:
+            print(f"\nProcessing {lod_name} (target: {ratio*100:.0f}%)...")
+            start_time = time.time()
+            output_file = os.path.join(output_dir, f"{clean_name}_{lod_name}.glb")
+            try:
+                if ratio == 1.0:
+                    shutil.copyfile(input_file, output_file)
+                    face_count = original_faces
+                else:
+                    face_count = stitch_level(cells, lod_name, work_dir, output_file)
+                    if face_count > original_faces * ratio * RATIO_WARNING_FACTOR:
+                        print(f"  ⚠️ {lod_name} keeps {face_count / original_faces:.1%} of the faces "
+                              f"(target {ratio:.0%}): the vertices on cell borders stay fixed and the cells "
+                              f"are small, raise --max-memory for larger cells")
+                if finish_options:
+                    finish_level(output_file, lod_name, **finish_options)
+            except Exception as e:
+                print(f"  Error exporting {lod_name}: {e}")
+                continue
+            results.append(report_level(lod_name, face_count, original_faces, output_file,
+                                        time.time() - start_time))
+
+    return results
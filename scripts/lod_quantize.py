@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+KHR_mesh_quantization output for exported LOD GLB files
+
+Float32 vertex attributes are rewritten as integers:
+
+- POSITION as int16, with the dequantization (uniform scale and offset)
+  stored on a node that carries the mesh; the bit depth is set per level
+- NORMAL as normalized int8
+- TEXCOORD_n as normalized uint16 when the coordinates lie in [0, 1]
+- indices as uint16 when a mesh has fewer than 65536 vertices
+
+A uniform scale keeps normals valid under the node transform. three.js and
+other glTF loaders decode these attributes natively, no decoder library needed.
+"""
+
+import os
+
+import numpy as np
+
+from create_lod_advanced import write_glb, rebuild_buffer
+from glb_stats import read_glb
+from lod_out_of_core import accessor_view
+
+# Position bits per LOD level (stored in int16, so at most 16)
+DEFAULT_POSITION_BITS = {
+    'lod0': 16,
+    'lod1': 16,
+    'lod2': 14,
+    'lod3': 12,
+    'lod4': 12,
+}
+
+EXTENSION = 'KHR_mesh_quantization'
+
+SHORT = 5122
+BYTE = 5120
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+FLOAT = 5126
+
+def padded_rows(values, dtype, row_bytes):
+    """Encode (n, k) integers with each row padded to row_bytes (vertex attribute alignment)"""
+    itemsize = np.dtype(dtype).itemsize
+    columns = row_bytes // itemsize
+    rows = np.zeros((len(values), columns), dtype=dtype)
+    rows[:, :values.shape[1]] = values
+    return rows.tobytes()
+
+def dequantization_transform(positions, bits):
+    """
+    Uniform scale and offset mapping the positions' bounding box onto signed integers
+
+    Returns:
+        (scale, offset) with positions ~= quantized * scale + offset
+    """
+    lower = positions.min(axis=0)
+    upper = positions.max(axis=0)
+    steps = 2 ** (bits - 1) - 1
+    scale = max(float((upper - lower).max()) / 2 / steps, 1e-30)
+    return scale, (lower + upper) / 2
+
+def quantize_positions(positions, scale, offset, bits):
+    """Quantize positions to int16 values within the given bit depth"""
+    steps = 2 ** (bits - 1) - 1
+    return np.clip(np.round((positions - offset) / scale), -steps, steps).astype(np.int16)
+
+def quantize_glb(glb_path, position_bits=14):
+    """
+    Rewrite the float attributes of a GLB with KHR_mesh_quantization in place
+
+    Returns:
+        Dict with 'bytes_before', 'bytes_after' and 'max_error' (largest
+        position error in model units, before node transforms)
+    """
+    bytes_before = os.path.getsize(glb_path)
+    gltf, binary = read_glb(glb_path)
+    data = np.frombuffer(binary, dtype=np.uint8)
+    accessors = gltf.get('accessors', [])
+
+    view_users = {}
+    for accessor in accessors:
+        if 'bufferView' in accessor:
+            view_users[accessor['bufferView']] = view_users.get(accessor['bufferView'], 0) + 1
+
+    replacements = {}
+    appended = []
+    strides = {}
+
+    def store(accessor, encoded, component_type, stride, normalized):
+        view_index = accessor['bufferView']
+        if view_users[view_index] == 1:
+            replacements[view_index] = encoded
+        else:
+            view_index = len(gltf['bufferViews']) + len(appended)
+            appended.append({'buffer': 0, 'byteLength': len(encoded),
+                             'target': 34962 if stride else 34963})
+            replacements[view_index] = encoded
+        accessor['bufferView'] = view_index
+        accessor['byteOffset'] = 0
+        accessor['componentType'] = component_type
+        if normalized:
+            accessor['normalized'] = True
+        else:
+            accessor.pop('normalized', None)
+        if stride:
+            strides[view_index] = stride
+
+    done = set()
+    max_error = 0.0
+    quantized_meshes = {}
+
+    for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+        primitives = [p for p in mesh.get('primitives', [])
+                      if accessors[p['attributes']['POSITION']]['componentType'] == FLOAT
+                      and 'sparse' not in accessors[p['attributes']['POSITION']]]
+        if not primitives:
+            continue
+
+        # One dequantization transform per mesh, shared by all its primitives
+        position_indices = sorted({p['attributes']['POSITION'] for p in primitives})
+        positions = {i: np.array(accessor_view(gltf, data, 0, i), dtype=np.float64) for i in position_indices}
+        scale, offset = dequantization_transform(np.concatenate(list(positions.values())), position_bits)
+        quantized_meshes[mesh_index] = (scale, offset)
+
+        for index, values in positions.items():
+            quantized = quantize_positions(values, scale, offset, position_bits)
+            max_error = max(max_error, float(np.abs(quantized * scale + offset - values).max()))
+            accessor = accessors[index]
+            store(accessor, padded_rows(quantized, np.int16, 8), SHORT, 8, False)
+            accessor['min'] = quantized.min(axis=0).tolist()
+            accessor['max'] = quantized.max(axis=0).tolist()
+            done.add(index)
+
+        for primitive in primitives:
+            for name, index in primitive['attributes'].items():
+                accessor = accessors[index]
+                if index in done or accessor['componentType'] != FLOAT or 'sparse' in accessor:
+                    continue
+                if name == 'NORMAL':
+                    normals = np.array(accessor_view(gltf, data, 0, index), dtype=np.float64)
+                    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+                    normals = normals / np.where(lengths > 0, lengths, 1)
+                    encoded = np.round(normals * 127).astype(np.int8)
+                    store(accessor, padded_rows(encoded, np.int8, 4), BYTE, 4, True)
+                elif name.startswith('TEXCOORD_'):
+                    uv = np.array(accessor_view(gltf, data, 0, index), dtype=np.float64)
+                    if uv.size and (uv.min() < 0 or uv.max() > 1):
+                        # Would need KHR_texture_transform to remap; keep float
+                        continue
+                    encoded = np.round(uv * 65535).astype(np.uint16)
+                    store(accessor, encoded.tobytes(), UNSIGNED_SHORT, 4, True)
+                else:
+                    continue
+                accessor.pop('min', None)
+                accessor.pop('max', None)
+                done.add(index)
+
+            # Meshes with fewer than 65536 vertices only need 16-bit indices
+            index = primitive.get('indices')
+            if index is None or index in done or accessors[index]['componentType'] != UNSIGNED_INT:
+                continue
+            if accessors[primitive['attributes']['POSITION']]['count'] <= 65535:
+                indices = accessor_view(gltf, data, 0, index)[:, 0].astype(np.uint16)
+                store(accessors[index], indices.tobytes(), UNSIGNED_SHORT, None, False)
+                done.add(index)
+
+    if not quantized_meshes:
+        return {'bytes_before': bytes_before, 'bytes_after': bytes_before, 'max_error': 0.0}
+
+    gltf['bufferViews'].extend(appended)
+    for view_index, stride in strides.items():
+        gltf['bufferViews'][view_index]['byteStride'] = stride
+
+    move_meshes_to_dequantization_nodes(gltf, quantized_meshes)
+
+    for key in ('extensionsUsed', 'extensionsRequired'):
+        extensions = gltf.setdefault(key, [])
+        if EXTENSION not in extensions:
+            extensions.append(EXTENSION)
+
+    binary = rebuild_buffer(gltf, binary, replacements)
+    write_glb(glb_path, gltf, binary)
+    return {'bytes_before': bytes_before, 'bytes_after': os.path.getsize(glb_path), 'max_error': max_error}
+
+def move_meshes_to_dequantization_nodes(gltf, quantized_meshes):
+    """
+    Put each quantized mesh on its own child node carrying the dequantization
+
+    The original node keeps its transform and children; only the mesh moves
+    down one level, so the rest of the hierarchy is unaffected.
+    """
+    nodes = gltf.setdefault('nodes', [])
+    if not nodes:
+        nodes.extend({'mesh': i} for i in range(len(gltf.get('meshes', []))))
+        gltf['scenes'] = [{'nodes': list(range(len(nodes)))}]
+        gltf['scene'] = 0
+
+    for node in list(nodes):
+        mesh_index = node.get('mesh')
+        if mesh_index not in quantized_meshes:
+            continue
+        scale, offset = quantized_meshes[mesh_index]
+        child = {
+            'name': f"{node.get('name', 'mesh')}_dequantize",
+            'mesh': mesh_index,
+            'translation': [float(x) for x in offset],
+            'scale': [scale, scale, scale],
+        }
+        for key in ('skin', 'weights'):
+            if key in node:
+                child[key] = node.pop(key)
+        del node['mesh']
+        node.setdefault('children', []).append(len(nodes))
+        nodes.append(child)
+
+def apply_level_quantization(glb_path, lod_name, quantize_bits):
+    """Quantize an exported level with the bit depth configured for it"""
+    bits = min(int(quantize_bits.get(lod_name, 16)), 16)
+    stats = quantize_glb(glb_path, bits)
+    if stats['bytes_before'] == stats['bytes_after']:
+        return stats
+    reduction = (1 - stats['bytes_after'] / stats['bytes_before']) * 100
+    print(f"  Quantized ({bits}-bit positions): {stats['bytes_before'] / 1024:,.0f} KB -> "
+          f"{stats['bytes_after'] / 1024:,.0f} KB (-{reduction:.1f}%), "
+          f"max position error {stats['max_error']:.3g}")
+    return stats
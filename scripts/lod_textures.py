@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Per-LOD texture downscaling and re-encoding for exported GLB files
+
+Each LOD level carries a texture scale (lod4 gets 1/8 of the original size by
+default) and an encoding quality. Images embedded in the GLB are resampled and
+re-encoded in a thread pool (Pillow releases the GIL while resizing and
+encoding), then the binary chunk is repacked around the new image data.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+
+from create_lod_advanced import write_glb, rebuild_buffer
+from glb_stats import read_glb
+
+# Texture size relative to the original, per LOD level
+DEFAULT_TEXTURE_SCALES = {
+    'lod0': 1.0,
+    'lod1': 1.0,
+    'lod2': 0.5,
+    'lod3': 0.25,
+    'lod4': 0.125,
+}
+
+# JPEG/WebP encoding quality per LOD level
+DEFAULT_TEXTURE_QUALITY = {
+    'lod0': 90,
+    'lod1': 85,
+    'lod2': 80,
+    'lod3': 75,
+    'lod4': 70,
+}
+
+# Textures are never scaled below this size (pixels, shorter side)
+MIN_TEXTURE_SIZE = 16
+
+FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+# File extensions of images moved out of a GLB (see share_glb_textures)
+IMAGE_EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp'}
+
+def resample_image(data, scale, image_format='keep', quality=85):
+    """
+    Resample and re-encode one encoded image
+
+    Args:
+        data: Encoded image bytes
+        scale: Size factor relative to the original
+        image_format: 'jpeg', 'png', 'webp' or 'keep' (same format as the input)
+        quality: Encoding quality for JPEG and WebP
+
+    Returns:
+        (bytes, mime_type) of the re-encoded image
+    """
+    image = Image.open(BytesIO(data))
+    if image_format == 'keep':
+        image_format = 'jpeg' if image.format == 'JPEG' else 'webp' if image.format == 'WEBP' else 'png'
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if image_format == 'jpeg' and has_alpha and image.convert('RGBA').getextrema()[3][0] < 255:
+        # JPEG cannot store transparency
+        image_format = 'png'
+
+    if scale < 1.0:
+        width, height = image.size
+        factor = max(scale, MIN_TEXTURE_SIZE / max(min(width, height), 1))
+        size = (max(int(round(width * factor)), 1), max(int(round(height * factor)), 1))
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+
+    pil_format, mime_type = FORMATS[image_format]
+    if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    options = {'optimize': True}
+    if pil_format in ('JPEG', 'WEBP'):
+        options['quality'] = quality
+    with BytesIO() as output:
+        image.save(output, format=pil_format, **options)
+        return output.getvalue(), mime_type
+
+def process_glb_textures(glb_path, scale=1.0, image_format='keep', quality=85, workers=None):
+    """
+    Downscale and re-encode every embedded image of a GLB file in place
+
+    Returns:
+        (image_count, bytes_before, bytes_after) for the processed images
+    """
+    if scale >= 1.0 and image_format == 'keep':
+        return 0, 0, 0
+
+    gltf, binary = read_glb(glb_path)
+    images = [(index, image) for index, image in enumerate(gltf.get('images', []))
+              if 'bufferView' in image]
+    if not images:
+        return 0, 0, 0
+
+    def encode(image):
+        view = gltf['bufferViews'][image['bufferView']]
+        start = view.get('byteOffset', 0)
+        return resample_image(binary[start:start + view['byteLength']], scale, image_format, quality)
+
+    with ThreadPoolExecutor(max_workers=workers or min(len(images), os.cpu_count() or 1)) as executor:
+        encoded = list(executor.map(encode, (image for _, image in images)))
+
+    replacements = {}
+    bytes_before = bytes_after = 0
+    for (index, image), (data, mime_type) in zip(images, encoded):
+        bytes_before += gltf['bufferViews'][image['bufferView']]['byteLength']
+        bytes_after += len(data)
+        replacements[image['bufferView']] = data
+        image['mimeType'] = mime_type
+
+    if any(mime_type == 'image/webp' for _, mime_type in encoded):
+        use_webp_extension(gltf)
+
+    binary = rebuild_buffer(gltf, binary, replacements)
+    write_glb(glb_path, gltf, binary)
+    return len(images), bytes_before, bytes_after
+
+def share_glb_textures(glb_path, texture_dir):
+    """
+    Move every embedded image of a GLB file into texture_dir, referenced by URI
+
+    Images are named after a hash of their bytes, so GLBs holding the same
+    texture (such as the tiles of one model) share a single file.
+
+    Returns:
+        (image_count, bytes_moved)
+    """
+    gltf, binary = read_glb(glb_path)
+    images = [image for image in gltf.get('images', []) if 'bufferView' in image]
+    if not images:
+        return 0, 0
+
+    os.makedirs(texture_dir, exist_ok=True)
+    dropped = set()
+    bytes_moved = 0
+    for image in images:
+        view = gltf['bufferViews'][image['bufferView']]
+        start = view.get('byteOffset', 0)
+        data = binary[start:start + view['byteLength']]
+        name = hashlib.sha1(data).hexdigest()[:16] + IMAGE_EXTENSIONS.get(image.get('mimeType'), '.bin')
+        path = os.path.join(texture_dir, name)
+        if not os.path.exists(path):
+            # Other processes may write the same image concurrently
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        dropped.add(image.pop('bufferView'))
+        image['uri'] = os.path.relpath(path, os.path.dirname(glb_path)).replace(os.sep, '/')
+        bytes_moved += len(data)
+
+    # Drop the image buffer views and renumber the remaining ones; their
+    # offsets still point into the old BIN chunk until it is repacked
+    kept = [index for index in range(len(gltf['bufferViews'])) if index not in dropped]
+    renumber = {index: position for position, index in enumerate(kept)}
+    gltf['bufferViews'] = [gltf['bufferViews'][index] for index in kept]
+    references = list(gltf.get('accessors', [])) + gltf.get('images', [])
+    for accessor in gltf.get('accessors', []):
+        sparse = accessor.get('sparse')
+        if sparse:
+            references += [sparse['indices'], sparse['values']]
+    for item in references:
+        if 'bufferView' in item:
+            item['bufferView'] = renumber[item['bufferView']]
+
+    binary = rebuild_buffer(gltf, binary, {})
+    write_glb(glb_path, gltf, binary)
+    return len(images), bytes_moved
+
+def use_webp_extension(gltf):
+    """Reference WebP images through EXT_texture_webp, as core glTF only allows PNG/JPEG"""
+    images = gltf.get('images', [])
+    for texture in gltf.get('textures', []):
+        source = texture.get('source')
+        if source is not None and images[source].get('mimeType') == 'image/webp':
+            texture.setdefault('extensions', {})['EXT_texture_webp'] = {'source': source}
+            del texture['source']
+    used = gltf.setdefault('extensionsUsed', [])
+    if 'EXT_texture_webp' not in used:
+        used.append('EXT_texture_webp')
+    required = gltf.setdefault('extensionsRequired', [])
+    if 'EXT_texture_webp' not in required:
+        required.append('EXT_texture_webp')
+
+def apply_level_textures(glb_path, lod_name, texture_options):
+    """
+    Apply the texture settings of one LOD level to an exported GLB
+
+    Args:
+        texture_options: {'scales': {lod: factor}, 'format': str, 'quality': {lod: int}}
+    """
+    scale = texture_options.get('scales', DEFAULT_TEXTURE_SCALES).get(lod_name, 1.0)
+    quality = texture_options.get('quality', DEFAULT_TEXTURE_QUALITY).get(lod_name, 85)
+    image_format = texture_options.get('format', 'keep')
+
+    count, before, after = process_glb_textures(glb_path, scale, image_format, quality)
+    if count:
+        print(f"  Textures: {count} image(s) at {scale:g}x, "
+              f"{before / 1024:,.0f} KB -> {after / 1024:,.0f} KB")
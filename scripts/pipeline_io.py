@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Output helpers shared by the pipeline scripts
+
+Manifests, the collection, sidecar records and state files are read by
+viewers and by concurrent runs while the pipeline writes them, so they are
+written through a temporary file and renamed into place.
+"""
+
+import json
+import os
+
+def write_json_atomic(path, data):
+    """Write JSON through a temporary file so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # One temporary name per process, so concurrent writers do not share it
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and memory spans for the pipeline scripts
+
+Stages are wrapped in spans:
+
+    with span('decimate', faces=target_faces):
+        ...
+
+Each span records wall time, CPU time of the process, the resident set size
+and its high-water mark when the span ends, and the peak of Python-tracked
+allocations (tracemalloc, which includes NumPy arrays) while it was open.
+Spans nest per thread; a parent's tracemalloc peak covers its children
+(tracemalloc and RSS are per process, so spans running at the same time in
+other threads share their peaks).
+
+Spans cost nothing until profiling is started, which the scripts do with
+--profile PATH (see add_profile_argument and profile_session). A path
+ending in .json is written as a Chrome trace (chrome://tracing, Perfetto),
+anything else as JSON lines, one span per line. Only the main process is
+recorded; work done in pool workers shows up as the span waiting for it.
+tracemalloc slows allocation-heavy code down, so profiled runs are slower
+than normal ones.
+"""
+
+import contextlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+_state = {'enabled': False, 'spans': [], 'origin': 0.0}
+_local = threading.local()
+
+def start_profiling(trace_allocations=True):
+    """Start recording spans (and Python allocations, unless trace_allocations is False)"""
+    _state.update(enabled=True, spans=[], origin=time.perf_counter())
+    _local.stack = []
+    if trace_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def stop_profiling():
+    """Stop recording and return the finished spans"""
+    _state['enabled'] = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return _state['spans']
+
+def current_rss_mb():
+    """Resident set size of this process in MB (None where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peak_rss_mb():
+    """High-water mark of this process's resident set size in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _take_traced_peak():
+    """Peak traced memory since the last call, resetting it"""
+    if not tracemalloc.is_tracing():
+        return 0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    return peak
+
+@contextlib.contextmanager
+def span(name, **args):
+    """Record one stage; extra keyword arguments are stored with the span"""
+    if not _state['enabled']:
+        yield
+        return
+
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    stack = _local.stack
+    if stack:
+        stack[-1]['traced_peak'] = max(stack[-1]['traced_peak'], _take_traced_peak())
+    else:
+        _take_traced_peak()
+    frame = {'traced_peak': 0}
+    stack.append(frame)
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    start_peak_rss = peak_rss_mb()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - start_wall
+        cpu = time.process_time() - start_cpu
+        stack.pop()
+        traced_peak = max(frame['traced_peak'], _take_traced_peak())
+        if stack:
+            stack[-1]['traced_peak'] = max(stack[-1]['traced_peak'], traced_peak)
+        end_peak_rss = peak_rss_mb()
+        rss = current_rss_mb()
+        _state['spans'].append({
+            'name': name,
+            'args': args,
+            'depth': len(stack),
+            'start_s': round(start_wall - _state['origin'], 6),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'rss_mb': round(rss, 1) if rss is not None else None,
+            'peak_rss_mb': round(end_peak_rss, 1),
+            'peak_rss_growth_mb': round(end_peak_rss - start_peak_rss, 1),
+            'python_peak_mb': round(traced_peak / (1024 * 1024), 1) if tracemalloc.is_tracing() else None,
+            'pid': os.getpid(),
+            'thread': threading.current_thread().name,
+        })
+
+def write_profile(path, spans):
+    """Write spans as a Chrome trace (.json) or as JSON lines (any other extension)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.lower().endswith('.json'):
+        events = []
+        threads = {}
+        for record in spans:
+            thread = record.get('thread', 'MainThread')
+            if thread not in threads:
+                threads[thread] = len(threads)
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': record['pid'], 'tid': threads[thread],
+                               'args': {'name': thread}})
+        for record in sorted(spans, key=lambda record: record['start_s']):
+            metrics = {key: record[key] for key in ('cpu_s', 'rss_mb', 'peak_rss_mb', 'peak_rss_growth_mb',
+                                                    'python_peak_mb')}
+            events.append({'name': record['name'], 'cat': 'pipeline', 'ph': 'X', 'pid': record['pid'],
+                           'tid': threads[record.get('thread', 'MainThread')],
+                           'ts': int(record['start_s'] * 1e6), 'dur': max(int(record['wall_s'] * 1e6), 1),
+                           'args': {**record['args'], **metrics}})
+            if record['rss_mb'] is not None:
+                end = int((record['start_s'] + record['wall_s']) * 1e6)
+                events.append({'name': 'memory', 'ph': 'C', 'pid': record['pid'], 'tid': 0, 'ts': end,
+                               'args': {'rss_mb': record['rss_mb']}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in spans:
+                f.write(json.dumps(record, default=str) + '\n')
+
+def print_profile_summary(spans):
+    """Print wall, CPU and memory per span name, slowest first"""
+    totals = {}
+    for record in spans:
+        total = totals.setdefault(record['name'], {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                   'peak_rss_mb': 0.0, 'python_peak_mb': 0.0})
+        total['count'] += 1
+        total['wall_s'] += record['wall_s']
+        total['cpu_s'] += record['cpu_s']
+        total['peak_rss_mb'] = max(total['peak_rss_mb'], record['peak_rss_mb'])
+        total['python_peak_mb'] = max(total['python_peak_mb'], record['python_peak_mb'] or 0.0)
+
+    print("\nProfile:")
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]['wall_s']):
+        print(f"  {name:<24} {total['count']:>4}x  wall {total['wall_s']:8.2f}s  cpu {total['cpu_s']:8.2f}s  "
+              f"peak RSS {total['peak_rss_mb']:8,.0f} MB  python peak {total['python_peak_mb']:8,.0f} MB")
+
+def add_profile_argument(parser):
+    """Add the --profile option to a script's argument parser"""
+    parser.add_argument('--profile', metavar='PATH',
+                        help='Record per-stage time and memory spans to PATH '
+                             '(.json: Chrome trace, otherwise JSON lines)')
+
+@contextlib.contextmanager
+def profile_session(path, name='main'):
+    """
+    Profile the enclosed block into path when path is set
+
+    The block itself is the outermost span; the file is written even if the
+    block raises or exits.
+    """
+    if not path:
+        yield
+        return
+    start_profiling()
+    try:
+        with span(name, argv=' '.join(sys.argv[1:])):
+            yield
+    finally:
+        spans = stop_profiling()
+        write_profile(path, spans)
+        print_profile_summary(spans)
+        print(f"Profile written to {path} ({len(spans)} spans)")
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Run the whole model pipeline with each source mesh loaded once
+
+Every model goes through a small stage graph:
+
+    ingest -> clean -> lod (+ thumbnail) -> manifest -> collection
+
+A stage starts as soon as the stages it needs have finished. With --jobs N,
+N models are in flight at once, each in its own process: the quadric
+decimator is not thread-safe, and concurrent calls in one process return
+each other's meshes. The collection is updated once at the end.
+Meshes are handed from stage to stage in memory and dropped when no later
+stage needs them: the source is parsed once (ingest) and cleaned once, and
+the levels are decimated from that mesh.
+
+The stages call the functions of the standalone scripts
+(create_lod_advanced.py, create_model_manifest.py, fix_manifest_urls.py,
+create_collection.py) with their defaults. As in watch_ingest.py, the
+thumbnail is rendered by the LOD build from the cheapest level dense enough
+for it (see thumbnail_source). A failed thumbnail does not stop the
+manifest.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from pipeline_io import write_json_atomic
+from pipeline_profile import span, add_profile_argument, profile_session
+
+def run_stage_graph(stages, workers=2):
+    """
+    Run a dependency graph of stages on a thread pool
+
+    A stage whose dependency failed is skipped. Results are released once
+    every stage depending on them has finished.
+
+    Args:
+        stages: {name: (dependencies, function)}; function is called with the
+            results of its dependencies, in order, once they have all succeeded
+        workers: Stages running at the same time
+
+    Returns:
+        (results of the stages nothing depends on, {name: error} of failed
+        and skipped stages)
+    """
+    dependents = {name: [other for other, (dependencies, _) in stages.items() if name in dependencies]
+                  for name in stages}
+    pending = dict(stages)
+    results, errors, running = {}, {}, {}
+
+    def run_stage(name, function, inputs):
+        stage_start = time.time()
+        # Names may carry a model prefix ('scan:lod'); spans are grouped by stage
+        with span(name.rsplit(':', 1)[-1], stage=name):
+            result = function(*inputs)
+        print(f"  ✓ {name} ({time.time() - stage_start:.2f}s)")
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            # Skipping a stage can skip its dependents too, so repeat until stable
+            skipped = True
+            while skipped:
+                skipped = False
+                for name, (dependencies, function) in list(pending.items()):
+                    failed = [dependency for dependency in dependencies if dependency in errors]
+                    if failed:
+                        errors[name] = f"skipped, {failed[0]} failed"
+                        del pending[name]
+                        skipped = True
+                    elif all(dependency in results for dependency in dependencies):
+                        del pending[name]
+                        inputs = [results[dependency] for dependency in dependencies]
+                        running[executor.submit(run_stage, name, function, inputs)] = name
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    errors[name] = str(e)
+                    print(f"  ✗ {name}: {e}")
+                for dependency in stages[name][0]:
+                    if all(other in results or other in errors for other in dependents[dependency]):
+                        results.pop(dependency, None)
+
+    return results, errors
+
+def model_stages(input_file, options):
+    """Stage graph of one model (see run_stage_graph)"""
+    from create_lod_advanced import create_lod_levels, clean_model_name, load_model_mesh
+
+    name = clean_model_name(input_file)
+    model_dir = os.path.join(options['models_dir'], name)
+
+    def ingest():
+        print(f"\nLoading model: {input_file}")
+        mesh = load_model_mesh(input_file)
+        if mesh is None:
+            raise ValueError(f"no mesh geometry in {input_file}")
+        return mesh
+
+    def clean(mesh):
+        if not options['clean']:
+            return {'mesh': mesh, 'reference': mesh}
+        from lod_cleanup import clean_mesh, report_cleanup
+        cleaned, stats = clean_mesh(mesh, options['weld_tolerance'])
+        report_cleanup(stats, len(mesh.vertices), len(mesh.faces))
+        return {'mesh': cleaned, 'reference': mesh}
+
+    def lod(cleaned):
+        os.makedirs(model_dir, exist_ok=True)
+        thumbnail_path = os.path.join(options['thumbnails_dir'], f"{name}_thumbnail.png")
+        levels = create_lod_levels(input_file, model_dir, options['lod_config'], options['max_memory_mb'],
+                                   workers=options['workers'], texture_options=options['texture_options'],
+                                   optimize=options['optimize'], quantize_bits=options['quantize_bits'],
+                                   use_cache=options['use_cache'], measure_error=options['measure_error'],
+                                   clean=options['clean'], weld_tolerance=options['weld_tolerance'],
+                                   mesh=cleaned['mesh'],
+                                   reference_mesh=cleaned['reference'] if options['measure_error'] else None,
+                                   thumbnail=thumbnail_path)
+        if not levels:
+            raise RuntimeError("no LOD levels were built")
+        if not any(level.get('thumbnail') for level in levels):
+            print("\n⚠️ No thumbnail was rendered")
+        return levels
+
+    def manifest(levels):
+        from create_model_manifest import create_iiif_manifest
+        from fix_manifest_urls import fix_urls_in_dict
+        document = create_iiif_manifest(name, model_dir, options['url'], {'label': name},
+                                        thumbnails_dir=options['thumbnails_dir'])
+        if document is None:
+            raise RuntimeError("no manifest was created")
+        manifest_path = os.path.join(options['manifests_dir'], f"{name}_iiif.json")
+        write_json_atomic(manifest_path, fix_urls_in_dict(document))
+        return manifest_path
+
+    return {
+        f"{name}:ingest": ([], ingest),
+        f"{name}:clean": ([f"{name}:ingest"], clean),
+        f"{name}:lod": ([f"{name}:clean"], lod),
+        f"{name}:manifest": ([f"{name}:lod"], manifest),
+    }
+
+def run_model(input_file, options):
+    """Worker: run the stage graph of one model"""
+    return run_stage_graph(model_stages(input_file, options), workers=2)
+
+def run_pipeline(inputs, options, jobs=1):
+    """
+    Run the stage graph of every model, then update the collection
+
+    Returns:
+        {stage name: error} of the failed and skipped stages
+    """
+    from watch_ingest import update_collection_file
+
+    manifests, errors = [], {}
+    pipeline_start = time.time()
+    if jobs > 1:
+        # One process per model: decimation is not thread-safe. Only the
+        # main process is profiled, so the models show up as waiting spans
+        with span('models', jobs=jobs), \
+                ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as executor:
+            model_results = list(executor.map(run_model, inputs, [options] * len(inputs)))
+    else:
+        model_results = [run_model(input_file, options) for input_file in inputs]
+    for results, model_errors in model_results:
+        manifests += [path for stage, path in results.items() if stage.endswith(':manifest')]
+        errors.update(model_errors)
+
+    if manifests:
+        with span('collection'):
+            collection_path = update_collection_file(manifests, options)
+        if collection_path:
+            print(f"\n  ✓ Collection updated: {collection_path} (+{len(manifests)} manifests)")
+
+    print(f"\nPipeline finished in {time.time() - pipeline_start:.1f}s: "
+          f"{len(manifests)} of {len(inputs)} models published")
+    return errors
+
+def main():
+    from create_lod_advanced import find_batch_inputs
+
+    parser = argparse.ArgumentParser(description='Build LODs, thumbnails, manifests and the collection '
+                                                 'for models, loading each model once')
+    parser.add_argument('input', nargs='+', help='GLB files, directories of GLB files or list files')
+    parser.add_argument('--models-dir', default='public/data/models',
+                        help='LOD output root, one directory per model (default: public/data/models)')
+    parser.add_argument('--thumbnails-dir', default='public/thumbnails',
+                        help='Thumbnail directory (default: public/thumbnails)')
+    parser.add_argument('--manifests-dir', default='public/data/manifests',
+                        help='Manifest and collection directory (default: public/data/manifests)')
+    parser.add_argument('-u', '--url', default='http://localhost:3000', help='Base URL for manifests')
+    parser.add_argument('--collection-url', default='http://localhost:3000/data/manifests',
+                        help='Base URL for the collection')
+    parser.add_argument('--collection-label', default='3D Models Collection',
+                        help='Label of a newly created collection')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Models processed at the same time, each in its own process (default: 1)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes decimating the levels of one model (default: 1)')
+    parser.add_argument('--max-memory', type=int, default=2048, help='Max memory in MB (default: 2048)')
+    parser.add_argument('--no-lod4', action='store_true', help='Skip LOD4 generation')
+    parser.add_argument('--clean', action='store_true',
+                        help='Weld vertices and drop degenerate/duplicate faces before decimating')
+    parser.add_argument('--weld-tolerance', type=float,
+                        help='With --clean: weld distance in model units (default: 1e-6 of bbox diagonal)')
+    parser.add_argument('--optimize', action='store_true',
+                        help='Reorder triangles/vertices for GPU cache locality and better compression')
+    parser.add_argument('--quantize', action='store_true', help='Write KHR_mesh_quantization levels')
+    parser.add_argument('--textures', action='store_true',
+                        help='Downscale and re-encode textures per level (off by default: textures are '
+                             'exported unchanged)')
+    parser.add_argument('--keep-textures', action='store_true',
+                        help='Export textures unchanged in every level (the default; overrides --textures)')
+    parser.add_argument('--no-error', action='store_true',
+                        help='Do not measure the surface error of each level against the original')
+    parser.add_argument('--force', action='store_true', help='Rebuild every level, ignoring the build record')
+    add_profile_argument(parser)
+
+    args = parser.parse_args()
+
+    inputs = []
+    for source in args.input:
+        inputs += [source] if os.path.isfile(source) and source.lower().endswith('.glb') \
+            else find_batch_inputs(source)
+    if not inputs:
+        parser.error("no models found")
+
+    # The same defaults as create_lod_advanced.py
+    lod_config = {"lod0": 1.0, "lod1": 0.5, "lod2": 0.25, "lod3": 0.1, "lod4": 0.05}
+    if args.no_lod4:
+        del lod_config["lod4"]
+    texture_options = None
+    if args.textures and not args.keep_textures:
+        from lod_textures import DEFAULT_TEXTURE_SCALES, DEFAULT_TEXTURE_QUALITY
+        texture_options = {'scales': dict(DEFAULT_TEXTURE_SCALES), 'quality': dict(DEFAULT_TEXTURE_QUALITY),
+                           'format': 'keep'}
+    quantize_bits = None
+    if args.quantize:
+        from lod_quantize import DEFAULT_POSITION_BITS
+        quantize_bits = dict(DEFAULT_POSITION_BITS)
+
+    options = {
+        'models_dir': args.models_dir,
+        'thumbnails_dir': args.thumbnails_dir,
+        'manifests_dir': args.manifests_dir,
+        'url': args.url,
+        'collection_url': args.collection_url,
+        'collection_label': args.collection_label,
+        'lod_config': lod_config,
+        'max_memory_mb': args.max_memory,
+        'workers': args.workers,
+        'clean': args.clean,
+        'weld_tolerance': args.weld_tolerance,
+        'optimize': args.optimize,
+        'quantize_bits': quantize_bits,
+        'texture_options': texture_options,
+        'measure_error': not args.no_error,
+        'use_cache': not args.force,
+    }
+
+    with profile_session(args.profile, 'run_pipeline'):
+        errors = run_pipeline(inputs, options, args.jobs)
+        if errors:
+            print(f"\n❌ {len(errors)} stages failed or were skipped:")
+            for stage, error in errors.items():
+                print(f"  - {stage}: {error}")
+            sys.exit(1)
+        print("\n✅ Pipeline completed successfully!")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        print("Usage examples:")
+        print("  python3 run_pipeline.py scan.glb")
+        print("  python3 run_pipeline.py scans/ --jobs 2 --clean")
+        print("  python3 run_pipeline.py a.glb b.glb --workers 4 --optimize")
+        print("\nFor more options: python3 run_pipeline.py -h")
+    else:
+        main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Single-pass scene merge with node transforms and optional instancing
+
+trimesh.util.concatenate(list(scene.geometry.values())) ignores the node
+graph: every geometry lands at its local origin once, however many nodes
+place it. Dumping the scene first fixes the placement but copies each
+geometry per node and then copies everything again into the result.
+
+merge_scene sizes the output from the node list, allocates the vertex,
+face (and normal) buffers once and writes each placed geometry straight into
+its slice with the node transform applied. With keep_instances, geometry
+placed by more than one node (columns, arches, bolts) stays out of the
+merged buffers and is returned once with its list of transforms, so callers
+that can draw or process instances never hold the baked copies.
+"""
+
+from collections import Counter
+
+import numpy as np
+import trimesh
+
+def scene_instances(scene):
+    """(geometry name, 4x4 world transform) of every node placing a non-empty mesh"""
+    placed = []
+    for node in scene.graph.nodes_geometry:
+        transform, name = scene.graph[node]
+        geometry = scene.geometry.get(name)
+        if isinstance(geometry, trimesh.Trimesh) and len(geometry.faces):
+            placed.append((name, transform))
+    return placed
+
+def merge_instances(geometry, placed, visuals=True, normals=False):
+    """
+    Bake placed geometries into one mesh, filling preallocated buffers
+
+    Args:
+        geometry: {name: trimesh.Trimesh}
+        placed: List of (geometry name, 4x4 transform)
+        visuals: Merge the parts' materials and UVs (False when only the
+            geometry is needed)
+        normals: Carry vertex normals; only set it when every part was
+            loaded with them, or normals are computed for the rest
+
+    Returns:
+        trimesh.Trimesh, or None when nothing is placed
+    """
+    if not placed:
+        return None
+    if len(placed) == 1 and np.allclose(placed[0][1], np.eye(4)):
+        return geometry[placed[0][0]]
+
+    meshes = [geometry[name] for name, _ in placed]
+    vertex_offsets = np.cumsum([0] + [len(mesh.vertices) for mesh in meshes])
+    face_offsets = np.cumsum([0] + [len(mesh.faces) for mesh in meshes])
+    vertices = np.empty((vertex_offsets[-1], 3), dtype=np.float64)
+    faces = np.empty((face_offsets[-1], 3), dtype=np.int64)
+    merged_normals = np.empty((vertex_offsets[-1], 3), dtype=np.float64) if normals else None
+
+    for i, (mesh, (_, transform)) in enumerate(zip(meshes, placed)):
+        v = slice(vertex_offsets[i], vertex_offsets[i + 1])
+        f = slice(face_offsets[i], face_offsets[i + 1])
+        rotation = transform[:3, :3]
+        np.matmul(mesh.vertices.view(np.ndarray), rotation.T, out=vertices[v])
+        vertices[v] += transform[:3, 3]
+        # Mirroring transforms flip the winding, as in Trimesh.apply_transform
+        mesh_faces = mesh.faces.view(np.ndarray)
+        np.add(mesh_faces[:, ::-1] if np.linalg.det(rotation) < 0 else mesh_faces, vertex_offsets[i], out=faces[f])
+        if merged_normals is not None:
+            np.matmul(mesh.vertex_normals.view(np.ndarray), np.linalg.inv(rotation), out=merged_normals[v])
+            merged_normals[v] /= np.maximum(np.linalg.norm(merged_normals[v], axis=1, keepdims=True), 1e-12)
+
+    merged = trimesh.Trimesh(vertices=vertices, faces=faces, vertex_normals=merged_normals, process=False)
+    if not visuals:
+        return merged
+    visual = merge_visuals([mesh.visual for mesh in meshes])
+    if visual is not None:
+        merged.visual = visual
+    return merged
+
+def merge_visuals(visuals):
+    """
+    Visual of the merged mesh, or None to drop visuals
+
+    Parts sharing one material (instances, split primitives) keep it with
+    their UVs stacked; anything else goes through trimesh's texture packing,
+    and like trimesh.util.concatenate the visuals are dropped if that fails.
+    """
+    if all(visual.kind is None for visual in visuals):
+        return None
+    first = visuals[0]
+    if (isinstance(first, trimesh.visual.TextureVisuals) and first.uv is not None
+            and all(isinstance(visual, trimesh.visual.TextureVisuals) and visual.material is first.material
+                    and visual.uv is not None for visual in visuals)):
+        return trimesh.visual.TextureVisuals(uv=np.vstack([visual.uv for visual in visuals]),
+                                             material=first.material)
+    try:
+        return trimesh.visual.concatenate(visuals)
+    except Exception as e:
+        print(f"  Could not merge materials, dropping them: {e}")
+        return None
+
+def merge_scene(scene, keep_instances=False, visuals=True, normals=False):
+    """
+    Merge a scene into one world-space mesh
+
+    Args:
+        scene: trimesh.Scene
+        keep_instances: Leave geometry placed by more than one node out of the
+            merged mesh and return it referenced instead
+        visuals: Merge materials and UVs (see merge_instances)
+        normals: Carry vertex normals (see merge_instances)
+
+    Returns:
+        (mesh, instances): the merged trimesh.Trimesh (None if empty) and
+        {geometry name: (geometry, (N, 4, 4) transforms)} of the instanced
+        geometry (empty unless keep_instances)
+    """
+    placed = scene_instances(scene)
+    instances = {}
+    if keep_instances:
+        uses = Counter(name for name, _ in placed)
+        transforms = {}
+        for name, transform in placed:
+            if uses[name] > 1:
+                transforms.setdefault(name, []).append(transform)
+        instances = {name: (scene.geometry[name], np.array(stack)) for name, stack in transforms.items()}
+        placed = [(name, transform) for name, transform in placed if uses[name] == 1]
+    return merge_instances(scene.geometry, placed, visuals, normals), instances
+
+def merge_stats(instances):
+    """Face counts of the instanced geometry: stored once vs baked per node"""
+    stored = sum(len(geometry.faces) for geometry, _ in instances.values())
+    baked = sum(len(geometry.faces) * len(transforms) for geometry, transforms in instances.values())
+    return {'instanced_geometries': len(instances), 'instanced_faces': stored, 'baked_faces': baked}
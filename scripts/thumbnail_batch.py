@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Parallel batch thumbnail rendering with a freshness record per thumbnail
+
+Every thumbnail gets a sidecar record (<thumbnail>.json) holding the SHA-256
+of the LOD file it was rendered from, the render parameters (renderer, size,
+view, lights, background, variants) and the size and modification time of
+every PNG written: the thumbnail and its variants, the smaller sizes of the
+pyramid (<name>_thumbnail_<width>.png) and the turntable sprite sheet
+(<name>_thumbnail_turntable.png). A thumbnail whose record matches is skipped. As in the LOD build cache (see
+lod_cache), a source is only hashed again when its size or modification
+time changed, so checking a whole collection costs a few stat calls per
+model and re-running after one upload renders only that model.
+
+Stale thumbnails are rendered in a process pool; each worker's output is
+captured and only shown when the model fails. Thumbnails and records are
+written through temporary files, so a viewer or a concurrent run never reads
+a half-written PNG.
+"""
+
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pipeline_io import write_json_atomic
+from pipeline_profile import span
+
+# Bump when a change to the renderers alters the images for the same source
+# and parameters, so existing records stop matching
+THUMBNAIL_RENDER_VERSION = 2
+
+def sidecar_path(thumbnail_path):
+    """Path of the freshness record of a thumbnail"""
+    return thumbnail_path + '.json'
+
+def variant_path(thumbnail_path, variant):
+    """Path of a thumbnail variant (a pyramid width or 'turntable') next to the thumbnail"""
+    base, extension = os.path.splitext(thumbnail_path)
+    return f"{base}_{variant}{extension or '.png'}"
+
+def output_paths(thumbnail_path, params):
+    """The thumbnail and the variants rendered with params ('pyramid' widths, 'turntable' frames)"""
+    paths = [thumbnail_path]
+    paths += [variant_path(thumbnail_path, width) for width in params.get('pyramid', [])
+              if width < params['size'][0]]
+    if params.get('turntable'):
+        paths.append(variant_path(thumbnail_path, 'turntable'))
+    return paths
+
+def save_png_atomic(image, path):
+    """Save a PIL image as PNG through a temporary file so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    image.save(temp_path, 'PNG')
+    os.replace(temp_path, path)
+
+def load_record(thumbnail_path):
+    """The thumbnail's freshness record, or {} when missing or unreadable"""
+    try:
+        with open(sidecar_path(thumbnail_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def source_signature(source_path, record):
+    """Size, modification time and SHA-256 of a source, reusing the record's hash when unchanged"""
+    from lod_cache import file_sha256
+
+    stat = os.stat(source_path)
+    previous = record.get('source', {})
+    if (previous.get('file') == os.path.abspath(source_path) and previous.get('size') == stat.st_size
+            and previous.get('mtime_ns') == stat.st_mtime_ns):
+        sha256 = previous['sha256']
+    else:
+        sha256 = file_sha256(source_path)
+    return {'file': os.path.abspath(source_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256}
+
+def is_fresh(record, source, params, thumbnail_path):
+    """Whether a thumbnail was rendered from this source content with these parameters and is unchanged"""
+    if not record or record.get('version') != THUMBNAIL_RENDER_VERSION or record.get('params') != params:
+        return False
+    if record.get('source', {}).get('sha256') != source['sha256']:
+        return False
+    outputs = record.get('outputs', {})
+    for path in output_paths(thumbnail_path, params):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        output = outputs.get(os.path.basename(path), {})
+        if stat.st_size != output.get('size') or stat.st_mtime_ns != output.get('mtime_ns'):
+            return False
+    return True
+
+def save_record(thumbnail_path, source, params):
+    """Record the thumbnail as rendered from source with params"""
+    outputs = {}
+    for path in output_paths(thumbnail_path, params):
+        # A variant that was not written (a placeholder has no turntable)
+        # leaves the record stale, so the model is rendered again next time
+        if os.path.exists(path):
+            stat = os.stat(path)
+            outputs[os.path.basename(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    write_json_atomic(sidecar_path(thumbnail_path), {
+        'version': THUMBNAIL_RENDER_VERSION,
+        'source': source,
+        'params': params,
+        'outputs': outputs,
+        'rendered': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    })
+
+def render_job(render, source_path, thumbnail_path, size, render_options):
+    """
+    Worker: render one thumbnail with its output captured
+
+    Returns:
+        Dict with 'ok', 'time' and the captured 'log'
+    """
+    start_time = time.time()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        try:
+            ok = bool(render(source_path, thumbnail_path, size, **render_options))
+        except Exception as e:
+            print(f"Error: {e}")
+            ok = False
+    return {'ok': ok, 'time': time.time() - start_time, 'log': log.getvalue()}
+
+def run_thumbnail_batch(models_dir, thumbnails_dir, render, params, jobs=1, force=False, render_options=None):
+    """
+    Render the thumbnails of every model below models_dir that is not up to date
+
+    Args:
+        models_dir: Searched recursively for *_lod<N>.glb files (see thumbnail_source)
+        thumbnails_dir: Output directory of <name>_thumbnail.png
+        render: Module-level function (glb_path, output_path, size, **render_options) -> bool
+        params: JSON-serializable render parameters; 'size' is passed to render,
+            'pyramid' and 'turntable' name the variants it writes (see output_paths)
+        jobs: Processes rendering at the same time
+        force: Render every thumbnail, ignoring the records
+        render_options: Keyword arguments passed to render
+
+    Returns:
+        Dict with the number of 'rendered', 'fresh' and 'failed' models
+    """
+    from thumbnail_source import find_model_levels, select_thumbnail_source
+
+    batch_start = time.time()
+    size = tuple(params['size'])
+    models = find_model_levels(models_dir)
+    if not models:
+        print(f"No LOD GLB files found in {models_dir}")
+        return {'rendered': 0, 'fresh': 0, 'failed': 0}
+    print(f"Found {len(models)} models to process")
+
+    # Choose sources and check the records in the parent: both are cheap
+    pending = []
+    fresh = failed = 0
+    with span('freshness', models=len(models)):
+        for base_name, level_files in sorted(models.items()):
+            thumbnail_path = os.path.join(thumbnails_dir, f"{base_name}_thumbnail.png")
+            source = select_thumbnail_source(level_files.values(), size)
+            if source is None:
+                print(f"  ✗ {base_name}: no readable LOD file")
+                failed += 1
+                continue
+            record = load_record(thumbnail_path)
+            signature = source_signature(source['path'], record)
+            if not force and is_fresh(record, signature, params, thumbnail_path):
+                if record['source'] != signature:
+                    # Same content, new modification time: remember it to skip the hash next time
+                    write_json_atomic(sidecar_path(thumbnail_path), {**record, 'source': signature})
+                fresh += 1
+                continue
+            pending.append((base_name, source, signature, thumbnail_path))
+
+    print(f"{fresh} thumbnails up to date, {len(pending)} to render with {jobs} jobs")
+
+    rendered = faces = 0
+    render_start = time.time()
+    with ProcessPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = {executor.submit(render_job, render, source['path'], thumbnail_path, size,
+                                   render_options or {}):
+                   (base_name, source, signature, thumbnail_path)
+                   for base_name, source, signature, thumbnail_path in pending}
+        for future in as_completed(futures):
+            base_name, source, signature, thumbnail_path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'ok': False, 'time': 0.0, 'log': f"Error: {e}"}
+            if not result['ok']:
+                failed += 1
+                print(f"  ✗ {base_name} ({os.path.basename(source['path'])}):")
+                print(''.join(f"      {line}\n" for line in result['log'].splitlines()), end='')
+                continue
+            save_record(thumbnail_path, signature, params)
+            rendered += 1
+            faces += source['faces']
+            print(f"  ✓ {base_name}: {result['time']:.2f}s from {os.path.basename(source['path'])} "
+                  f"({source['faces']:,} faces, {source['faces'] / max(result['time'], 1e-9):,.0f} faces/s)")
+
+    render_time = time.time() - render_start
+    total_time = time.time() - batch_start
+    if rendered:
+        print(f"\nRendered {rendered} thumbnails in {render_time:.2f}s: "
+              f"{rendered / max(render_time, 1e-9):.1f} thumbnails/s, "
+              f"{faces / max(render_time, 1e-9):,.0f} faces/s")
+    print(f"Batch finished in {total_time:.2f}s: {rendered} rendered, {fresh} up to date, {failed} failed")
+    return {'rendered': rendered, 'fresh': fresh, 'failed': failed}
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Software thumbnail renderer in pure NumPy
+
+scene.save_image needs an OpenGL context (pyglet and a display or GPU), which
+headless servers do not have. This module renders the same view with a
+z-buffer rasterizer instead:
+
+1. vertices are projected through a perspective look-at camera
+2. each triangle's pixel bounding box is split into tiles of TILE_SIZE
+   pixels, so one large triangle never expands into more candidate pixels
+   than a tile holds
+3. (triangle, tile) pairs are processed in batches of at most BATCH_SAMPLES
+   candidate pixels: barycentric inside test, perspective-correct depth and a
+   scatter-min into the depth buffer, all as array operations
+4. the winning triangle of each pixel is shaded once: its base color (vertex
+   colors averaged per face, face colors, texture sampled at the vertices or
+   the material base color) times ambient plus Lambert terms of the
+   thumbnail's directional lights
+
+The image is rendered at SUPERSAMPLE times the requested size and box-filtered
+down, which smooths the silhouette edges.
+
+Meshes are placed in world space once (prepare_parts) and any number of
+views rendered from them: the thumbnail, and optionally the frames of a
+turntable sprite sheet. The smaller thumbnail sizes (PYRAMID_WIDTHS) are
+area-resampled from the one high-resolution render instead of rendered again.
+"""
+
+import numpy as np
+import trimesh
+from PIL import Image
+
+# Directions towards the thumbnail lights (world space, y up)
+LIGHT_DIRECTIONS = [
+    [1, 1, 1],
+    [-1, 1, 0.5],
+    [0, -0.5, 1]
+]
+
+# Direction from the model towards the camera (looking at it from a 45-degree angle)
+VIEW_DIRECTION = [0.7, 0.5, 0.7]
+
+AMBIENT = 0.25
+DIFFUSE = 0.4
+DEFAULT_COLOR = (180, 180, 180)
+
+# Screen tile edge in pixels and candidate pixels processed per batch
+TILE_SIZE = 64
+BATCH_SAMPLES = 1 << 21
+
+# Render at this multiple of the output size and downsample
+SUPERSAMPLE = 2
+
+# Thumbnail widths clients choose from (list markers up to detail views)
+PYRAMID_WIDTHS = (64, 128, 256, 512)
+
+def look_at(eye, target, up=(0, 1, 0)):
+    """World-to-camera matrix of a camera at eye looking at target down its -Z axis"""
+    forward = np.asarray(target, dtype=np.float64) - eye
+    forward /= np.linalg.norm(forward)
+    right = np.cross(forward, up)
+    if np.linalg.norm(right) < 1e-9:
+        # Looking straight along up
+        right = np.cross(forward, (0, 0, 1))
+    right /= np.linalg.norm(right)
+    view = np.eye(4)
+    view[:3, :3] = np.stack([right, np.cross(right, forward), -forward])
+    view[:3, 3] = -view[:3, :3] @ eye
+    return view
+
+def face_base_colors(mesh):
+    """(F, 3) float RGB of every face: vertex, face or texture colors, or the material base color"""
+    visual = mesh.visual
+    faces = mesh.faces.view(np.ndarray)
+    if isinstance(visual, trimesh.visual.TextureVisuals):
+        try:
+            # Samples the base color texture at each vertex UV, or uses the
+            # base color factor when there is no texture
+            visual = visual.to_color()
+        except Exception:
+            material = getattr(visual, 'material', None)
+            color = getattr(material, 'main_color', None)
+            color = DEFAULT_COLOR if color is None else np.asarray(color)[:3]
+            return np.tile(np.asarray(color, dtype=np.float64), (len(faces), 1))
+    if visual.kind == 'vertex':
+        vertex_colors = np.asarray(visual.vertex_colors)[:, :3].astype(np.float64)
+        return (vertex_colors[faces[:, 0]] + vertex_colors[faces[:, 1]] + vertex_colors[faces[:, 2]]) / 3
+    if visual.kind == 'face':
+        return np.asarray(visual.face_colors)[:, :3].astype(np.float64)
+    return np.tile(np.asarray(DEFAULT_COLOR, dtype=np.float64), (len(faces), 1))
+
+def lambert(normals, to_camera, light_directions):
+    """Ambient plus Lambert intensity of unit normals, lit on the side facing the camera"""
+    # Scans are often open or inconsistently wound, so faces are two-sided
+    normals = np.where((np.einsum('ij,ij->i', normals, to_camera) < 0)[:, None], -normals, normals)
+    lights = np.asarray(light_directions, dtype=np.float64)
+    lights /= np.linalg.norm(lights, axis=1, keepdims=True)
+    diffuse = np.clip(normals @ lights.T, 0, None).sum(axis=1)
+    return np.clip(AMBIENT + DIFFUSE * diffuse, 0, 1)
+
+def rasterize(screen_x, screen_y, depth, faces, depth_buffer, face_buffer, width, face_offset=0):
+    """
+    Scan-convert screen-space triangles into the depth and face buffers
+
+    Args:
+        screen_x, screen_y: (V,) pixel coordinates of the vertices
+        depth: (V,) vertex depth, linear in screen space (smaller is nearer)
+        faces: (F, 3) vertex indices
+        depth_buffer, face_buffer: Flat (height * width) buffers, updated in place
+        width: Buffer width in pixels
+        face_offset: Added to triangle indices written to face_buffer
+    """
+    height = len(depth_buffer) // width
+    # Per-corner columns; reductions over a length-3 axis are much slower
+    x = [screen_x[faces[:, i]] for i in range(3)]
+    y = [screen_y[faces[:, i]] for i in range(3)]
+
+    # Pixels whose centers lie in each triangle's bounding box, clipped to the image
+    x0 = np.maximum(np.ceil(np.minimum(np.minimum(x[0], x[1]), x[2]) - 0.5), 0).astype(np.int64)
+    x1 = np.minimum(np.floor(np.maximum(np.maximum(x[0], x[1]), x[2]) - 0.5), width - 1).astype(np.int64)
+    y0 = np.maximum(np.ceil(np.minimum(np.minimum(y[0], y[1]), y[2]) - 0.5), 0).astype(np.int64)
+    y1 = np.minimum(np.floor(np.maximum(np.maximum(y[0], y[1]), y[2]) - 0.5), height - 1).astype(np.int64)
+    # Most triangles of a dense mesh cover no pixel center at all
+    visible = np.flatnonzero((x1 >= x0) & (y1 >= y0))
+    if len(visible) == 0:
+        return
+    # The bounding box pass may run in float32; the kept triangles go to float64
+    x = [column[visible].astype(np.float64) for column in x]
+    y = [column[visible].astype(np.float64) for column in y]
+    z = [depth[faces[visible, i]] for i in range(3)]
+    x0, x1, y0, y1 = x0[visible], x1[visible], y0[visible], y1[visible]
+    double_area = (x[1] - x[0]) * (y[2] - y[0]) - (x[2] - x[0]) * (y[1] - y[0])
+    if not (np.abs(double_area) > 1e-12).all():
+        # Edge-on triangles cover nothing and have no barycentric planes
+        keep = np.flatnonzero(np.abs(double_area) > 1e-12)
+        x, y, z = [column[keep] for column in x], [column[keep] for column in y], [column[keep] for column in z]
+        x0, x1, y0, y1, double_area, visible = (x0[keep], x1[keep], y0[keep], y1[keep], double_area[keep],
+                                                visible[keep])
+        if len(visible) == 0:
+            return
+
+    # Barycentric coordinates as planes: l_i = a_i * x + b_i * y + c_i
+    planes = []
+    for i in range(3):
+        j, k = (i + 1) % 3, (i + 2) % 3
+        a = (y[j] - y[k]) / double_area
+        b = (x[k] - x[j]) / double_area
+        planes.append((a, b, -(a * x[j] + b * y[j])))
+
+    # Split bounding boxes into (triangle, tile) pairs
+    tile_x0, tile_y0 = x0 // TILE_SIZE, y0 // TILE_SIZE
+    tiles_x = x1 // TILE_SIZE - tile_x0 + 1
+    pairs = tiles_x * (y1 // TILE_SIZE - tile_y0 + 1)
+    if (pairs == 1).all():
+        triangle = np.arange(len(visible))
+    else:
+        triangle = np.repeat(np.arange(len(visible)), pairs)
+        index = np.arange(len(triangle)) - np.repeat(np.cumsum(pairs) - pairs, pairs)
+        tile_x = (tile_x0[triangle] + index % tiles_x[triangle]) * TILE_SIZE
+        tile_y = (tile_y0[triangle] + index // tiles_x[triangle]) * TILE_SIZE
+        x0, x1 = np.maximum(x0[triangle], tile_x), np.minimum(x1[triangle], tile_x + TILE_SIZE - 1)
+        y0, y1 = np.maximum(y0[triangle], tile_y), np.minimum(y1[triangle], tile_y + TILE_SIZE - 1)
+    row = x1 - x0 + 1
+    samples = row * (y1 - y0 + 1)
+
+    # Batches of pairs holding at most BATCH_SAMPLES candidate pixels
+    ends = np.cumsum(samples)
+    cuts = np.searchsorted(ends, np.arange(BATCH_SAMPLES, ends[-1], BATCH_SAMPLES), side='right')
+    for start, stop in zip(np.r_[0, cuts], np.r_[cuts, len(samples)]):
+        if start == stop:
+            continue
+        counts = samples[start:stop]
+        owner = np.repeat(np.arange(start, stop), counts)
+        offset = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        px = x0[owner] + offset % row[owner]
+        py = y0[owner] + offset // row[owner]
+        tri = triangle[owner]
+        cx, cy = px + 0.5, py + 0.5
+
+        weights = [a[tri] * cx + b[tri] * cy + c[tri] for a, b, c in planes]
+        inside = np.flatnonzero((weights[0] >= 0) & (weights[1] >= 0) & (weights[2] >= 0))
+        if len(inside) == 0:
+            continue
+        tri = tri[inside]
+        pixel = py[inside] * width + px[inside]
+        sample_depth = (weights[0][inside] * z[0][tri] + weights[1][inside] * z[1][tri]
+                        + weights[2][inside] * z[2][tri])
+
+        # Z-test: scatter the nearest depth, then keep the samples that set it
+        np.minimum.at(depth_buffer, pixel, sample_depth)
+        nearest = sample_depth <= depth_buffer[pixel]
+        face_buffer[pixel[nearest]] = visible[tri[nearest]] + face_offset
+
+def prepare_parts(parts):
+    """
+    Place meshes in world space once, so any number of views can be rendered from them
+
+    Args:
+        parts: List of (trimesh.Trimesh, (N, 4, 4) transforms or None)
+
+    Returns:
+        Dict with 'parts', a list of (world vertices, faces, face base colors)
+        per placed mesh, and their world 'bounds' (None without faces)
+    """
+    placed = []
+    for mesh, transforms in parts:
+        if mesh is None or not len(mesh.faces):
+            continue
+        vertices = mesh.vertices.view(np.ndarray)
+        faces = mesh.faces.view(np.ndarray)
+        colors = face_base_colors(mesh)
+        for transform in [None] if transforms is None else np.asarray(transforms, dtype=np.float64):
+            world = vertices if transform is None else vertices @ transform[:3, :3].T + transform[:3, 3]
+            placed.append((world, faces, colors))
+    bounds = None
+    if placed:
+        bounds = np.array([np.min([world.min(axis=0) for world, _, _ in placed], axis=0),
+                           np.max([world.max(axis=0) for world, _, _ in placed], axis=0)])
+    return {'parts': placed, 'bounds': bounds}
+
+def render_prepared(prepared, size=(512, 512), bg_color=(240, 240, 240), view_direction=None,
+                    light_directions=None, fov=60, distance_scale=2.5):
+    """
+    Render prepared parts (see prepare_parts) at SUPERSAMPLE times size
+
+    The image is not downsampled, so callers can resample it to any number
+    of sizes. Arguments are those of render_parts.
+
+    Returns:
+        PIL.Image of (size[0] * SUPERSAMPLE, size[1] * SUPERSAMPLE)
+    """
+    width, height = size[0] * SUPERSAMPLE, size[1] * SUPERSAMPLE
+    parts = prepared['parts']
+    if not parts:
+        return Image.new('RGB', (width, height), tuple(bg_color))
+
+    bounds = prepared['bounds']
+    center = bounds.mean(axis=0)
+    direction = np.asarray(VIEW_DIRECTION if view_direction is None else view_direction, dtype=np.float64)
+    eye = center + direction / np.linalg.norm(direction) * max(np.ptp(bounds, axis=0).max(), 1e-9) * distance_scale
+    view = look_at(eye, center)
+    focal = height / 2 / np.tan(np.radians(fov) / 2)
+
+    depth_buffer = np.full(width * height, np.inf)
+    face_buffer = np.full(width * height, -1, dtype=np.int64)
+    face_offsets = [0]
+    for world, faces, _ in parts:
+        camera = world @ view[:3, :3].T + view[:3, 3]
+        # The camera sits outside the bounds, so every vertex is in front of it
+        inverse_depth = 1.0 / np.maximum(-camera[:, 2], 1e-9)
+        # Sub-pixel float32 precision is plenty for the bounding box pass
+        screen_x = (width / 2 + focal * camera[:, 0] * inverse_depth).astype(np.float32)
+        screen_y = (height / 2 - focal * camera[:, 1] * inverse_depth).astype(np.float32)
+        # 1/z is linear in screen space; negated so smaller is nearer
+        rasterize(screen_x, screen_y, -inverse_depth, faces, depth_buffer, face_buffer, width, face_offsets[-1])
+        face_offsets.append(face_offsets[-1] + len(faces))
+
+    # Shade only the faces that won a pixel
+    covered = np.flatnonzero(face_buffer >= 0)
+    winners, pixel_face = np.unique(face_buffer[covered], return_inverse=True)
+    colors = np.empty((len(winners), 3))
+    part_of = np.searchsorted(face_offsets, winners, side='right') - 1
+    for i, (world, faces, base_colors) in enumerate(parts):
+        selected = np.flatnonzero(part_of == i)
+        if len(selected) == 0:
+            continue
+        local = winners[selected] - face_offsets[i]
+        a, b, c = world[faces[local, 0]], world[faces[local, 1]], world[faces[local, 2]]
+        normals = np.cross(b - a, c - a)
+        normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+        intensity = lambert(normals, eye - a, LIGHT_DIRECTIONS if light_directions is None else light_directions)
+        colors[selected] = base_colors[local] * intensity[:, None]
+
+    image = np.empty((width * height, 3))
+    image[:] = bg_color
+    image[covered] = colors[pixel_face]
+    return Image.fromarray(np.clip(image, 0, 255).astype(np.uint8).reshape(height, width, 3))
+
+def render_parts(parts, size=(512, 512), bg_color=(240, 240, 240), view_direction=None,
+                 light_directions=None, fov=60, distance_scale=2.5):
+    """
+    Render meshes placed by world transforms into an RGB image
+
+    Args:
+        parts: List of (trimesh.Trimesh, (N, 4, 4) transforms or None)
+        size: (width, height) of the image
+        bg_color: Background RGB
+        view_direction: Direction from the model center towards the camera
+            (default VIEW_DIRECTION)
+        light_directions: Directions towards the lights (default LIGHT_DIRECTIONS)
+        fov: Vertical field of view in degrees
+        distance_scale: Camera distance as a multiple of the largest extent
+
+    Returns:
+        PIL.Image
+    """
+    image = render_prepared(prepare_parts(parts), size, bg_color, view_direction, light_directions, fov,
+                            distance_scale)
+    if SUPERSAMPLE > 1:
+        image = image.resize(tuple(size), Image.BOX)
+    return image
+
+def resample_pyramid(image, widths=PYRAMID_WIDTHS):
+    """
+    Area-resample one render to each width, keeping its aspect ratio
+
+    A box filter averages every source pixel into the output pixels it
+    covers, which is fast and as sharp as rendering each size separately.
+
+    Returns:
+        {width: PIL.Image} for the widths no larger than the image
+    """
+    return {width: image.resize((width, max(1, round(image.height * width / image.width))), Image.BOX)
+            for width in widths if width <= image.width}
+
+def render_turntable(prepared, frames, frame_size=256, bg_color=(240, 240, 240), view_direction=None,
+                     light_directions=None, fov=60, distance_scale=2.5):
+    """
+    Sprite sheet of views orbiting prepared parts (see prepare_parts) about the vertical axis
+
+    Frames are frame_size pixels square, laid out left to right in one row
+    and start at view_direction. The lights turn with the camera, so every
+    frame is lit like the thumbnail, as if the model turned on a turntable.
+
+    Returns:
+        PIL.Image of (frames * frame_size, frame_size)
+    """
+    direction = np.asarray(VIEW_DIRECTION if view_direction is None else view_direction, dtype=np.float64)
+    lights = np.asarray(LIGHT_DIRECTIONS if light_directions is None else light_directions, dtype=np.float64)
+    sheet = Image.new('RGB', (frames * frame_size, frame_size), tuple(bg_color))
+    for frame in range(frames):
+        rotation = trimesh.transformations.rotation_matrix(2 * np.pi * frame / frames, [0, 1, 0])[:3, :3]
+        image = render_prepared(prepared, (frame_size, frame_size), bg_color, direction @ rotation.T,
+                                lights @ rotation.T, fov, distance_scale)
+        sheet.paste(image.resize((frame_size, frame_size), Image.BOX), (frame * frame_size, 0))
+    return sheet
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Pick the cheapest LOD level that still makes a sharp thumbnail
+
+A thumbnail is a few hundred pixels wide: lod0 of a scan spends millions of
+triangles on an image where most of them are smaller than a pixel. A level
+is sufficient when its triangles project to at most PIXELS_PER_FACE pixels
+on average in the thumbnail view (the camera of thumbnail_raster), so
+facets do not show. The projected surface is estimated from the bounding
+box: a convex body's mean projected area is a quarter of its surface area,
+and about half of its faces point towards the camera.
+
+Face counts and bounds are read from the GLB headers (see glb_stats), so
+choosing a level never loads geometry.
+"""
+
+import os
+import re
+
+import numpy as np
+
+# Largest mean projected triangle area, in thumbnail pixels, that still looks smooth
+PIXELS_PER_FACE = 4.0
+
+LOD_FILE_PATTERN = re.compile(r'^(?P<name>.+)_lod(?P<level>\d+)\.glb$')
+
+def required_faces(bounds, size=(512, 512), fov=60, distance_scale=2.5):
+    """
+    Faces a model needs so its triangles project to at most PIXELS_PER_FACE pixels
+
+    Args:
+        bounds: (2, 3) world bounds of the model
+        size: (width, height) of the thumbnail
+        fov: Vertical field of view in degrees
+        distance_scale: Camera distance as a multiple of the largest extent
+    """
+    extents = np.ptp(np.asarray(bounds, dtype=np.float64), axis=0)
+    max_extent = extents.max()
+    if max_extent <= 0:
+        return 0
+    pixels_per_unit = size[1] / (2 * distance_scale * max_extent * np.tan(np.radians(fov) / 2))
+    surface = 2 * (extents[0] * extents[1] + extents[1] * extents[2] + extents[0] * extents[2])
+    projected = pixels_per_unit ** 2 * surface / 4
+    return int(np.ceil(2 * projected / PIXELS_PER_FACE))
+
+def select_level(levels, size=(512, 512)):
+    """
+    The level with the fewest faces that is dense enough for the thumbnail
+
+    Args:
+        levels: List of dicts with 'faces' and 'bounds' (and anything else)
+        size: (width, height) of the thumbnail
+
+    Returns:
+        The chosen level dict (the densest one when none is dense enough), or
+        None for an empty list
+    """
+    levels = [level for level in levels if level['faces'] and level['bounds'] is not None]
+    if not levels:
+        return None
+    sufficient = [level for level in levels if level['faces'] >= required_faces(level['bounds'], size)]
+    if sufficient:
+        return min(sufficient, key=lambda level: level['faces'])
+    return max(levels, key=lambda level: level['faces'])
+
+def find_model_levels(models_dir):
+    """{model name: {level number: path}} of the *_lod<N>.glb files below models_dir"""
+    models = {}
+    for root, dirs, files in os.walk(models_dir):
+        for file in files:
+            match = LOD_FILE_PATTERN.match(file)
+            if match:
+                models.setdefault(match.group('name'), {})[int(match.group('level'))] = os.path.join(root, file)
+    return models
+
+def select_thumbnail_source(level_files, size=(512, 512)):
+    """
+    Choose the LOD file to render a thumbnail from
+
+    Args:
+        level_files: Paths of the model's LOD files
+        size: (width, height) of the thumbnail
+
+    Returns:
+        Dict with 'path', 'faces', 'bounds' and 'required' faces, or None when
+        no file could be read
+    """
+    from glb_stats import glb_statistics
+
+    levels = []
+    for path in level_files:
+        try:
+            stats = glb_statistics(path)
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            print(f"  Could not read {path}: {e}")
+            continue
+        levels.append({'path': path, 'faces': stats['faces'], 'bounds': stats['bounds']})
+
+    level = select_level(levels, size)
+    if level is not None:
+        level['required'] = required_faces(level['bounds'], size)
+    return level
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Watch an ingest directory and rebuild what each new or changed model affects
+
+Every GLB dropped into (or replaced in) the ingest directory goes through the
+same stages as the manual workflow:
+
+    create_lod_advanced.py -> generate_thumbnail.py -> create_model_manifest.py
+    -> fix_manifest_urls.py -> create_collection.py
+
+The directory is polled; a file is picked up once its size and modification
+time have not changed for --debounce seconds, so copies in progress and bursts
+of saves cause one rebuild, not many. Up to --jobs models are processed at the
+same time in worker processes, each logging to <models>/<name>/pipeline.log.
+LOD levels come from the build cache when the model content is unchanged.
+
+Only the model's own manifest is rewritten. The collection is patched with
+the manifests that finished (see create_collection.update_collection) and
+written once per round instead of being rebuilt from every manifest.
+
+Processed files are remembered in <models>/.ingest_state.json, so a restart
+only picks up files that changed while the watcher was not running.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+from pipeline_io import write_json_atomic
+from pipeline_profile import span, add_profile_argument, profile_session
+
+STATE_FILE = '.ingest_state.json'
+
+def scan_ingest(ingest_dir):
+    """{path: (size, mtime_ns)} of every GLB below ingest_dir"""
+    snapshot = {}
+    for path in Path(ingest_dir).rglob('*.glb'):
+        try:
+            stat = path.stat()
+        except OSError:
+            # Removed or renamed between listing and stat
+            continue
+        snapshot[str(path)] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+def load_state(models_dir):
+    """{path: (size, mtime_ns)} of the files processed in earlier runs"""
+    try:
+        with open(os.path.join(models_dir, STATE_FILE), 'r', encoding='utf-8') as f:
+            return {path: tuple(signature) for path, signature in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+def process_model(input_file, options):
+    """
+    Worker: run LOD (with thumbnail) -> manifest for one model
+
+    Output goes to <models>/<name>/pipeline.log. A failed thumbnail does not
+    stop the manifest; a failed LOD build or manifest fails the model.
+
+    Returns:
+        Dict with 'name', 'manifest' (path or None), per-stage 'times',
+        'error' and total 'time'
+    """
+    from create_lod_advanced import create_lod_levels, clean_model_name
+
+    name = clean_model_name(input_file)
+    model_dir = os.path.join(options['models_dir'], name)
+    os.makedirs(model_dir, exist_ok=True)
+    result = {'name': name, 'manifest': None, 'times': {}, 'error': None}
+    start_time = time.time()
+
+    with open(os.path.join(model_dir, 'pipeline.log'), 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log):
+        try:
+            stage_start = time.time()
+            # The builder renders the thumbnail from its cheapest sufficient level
+            thumbnail_path = os.path.join(options['thumbnails_dir'], f"{name}_thumbnail.png")
+            levels = create_lod_levels(input_file, model_dir, thumbnail=thumbnail_path, **options['lod_options'])
+            result['times']['lod'] = time.time() - stage_start
+            if not levels:
+                raise RuntimeError("no LOD levels were built")
+            if not any(level.get('thumbnail') for level in levels):
+                print("\n⚠️ No thumbnail was rendered")
+
+            stage_start = time.time()
+            from create_model_manifest import create_iiif_manifest
+            from fix_manifest_urls import fix_urls_in_dict
+            manifest = create_iiif_manifest(name, model_dir, options['url'], {'label': name},
+                                            thumbnails_dir=options['thumbnails_dir'])
+            if manifest is None:
+                raise RuntimeError("no manifest was created")
+            manifest_path = os.path.join(options['manifests_dir'], f"{name}_iiif.json")
+            write_json_atomic(manifest_path, fix_urls_in_dict(manifest))
+            print(f"\n✅ IIIF manifest created: {manifest_path}")
+            result['times']['manifest'] = time.time() - stage_start
+            result['manifest'] = manifest_path
+        except Exception as e:
+            print(f"\n❌ Error: {e}")
+            result['error'] = str(e)
+
+    result['time'] = time.time() - start_time
+    return result
+
+def update_collection_file(manifest_paths, options):
+    """Patch collection.json with the given manifests, creating it from all manifests if missing"""
+    from create_collection import create_iiif_collection, update_collection
+    from fix_manifest_urls import fix_urls_in_dict
+
+    collection_path = os.path.join(options['manifests_dir'], 'collection.json')
+    # Entries use the same URLs fix_manifest_urls.py writes, so they match existing ones
+    base_url = fix_urls_in_dict({'id': options['collection_url']})['id']
+    with span('collection', manifests=len(manifest_paths)):
+        collection = None
+        if os.path.exists(collection_path):
+            with open(collection_path, 'r', encoding='utf-8') as f:
+                collection = json.load(f)
+            collection = update_collection(collection, manifest_paths, base_url)
+        else:
+            collection = create_iiif_collection(options['manifests_dir'], base_url,
+                                                {'label': options['collection_label']})
+        if collection is None:
+            return None
+        write_json_atomic(collection_path, fix_urls_in_dict(collection))
+    return collection_path
+
+def watch_ingest(ingest_dir, options, jobs=2, debounce=5.0, interval=1.0, once=False):
+    """
+    Poll ingest_dir and process new or changed models until interrupted
+
+    Args:
+        ingest_dir: Directory searched recursively for .glb files
+        options: Output locations and LOD settings (see main)
+        jobs: Maximum number of models processed at the same time
+        debounce: Seconds a file has to stay unchanged before it is processed
+        interval: Seconds between directory scans
+        once: Process what is there (after debouncing) and return when idle
+    """
+    state = load_state(options['models_dir'])
+    changed = {}    # path -> (signature, time it was last seen changing)
+    running = {}    # future -> (path, signature)
+
+    print(f"Watching {ingest_dir} (debounce {debounce:.0f}s, {jobs} jobs)")
+    with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as executor:
+        while True:
+            now = time.monotonic()
+            active = dict(running.values())
+            for path, signature in scan_ingest(ingest_dir).items():
+                if state.get(path) == signature or active.get(path) == signature:
+                    continue
+                if path not in changed or changed[path][0] != signature:
+                    changed[path] = (signature, now)
+
+            # Settled files start while there is a free slot; a file changing
+            # while it is processed is picked up again afterwards
+            for path, (signature, seen) in sorted(changed.items(), key=lambda entry: entry[1][1]):
+                if len(running) >= jobs:
+                    break
+                if now - seen < debounce or path in active:
+                    continue
+                del changed[path]
+                running[executor.submit(process_model, path, options)] = (path, signature)
+                active[path] = signature
+                print(f"  → {Path(path).name} started")
+
+            if not running:
+                if once and not changed:
+                    break
+                time.sleep(interval)
+                continue
+
+            done, _ = wait(running, timeout=interval, return_when=FIRST_COMPLETED)
+            manifests = []
+            for future in done:
+                path, signature = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'name': Path(path).stem, 'manifest': None, 'times': {}, 'error': str(e), 'time': 0.0}
+                # Failed models are retried only when the file changes again
+                state[path] = signature
+                if result['manifest']:
+                    manifests.append(result['manifest'])
+                stages = ', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in result['times'].items())
+                if result['error']:
+                    print(f"  ✗ {result['name']}: {result['error']} (see its pipeline.log)")
+                else:
+                    print(f"  ✓ {result['name']} in {result['time']:.1f}s ({stages})")
+
+            if done:
+                if manifests:
+                    collection_path = update_collection_file(manifests, options)
+                    if collection_path:
+                        print(f"  ✓ Collection updated: {collection_path} (+{len(manifests)} manifests)")
+                write_json_atomic(os.path.join(options['models_dir'], STATE_FILE),
+                                  {path: list(signature) for path, signature in state.items()})
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch an ingest directory and rebuild LODs, thumbnails, '
+                                                 'manifests and the collection for new or changed models')
+    parser.add_argument('ingest_dir', help='Directory where new GLB files are dropped')
+    parser.add_argument('--models-dir', default='public/data/models',
+                        help='LOD output root, one directory per model (default: public/data/models)')
+    parser.add_argument('--thumbnails-dir', default='public/thumbnails',
+                        help='Thumbnail directory (default: public/thumbnails)')
+    parser.add_argument('--manifests-dir', default='public/data/manifests',
+                        help='Manifest and collection directory (default: public/data/manifests)')
+    parser.add_argument('-u', '--url', default='http://localhost:3000', help='Base URL for manifests')
+    parser.add_argument('--collection-url', default='http://localhost:3000/data/manifests',
+                        help='Base URL for the collection')
+    parser.add_argument('--collection-label', default='3D Models Collection',
+                        help='Label of a newly created collection')
+    parser.add_argument('--jobs', type=int, default=2, help='Models processed at the same time (default: 2)')
+    parser.add_argument('--debounce', type=float, default=5.0,
+                        help='Seconds a file must stay unchanged before processing (default: 5)')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between scans (default: 1)')
+    parser.add_argument('--once', action='store_true', help='Process pending files and exit')
+    parser.add_argument('--clean', action='store_true', help='Clean meshes before decimating (see lod_cleanup)')
+    parser.add_argument('--max-memory', type=int, default=2048, help='Max memory in MB per model (default: 2048)')
+    add_profile_argument(parser)
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.ingest_dir):
+        parser.error(f"{args.ingest_dir} is not a directory")
+
+    options = {
+        'models_dir': args.models_dir,
+        'thumbnails_dir': args.thumbnails_dir,
+        'manifests_dir': args.manifests_dir,
+        'url': args.url,
+        'collection_url': args.collection_url,
+        'collection_label': args.collection_label,
+        'lod_options': {'max_memory_mb': args.max_memory, 'clean': args.clean},
+    }
+
+    with profile_session(args.profile, 'watch_ingest'):
+        try:
+            watch_ingest(args.ingest_dir, options, args.jobs, args.debounce, args.interval, args.once)
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        print("Usage examples:")
+        print("  python3 watch_ingest.py ingest/")
+        print("  python3 watch_ingest.py ingest/ --jobs 4 --debounce 10 --clean")
+        print("  python3 watch_ingest.py ingest/ --once")
+        print("\nFor more options: python3 watch_ingest.py -h")
+    else:
+        main()
@@ -9,6 +9,11 @@ import './ModelsList.css';
 function ModelCard({ item }) {
   const [previewError, setPreviewError] = useState(false);
   const thumbnailUrl = item.thumbnail?.[0]?.id;
+  // サイズ別のサムネイルから、表示サイズに足りる最小の画像をブラウザに選ばせる
+  const thumbnailSrcSet = item.thumbnail
+    ?.filter(thumbnail => thumbnail.id && thumbnail.width)
+    .map(thumbnail => `${thumbnail.id} ${thumbnail.width}w`)
+    .join(', ');
   
   // メタデータから重要な情報を抽出
   const getMetadataValue = (label) => {
@@ -28,6 +33,8 @@ function ModelCard({ item }) {
         {thumbnailUrl && !previewError ? (
           <img 
             src={thumbnailUrl} 
+            srcSet={thumbnailSrcSet || undefined}
+            sizes="(max-width: 800px) 100vw, 400px"
             alt={item.label?.en?.[0] || 'Model thumbnail'}
             onError={() => setPreviewError(true)}
             className="thumbnail-image"